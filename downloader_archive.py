@@ -0,0 +1,172 @@
+"""归档输出：把下载的图片写入按大小滚动的tar/zip分片，而不是每张图片一个文件
+
+写入时在输出目录生成images-00000.tar（或.zip）等分片，以及记录每个成员位置的index.jsonl:
+    {"name": ..., "url": ..., "shard": "images-00000.tar", "offset": ..., "size": ..., "sha256": ...}
+
+offset是成员数据在分片中的字节位置（zip成员不压缩），读取单张图片时直接定位，无需扫描分片:
+    python -m downloader_archive ./images/index.jsonl image_photo.jpg -o ./extracted
+    python -m downloader_archive ./images/index.jsonl --list
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+from io import BytesIO
+
+from downloader_engine import NameRegistry
+
+INDEX_NAME = "index.jsonl"
+ARCHIVE_FORMATS = ('tar', 'zip')
+
+class ArchiveWriter:
+    """线程安全的滚动分片写入器，分片写满shard_size字节后开始下一个分片"""
+    def __init__(self, output_dir, archive_format='tar', shard_size=1024 * 1024 * 1024, name="images"):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"不支持的归档格式: {archive_format}")
+        self.output_dir = output_dir
+        self.archive_format = archive_format
+        self.shard_size = shard_size
+        self.name = name
+        self.lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # 接着已有的分片编号继续，不覆盖之前运行写入的分片
+        pattern = re.compile(rf'^{re.escape(name)}-(\d+)\.(?:tar|zip)$')
+        numbers = [int(match.group(1)) for match in map(pattern.match, os.listdir(output_dir)) if match]
+        self.shard_number = max(numbers) + 1 if numbers else 0
+        
+        self.file = None  # 当前分片文件
+        self.archive = None  # 当前分片的TarFile或ZipFile
+        self.shard_path = None
+        # 成员名在所有分片中唯一，包括之前运行写入同一索引的分片（否则按名称提取时会有歧义）
+        self.names = NameRegistry()
+        index_path = os.path.join(output_dir, INDEX_NAME)
+        if os.path.exists(index_path):
+            for record in iter_index(index_path):
+                self.names.reserve(record['name'])
+        self.index = open(index_path, 'a', encoding='utf-8')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _open_shard(self):
+        self.shard_path = os.path.join(self.output_dir, f"{self.name}-{self.shard_number:05d}.{self.archive_format}")
+        self.shard_number += 1
+        self.file = open(self.shard_path, 'xb')
+        if self.archive_format == 'tar':
+            self.archive = tarfile.open(fileobj=self.file, mode='w', format=tarfile.PAX_FORMAT)
+        else:
+            self.archive = zipfile.ZipFile(self.file, 'w', zipfile.ZIP_STORED)
+    
+    def _close_shard(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.file.close()
+            self.archive = None
+            self.file = None
+    
+    def add(self, name, content, url=None, content_type=None):
+        """写入一个成员并追加索引记录，返回"分片路径#成员名" """
+        digest = hashlib.sha256(content).hexdigest()
+        with self.lock:
+            if self.archive is None:
+                self._open_shard()
+            name = self.names.reserve(name)
+            
+            if self.archive_format == 'tar':
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                info.mtime = int(time.time())
+                self.archive.addfile(info, BytesIO(content))
+                # 数据之后按512字节补齐，由写入后的位置倒推数据起点（长文件名的扩展头也能正确处理）
+                offset = self.file.tell() - (len(content) + 511) // 512 * 512
+            else:
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+                info.file_size = len(content)
+                with self.archive.open(info, 'w') as member:
+                    offset = self.file.tell()  # 本地文件头已写入，此处即数据起点
+                    member.write(content)
+            
+            record = {
+                'name': name, 'url': url, 'content_type': content_type,
+                'shard': os.path.basename(self.shard_path), 'offset': offset, 'size': len(content), 'sha256': digest,
+            }
+            self.index.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.index.flush()
+            shard_path = self.shard_path
+            
+            if self.file.tell() >= self.shard_size:
+                self._close_shard()
+        return f"{shard_path}#{name}"
+    
+    def close(self):
+        with self.lock:
+            self._close_shard()
+            self.index.close()
+
+def read_member(shard_path, offset, size):
+    """按索引中的位置读取成员数据"""
+    with open(shard_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(size)
+    if len(data) != size:
+        raise ValueError(f"分片不完整: {shard_path}")
+    return data
+
+def iter_index(index_path):
+    """逐条读取索引记录（跳过中断时写了一半的行）"""
+    with open(index_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m downloader_archive",
+                                     description="按索引从tar/zip分片中提取图片（直接定位，不扫描分片）")
+    parser.add_argument("index", help="index.jsonl路径（分片在同一目录中）")
+    parser.add_argument("members", nargs="*", help="要提取的成员名或原始URL")
+    parser.add_argument("-o", "--output", default=".", help="提取到的目录（默认当前目录）")
+    parser.add_argument("--list", action="store_true", help="列出所有成员")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    base_dir = os.path.dirname(os.path.abspath(args.index))
+    
+    if args.list:
+        for record in iter_index(args.index):
+            print(f"{record['name']}\t{record['size']}\t{record['shard']}\t{record['url'] or ''}")
+        return 0
+    
+    wanted = set(args.members)
+    found = set()
+    os.makedirs(args.output, exist_ok=True)
+    for record in iter_index(args.index):
+        key = record['name'] if record['name'] in wanted else record['url']
+        if key not in wanted:
+            continue
+        data = read_member(os.path.join(base_dir, record['shard']), record['offset'], record['size'])
+        target = os.path.join(args.output, os.path.basename(record['name']))
+        with open(target, 'wb') as f:
+            f.write(data)
+        found.add(key)
+        print(target)
+    
+    missing = wanted - found
+    for key in missing:
+        sys.stderr.write(f"索引中没有: {key}\n")
+    return 1 if missing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
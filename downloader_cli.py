@@ -0,0 +1,157 @@
+"""URL图片批量下载器的命令行入口（无界面，可在服务器或定时任务中运行）
+
+用法示例:
+    python -m downloader_cli urls.txt -o ./images -j 8 --min-width 300 --json
+
+不导入tkinter，只依赖downloader_engine（归档和WARC输出另需downloader_archive、downloader_warc）。
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from downloader_archive import ARCHIVE_FORMATS, ArchiveWriter
+from downloader_engine import OUTPUT_LAYOUTS, ImageEngine
+from downloader_warc import WarcRecordingSession, WarcWriter
+
+class CommandLineDownloader(ImageEngine):
+    """把引擎的状态和进度输出到终端，--json时每行输出一个JSON事件"""
+    def __init__(self, json_output=False, quiet=False):
+        super().__init__()
+        self.json_output = json_output
+        self.quiet = quiet
+        self.output_lock = threading.Lock()
+        self.last_progress = {}  # stage -> 上次输出进度的时间，避免刷屏
+
+    def emit(self, event, **fields):
+        """输出一个事件（JSON模式写标准输出，文本模式写标准错误）"""
+        with self.output_lock:
+            if self.json_output:
+                fields['event'] = event
+                sys.stdout.write(json.dumps(fields, ensure_ascii=False) + "\n")
+                sys.stdout.flush()
+            elif not self.quiet:
+                if event == 'status':
+                    text = fields['message']
+                elif event == 'progress':
+                    text = f"[{fields['stage']}] {fields['current']}/{fields['total']}"
+                else:
+                    text = " ".join(f"{key}={value}" for key, value in fields.items())
+                    text = f"{event}: {text}"
+                sys.stderr.write(text + "\n")
+
+    def _post_status(self, message):
+        self.emit('status', message=message)
+
+    def _post_progress(self, stage, current, total):
+        # 同一阶段每0.5秒最多输出一次，最后一次总是输出
+        now = time.monotonic()
+        if current < total and now - self.last_progress.get(stage, 0) < 0.5:
+            return
+        self.last_progress[stage] = now
+        self.emit('progress', stage=stage, current=current, total=total)
+
+    def _on_crawl_progress(self, done, queued, found, max_pages):
+        self._post_progress('crawl', done, max_pages)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m downloader_cli",
+                                     description="从网页URL批量提取并下载图片（无界面）")
+    parser.add_argument("input", help="URL文件（每行一个URL，或站点地图/订阅源，支持.gz、URL和\"-\"表示标准输入）")
+    parser.add_argument("-o", "--output", default=".", help="保存目录（默认当前目录）")
+    parser.add_argument("-j", "--concurrency", type=int, default=5, help="分析和下载的并发数（默认5）")
+    parser.add_argument("--verify-workers", type=int, default=10, help="验证图片的并发数（默认10）")
+    parser.add_argument("--min-width", type=int, default=0, help="最小图片宽度")
+    parser.add_argument("--min-height", type=int, default=0, help="最小图片高度")
+    parser.add_argument("--keep-small", action="store_true", help="不跳过小于50x50的图标")
+    parser.add_argument("--resolution", help="只保留指定分辨率，如800x600")
+    parser.add_argument("--no-verify", action="store_true", help="不验证图片（同时不按尺寸过滤）")
+    parser.add_argument("--prefix", default="image", help="文件名前缀（默认image）")
+    parser.add_argument("--crawl", action="store_true", help="同站爬取：以输入URL为种子跟随同站链接")
+    parser.add_argument("--depth", type=int, default=2, help="爬取最大深度（默认2）")
+    parser.add_argument("--max-pages", type=int, default=100, help="爬取最多访问的页面数（默认100）")
+    parser.add_argument("--crawl-delay", type=float, default=1.0, help="爬取时同一主机的请求间隔秒数（默认1.0）")
+    parser.add_argument("--layout", choices=OUTPUT_LAYOUTS, default="flat",
+                        help="保存目录的组织方式：按URL/内容哈希分两级子目录，或按主机/来源网页分目录；非flat时生成files.jsonl清单")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="按内容去重：相同图片只保存一份（保存目录下的.store），其余文件名以硬链接指向它，多次运行间共用")
+    parser.add_argument("--archive", choices=ARCHIVE_FORMATS, help="把图片写入tar/zip分片（附带index.jsonl），而不是单独的文件")
+    parser.add_argument("--shard-size", type=int, default=1024, help="每个归档分片的大小（MB，默认1024）")
+    parser.add_argument("--warc", action="store_true", help="同时把抓取的HTTP请求和响应记录为WARC（capture-*.warc.gz和capture.cdx）")
+    parser.add_argument("--warc-size", type=int, default=1024, help="每个WARC文件的大小（MB，默认1024）")
+    parser.add_argument("--list-only", action="store_true", help="只输出找到的图片URL，不下载")
+    parser.add_argument("--json", action="store_true", help="以JSON行输出进度和结果")
+    parser.add_argument("-q", "--quiet", action="store_true", help="文本模式下不输出进度")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    engine = CommandLineDownloader(json_output=args.json, quiet=args.quiet)
+    engine.max_workers = max(1, args.concurrency)
+    engine.download_workers = max(1, args.concurrency)
+    engine.verify_workers = max(1, args.verify_workers)
+    engine.verify_images = not args.no_verify
+    engine.min_width = max(0, args.min_width)
+    engine.min_height = max(0, args.min_height)
+    engine.skip_small_images = not args.keep_small
+    engine.resolution_filter = args.resolution
+    engine.prefix = args.prefix
+    engine.layout = args.layout
+    engine.dedupe = args.dedupe
+    engine.crawl_delay = max(0.0, args.crawl_delay)
+    warc = None
+    if args.warc:
+        warc = WarcWriter(args.output, max_file_size=max(1, args.warc_size) * 1024 * 1024)
+        engine.http = WarcRecordingSession(engine.http, warc)
+
+    try:
+        urls, image_urls = engine.load_url_source(args.input)
+    except Exception as e:
+        engine.emit('error', message=f"读取URL文件时出错: {str(e)}")
+        if warc is not None:
+            warc.close()
+        return 2
+    engine.emit('loaded', urls=len(urls), images=len(image_urls))
+
+    engine.is_downloading = True  # 置为False即取消
+    try:
+        if args.crawl:
+            img_urls = engine.crawl_site(list(urls), max(0, args.depth), max(1, args.max_pages))
+            img_urls = list(dict.fromkeys(image_urls + img_urls))
+        else:
+            img_urls = engine.analyze_urls(urls, image_urls)
+        img_urls = engine.finish_images(img_urls)
+        engine.emit('found', images=len(img_urls))
+
+        if args.list_only:
+            for img_url in img_urls:
+                if args.json:
+                    engine.emit('image', url=img_url)
+                else:
+                    print(img_url)
+            return 0
+
+        os.makedirs(args.output, exist_ok=True)
+        if args.archive:
+            engine.archive = ArchiveWriter(args.output, args.archive, max(1, args.shard_size) * 1024 * 1024)
+        success_count = engine.download_images(img_urls, args.output)
+    except KeyboardInterrupt:
+        engine.is_downloading = False
+        engine.emit('cancelled')
+        return 130
+    finally:
+        if engine.archive is not None:
+            engine.archive.close()
+        if warc is not None:
+            warc.close()
+
+    if engine.dedupe:
+        engine.emit('dedupe', duplicates=engine.dedupe_hits, saved_bytes=engine.dedupe_saved_bytes)
+    engine.emit('done', downloaded=success_count, total=len(img_urls), output=os.path.abspath(args.output))
+    return 0 if success_count == len(img_urls) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1950 @@
+"""图片提取、验证和下载引擎
+
+不依赖tkinter，可被图形界面（image_downloader.py）和命令行（downloader_cli.py）共用。
+
+也可以作为库直接调用，结果以生成器逐条返回，每次调用使用独立的引擎（线程安全）:
+
+    from downloader_engine import extract_images, iter_verified, download_all
+    
+    for image in iter_verified(extract_images(page_url), min_size=(300, 300)):
+        print(image.url, image.width, image.height)
+    for result in download_all(urls, "./images"):
+        print(result.url, result.path or result.error)
+"""
+import requests
+from bs4 import BeautifulSoup
+import os
+import threading
+import re
+import urllib.parse
+from urllib.parse import urlparse
+from PIL import ImageFile
+import json
+import base64
+import binascii
+import gzip
+import hashlib
+import heapq
+import html
+import io
+import itertools
+import time
+import concurrent.futures
+import collections
+import shutil
+import sys
+import tempfile
+from array import array
+import xml.etree.ElementTree as ElementTree
+
+# 尺寸提示相关正则（预编译，供提取阶段快速判断图片尺寸）
+SIZE_ATTR_RE = re.compile(r'^\s*(\d{1,5})(?:px)?\s*$', re.IGNORECASE)  # width/height属性值，如"64"或"64px"
+SRCSET_CANDIDATE_RE = re.compile(r'([^\s,]+)(?:\s+(\d+(?:\.\d+)?)([wx])[^,]*)?(?:,|$)')  # srcset候选项及其描述符
+URL_SIZE_PATH_RE = re.compile(r'(?:^|[/_\-.=])(\d{1,5})x(\d{1,5})(?=[/_\-.?&]|$)')  # 路径中的尺寸，如/64x64/或-150x150.jpg
+URL_SIZE_PARAM_NAMES = {
+    'w': 'width', 'width': 'width', 'imwidth': 'width',
+    'h': 'height', 'height': 'height', 'imheight': 'height',
+}
+
+# 脚本中图片提取相关设置
+SCRIPT_IMAGE_RE = re.compile(r'(?:src|url|image|img|source)(?:["\']|\s*:\s*["\']\s*)([^"\']+\.(?:jpg|jpeg|png|gif|webp|bmp|svg))', re.IGNORECASE)
+JSON_ASSIGNMENT_RE = re.compile(r'(?:^|[;\s(])(?:window\.|self\.|var\s+|let\s+|const\s+)?[A-Za-z_$][\w$.]*\s*=\s*(?=[\[{])')
+JSON_SCRIPT_TYPES = {'application/ld+json', 'application/json'}
+JSON_SCRIPT_IDS = {'__NEXT_DATA__', '__NUXT_DATA__', '__APOLLO_STATE__'}
+# 这些键对应的字符串值一定是图片地址（如JSON-LD中的image、thumbnailUrl）
+JSON_IMAGE_KEYS = {
+    'image', 'images', 'img', 'imageurl', 'image_url', 'thumbnail', 'thumbnailurl', 'thumbnail_url',
+    'contenturl', 'logo', 'photo', 'picture', 'poster', 'avatar', 'cover', 'coverimage', 'banner',
+}
+JSON_IMAGE_EXT_RE = re.compile(r'\.(?:jpg|jpeg|png|gif|webp|bmp|svg|avif)(?:[?#]|$)', re.IGNORECASE)
+
+# 深度搜索使用的字节级正则：引号内以图片扩展名结尾的属性值，或文本中任意位置的绝对/协议相对图片URL
+DEEP_SEARCH_RE = re.compile(
+    rb'=\s*["\']([^"\'<>\s]+?\.(?:jpg|jpeg|png|gif|webp|bmp|svg)(?:[?#][^"\'<>\s]*)?)["\']'
+    rb'|((?:https?:)?//[^/\s"\'<>]+/[^\s"\'<>]+?\.(?:jpg|jpeg|png|gif|webp|bmp|svg)(?:\?[^"\'\s<>]*)?)(?=["\'\s<>])',
+    re.IGNORECASE)
+
+# 同站爬取相关设置
+PAGINATION_RE = re.compile(r'(?:[?&](?:page|p|pg|paged|offset|start)=\d+|/page/\d+|[-_/]p\d+(?:/|$)|[-_]page[-_]?\d+)', re.IGNORECASE)
+NON_PAGE_EXTENSIONS = (
+    '.css', '.js', '.json', '.xml', '.txt', '.pdf', '.zip', '.rar', '.7z', '.gz', '.tar', '.exe', '.dmg', '.apk',
+    '.mp3', '.mp4', '.avi', '.mov', '.webm', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+)
+
+# 站点地图与订阅源（RSS/Atom）识别
+FEED_URL_SUFFIXES = ('.xml', '.xml.gz', '.rss', '.atom', '/feed', '/feed/', '/rss', '/rss/', '/atom', '/atom/')
+FEED_ENTRY_TAGS = {'url', 'sitemap', 'item', 'entry'}
+
+# 保存目录的组织方式：flat全部放在一个目录；url-hash/content-hash按URL/内容哈希分到两级前缀目录；
+# host按图片所在主机分目录；page按发现图片的网页分目录
+OUTPUT_LAYOUTS = ('flat', 'url-hash', 'content-hash', 'host', 'page')
+LAYOUT_MANIFEST_NAME = "files.jsonl"  # 非flat布局或去重时记录 原始URL -> 保存路径 的清单
+DEDUPE_STORE_DIR = ".store"  # 去重时保存目录下按内容哈希存放图片的目录，各文件名硬链接到这里
+
+# 内联图片（data URI）使用的伪URL前缀，后接内容哈希和扩展名
+INLINE_IMAGE_PREFIX = "inline://sha256/"
+# data URI中常见图片类型对应的扩展名
+INLINE_IMAGE_EXTENSIONS = {
+    'image/jpeg': '.jpg', 'image/jpg': '.jpg', 'image/png': '.png', 'image/gif': '.gif',
+    'image/webp': '.webp', 'image/bmp': '.bmp', 'image/svg+xml': '.svg',
+    'image/x-icon': '.ico', 'image/vnd.microsoft.icon': '.ico', 'image/tiff': '.tiff',
+}
+
+# 库接口返回的结果记录；data只有内联图片（data URI）才有，为图片字节，其余为None
+ExtractedImage = collections.namedtuple('ExtractedImage', 'url page_url content_type data')
+VerifiedImage = collections.namedtuple('VerifiedImage', 'url width height content_type data')
+DownloadResult = collections.namedtuple('DownloadResult', 'url path error')  # 成功时error为None，失败时path为None
+
+class InlineImageResponse:
+    """模拟requests响应对象，让内联图片走与网络图片相同的验证、预览和保存流程"""
+    def __init__(self, url, content_type, content):
+        self.url = url
+        self.status_code = 200
+        self.headers = {'Content-Type': content_type, 'Content-Length': str(len(content))}
+        self.content = content
+    
+    def raise_for_status(self):
+        pass
+    
+    def iter_content(self, chunk_size=8192):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class UrlStore:
+    """紧凑的去重URL列表
+    
+    所有URL以UTF-8连续存放在一个bytearray中，偏移量存于array，另用开放寻址哈希表
+    保存下标。支持O(1)按下标取URL、O(1)按URL查下标，添加时自动去重；
+    两百万条URL只占用几百MB以内的内存，而不是每条一个Python字符串加字典项。
+    """
+    def __init__(self, urls=()):
+        self._data = bytearray()
+        self._offsets = array('Q', [0])
+        self._table = array('q', [-1]) * 1024  # 槽位中存放URL下标，-1表示空
+        self._mask = 1023
+        for url in urls:
+            self.add(url)
+    
+    def __len__(self):
+        return len(self._offsets) - 1
+    
+    def __bool__(self):
+        return len(self._offsets) > 1
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("UrlStore index out of range")
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+    
+    def __contains__(self, url):
+        return self._find(url.encode('utf-8'))[1] >= 0
+    
+    def _find(self, encoded):
+        """返回 (槽位, 下标)，不存在时下标为-1，槽位为可插入的位置"""
+        slot = hash(encoded) & self._mask
+        while True:
+            index = self._table[slot]
+            if index < 0 or self._data[self._offsets[index]:self._offsets[index + 1]] == encoded:
+                return slot, index
+            slot = (slot + 1) & self._mask
+    
+    def add(self, url):
+        """添加URL，已存在时返回False"""
+        encoded = url.encode('utf-8')
+        slot, index = self._find(encoded)
+        if index >= 0:
+            return False
+        self._table[slot] = len(self)
+        self._data += encoded
+        self._offsets.append(len(self._data))
+        # 装载因子超过1/2时扩容
+        if len(self) * 2 > self._mask:
+            self._grow()
+        return True
+    
+    def index(self, url):
+        """返回URL的下标，不存在时抛出ValueError（与list.index一致）"""
+        index = self._find(url.encode('utf-8'))[1]
+        if index < 0:
+            raise ValueError(f"{url} is not in UrlStore")
+        return index
+    
+    def _grow(self):
+        size = (self._mask + 1) * 4
+        self._table = array('q', [-1]) * size
+        self._mask = size - 1
+        for index in range(len(self)):
+            slot = hash(bytes(self._data[self._offsets[index]:self._offsets[index + 1]])) & self._mask
+            while self._table[slot] >= 0:
+                slot = (slot + 1) & self._mask
+            self._table[slot] = index
+
+class FingerprintSet:
+    """64位指纹的集合，以开放寻址哈希表存放在array('Q')中，每个指纹约占16~32字节（装载因子1/4~1/2）
+    
+    Python的set中每个int还需要单独的对象和哈希表项（约60~70字节），百万级条目时差别明显。
+    """
+    def __init__(self):
+        self._table = array('Q', [0]) * 1024  # 0表示空槽位
+        self._mask = 1023
+        self._count = 0
+    
+    def __len__(self):
+        return self._count
+    
+    def _slot(self, fingerprint):
+        slot = fingerprint & self._mask
+        while True:
+            value = self._table[slot]
+            if value == 0 or value == fingerprint:
+                return slot
+            slot = (slot + 1) & self._mask
+    
+    def __contains__(self, fingerprint):
+        fingerprint = fingerprint or 1  # 0留作空槽位标记
+        return self._table[self._slot(fingerprint)] == fingerprint
+    
+    def add(self, fingerprint):
+        """添加指纹，已存在时返回False"""
+        fingerprint = fingerprint or 1
+        slot = self._slot(fingerprint)
+        if self._table[slot] == fingerprint:
+            return False
+        self._table[slot] = fingerprint
+        self._count += 1
+        # 装载因子超过1/2时扩容
+        if self._count * 2 > self._mask:
+            old_table = self._table
+            self._table = array('Q', [0]) * ((self._mask + 1) * 2)
+            self._mask = len(self._table) - 1
+            for value in old_table:
+                if value:
+                    self._table[self._slot(value)] = value
+        return True
+
+class StrategyStats:
+    """按域名统计各图片提取策略的效果，同域名的后续页面跳过长期无产出的策略
+    
+    每个策略记录运行次数(runs)、找到候选图片的页面数(yields)、候选图片经过验证的页面数(checked)
+    和至少有一张图片通过验证的页面数(verified)。被跳过的策略每隔resample_interval个页面重新采样一次。
+    """
+    STRATEGIES = ('img', 'links', 'style', 'data_attrs', 'css', 'meta', 'scripts')
+    
+    def __init__(self, path, min_samples=5, resample_interval=10, decay_window=50, max_domains=2000):
+        self.path = path
+        self.min_samples = min_samples  # 样本数不足时总是运行
+        self.resample_interval = resample_interval  # 跳过多少次后重新采样
+        self.decay_window = decay_window  # 运行次数超过该值时计数减半，使统计偏向近期表现
+        self.max_domains = max_domains  # 最多保存的域名数量
+        self.domains = {}
+        self.lock = threading.Lock()
+    
+    def load(self):
+        """从磁盘加载统计数据，文件不存在或损坏时从空白开始（path为None时只在内存中统计）"""
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            domains = data.get("domains", {})
+            if isinstance(domains, dict):
+                with self.lock:
+                    self.domains = domains
+        except (OSError, ValueError, AttributeError):
+            pass
+    
+    def save(self):
+        """将统计数据写入磁盘（先写临时文件再替换，避免写入中断导致文件损坏）"""
+        if self.path is None:
+            return
+        with self.lock:
+            if len(self.domains) > self.max_domains:
+                # 只保留最近使用的域名
+                recent = sorted(self.domains.items(), key=lambda item: item[1].get("updated", 0), reverse=True)
+                self.domains = dict(recent[:self.max_domains])
+            data = json.dumps({"version": 1, "domains": self.domains}, ensure_ascii=False)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # 按进程和线程区分，服务模式下多个任务同时保存时互不干扰
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存策略统计出错: {str(e)}")
+    
+    def _get(self, domain, name):
+        entry = self.domains.setdefault(domain, {"updated": 0, "strategies": {}})
+        return entry["strategies"].setdefault(name, {"runs": 0, "yields": 0, "checked": 0, "verified": 0, "skips": 0})
+    
+    def _is_productive(self, stats):
+        if stats["runs"] < self.min_samples:
+            return True
+        if stats["yields"] == 0:
+            return False
+        # 产出的候选图片多次验证均未通过，同样视为无效
+        return not (stats["checked"] >= self.min_samples and stats["verified"] == 0)
+    
+    def select(self, domain):
+        """返回该域名本次应运行的策略集合"""
+        selected = set()
+        with self.lock:
+            for name in self.STRATEGIES:
+                stats = self._get(domain, name)
+                if self._is_productive(stats):
+                    selected.add(name)
+                    continue
+                stats["skips"] += 1
+                if stats["skips"] >= self.resample_interval:
+                    # 定期重新采样，网站改版后策略可以恢复
+                    stats["skips"] = 0
+                    selected.add(name)
+        return selected
+    
+    def record_extraction(self, domain, strategy_urls):
+        """记录一个页面上各策略的运行结果 {策略: 找到的图片URL集合}"""
+        with self.lock:
+            self.domains.setdefault(domain, {"updated": 0, "strategies": {}})["updated"] = time.time()
+            for name, urls in strategy_urls.items():
+                stats = self._get(domain, name)
+                stats["runs"] += 1
+                if urls:
+                    stats["yields"] += 1
+                if stats["runs"] > self.decay_window:
+                    for key in ("runs", "yields", "checked", "verified"):
+                        stats[key] //= 2
+    
+    def record_verification(self, domain, strategy_urls, verified_urls):
+        """记录一个页面上各策略产出的图片的验证结果"""
+        with self.lock:
+            for name, urls in strategy_urls.items():
+                if not urls:
+                    continue
+                stats = self._get(domain, name)
+                stats["checked"] += 1
+                if not urls.isdisjoint(verified_urls):
+                    stats["verified"] += 1
+
+class CrawlFrontier:
+    """同站爬取的待访问队列
+    
+    按(优先级, 深度)出队，分页链接优先；已见过的页面只在FingerprintSet中保存64位指纹，
+    百万页面约占16MB。
+    """
+    def __init__(self, max_depth, max_pages, max_size=100000):
+        self.max_depth = max_depth  # 最大链接深度（种子页面为0）
+        self.max_pages = max_pages  # 最多访问的页面数
+        self.max_size = max_size  # 队列中最多等待的页面数
+        self.heap = []
+        self.seen = FingerprintSet()
+        self.counter = itertools.count()  # 同优先级按发现顺序出队
+        self.scheduled = 0
+    
+    @staticmethod
+    def _fingerprint(url):
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+    
+    def add(self, url, depth, priority=0):
+        """加入待访问页面，已见过、超出深度或队列已满时返回False"""
+        if depth > self.max_depth or len(self.heap) >= self.max_size:
+            return False
+        if not self.seen.add(self._fingerprint(url)):
+            return False
+        heapq.heappush(self.heap, (priority, depth, next(self.counter), url))
+        return True
+    
+    def pop(self):
+        """取出下一个要访问的页面 (url, depth)，队列为空或已达页数上限时返回None"""
+        if not self.heap or self.scheduled >= self.max_pages:
+            return None
+        priority, depth, _, url = heapq.heappop(self.heap)
+        self.scheduled += 1
+        return url, depth
+    
+    def __len__(self):
+        return len(self.heap)
+
+class HostThrottle:
+    """按主机限制请求间隔，避免并发爬取时对同一站点请求过快"""
+    def __init__(self, delay):
+        self.delay = delay  # 同一主机两次请求之间的最小间隔（秒）
+        self.next_time = {}
+        self.lock = threading.Lock()
+    
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time.get(host, 0))
+            self.next_time[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+class NameRegistry:
+    """为一个输出目录分配不重复的文件名
+    
+    创建时扫描一次目录，之后在内存中记录已用的名称和每个文件名下一个要尝试的序号，
+    同名文件很多时也不需要逐个检查_1、_2...是否存在。名称按不区分大小写比较，
+    避免在Windows/macOS上出现只有大小写不同的冲突。
+    """
+    def __init__(self, directory=None):
+        self.lock = threading.Lock()
+        self.used = set()
+        self.next_suffix = {}  # {(文件名主体, 扩展名): 下一个尝试的序号}
+        if directory is not None and os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    self.used.add(entry.name.casefold())
+    
+    def reserve(self, filename):
+        """登记并返回一个未使用的文件名（已被占用时依次加_1、_2...）"""
+        with self.lock:
+            if filename.casefold() not in self.used:
+                self.used.add(filename.casefold())
+                return filename
+            base_name, ext = os.path.splitext(filename)
+            key = (base_name.casefold(), ext.casefold())
+            counter = self.next_suffix.get(key, 1)
+            while f"{base_name}_{counter}{ext}".casefold() in self.used:
+                counter += 1
+            self.next_suffix[key] = counter + 1
+            name = f"{base_name}_{counter}{ext}"
+            self.used.add(name.casefold())
+            return name
+
+class ImageEngine:
+    """图片提取、验证和下载引擎
+    
+    所有选项都是普通属性；进度和状态通过_post_status、_post_progress等钩子上报，
+    子类（图形界面或命令行）覆盖这些钩子决定如何显示。
+    """
+    def __init__(self, persist_stats=True):
+        # 性能优化设置
+        self.max_connections = 10  # 最大并发连接数
+        self.connection_timeout = 15  # 连接超时（秒）
+        self.max_image_size = 20 * 1024 * 1024  # 最大图片大小（20MB）
+        self.max_decode_pixels = 100 * 1000 * 1000  # 单张图片解码的像素上限，防止解压炸弹
+        self.probe_header_limit = 512 * 1024  # 探测图片尺寸时最多读取的字节数
+        self.chunk_size = 8192  # 文件下载分块大小
+        self.memory_limit = 100 * 1024 * 1024  # 内存使用限制（100MB）
+        self.script_size_limit = 8 * 1024 * 1024  # 单个脚本结构化解析的大小上限（8MB）
+        self.script_time_budget = 0.5  # 单个脚本解析的时间预算（秒）
+        self.crawl_delay = 1.0  # 同站爬取时同一主机的请求间隔（秒）
+        self.max_sitemaps = 1000  # 展开站点地图索引时最多读取的子站点地图数量
+        self.http = requests  # 发起HTTP请求的对象，可换成共享的requests.Session以复用连接池
+        
+        # 运行选项
+        self.max_workers = 5  # 并行分析网页的线程数
+        self.verify_workers = 10  # 并行验证图片的线程数
+        self.download_workers = 1  # 并行下载图片的线程数
+        self.verify_images = True  # 是否验证图片并按尺寸过滤
+        self.min_width = 0  # 最小宽度，0表示不限制
+        self.min_height = 0  # 最小高度，0表示不限制
+        self.skip_small_images = True  # 跳过小于50x50的图标
+        self.resolution_filter = None  # 只保留指定分辨率（如"800x600"），None表示不筛选
+        self.prefix = "image"  # 保存文件名前缀
+        self.archive = None  # 设置为归档写入器（如downloader_archive.ArchiveWriter）时图片写入归档分片而不是单独的文件
+        self.name_registries = {}  # 各保存目录的文件名登记 {目录绝对路径: NameRegistry}
+        self.name_registries_lock = threading.Lock()
+        self.layout = 'flat'  # 保存目录的组织方式，见OUTPUT_LAYOUTS
+        self.image_pages = {}  # page布局时记录图片来自哪个网页 {图片URL: 网页URL}
+        self.layout_lock = threading.Lock()  # 保护image_pages、已创建的子目录和清单写入
+        self.layout_dirs = set()
+        self.dedupe = False  # 按内容去重：相同内容只写入一次，其余文件名硬链接到同一份数据
+        self.dedupe_spool_size = 4 * 1024 * 1024  # 去重时在内存中缓冲的大小，超过后转存到临时文件
+        self.dedupe_hits = 0  # 内容已存在、未重复写入的图片数
+        self.file_manifests = {}  # 去重时各保存目录已有的清单记录 {保存目录绝对路径: {原始URL: 记录}}
+        self.dedupe_saved_bytes = 0  # 因此少写入的字节数
+        
+        # 运行状态
+        self.is_downloading = False  # 是否正在分析或下载，置为False即取消
+        
+        # 分辨率信息（验证时收集）
+        self.resolution_map = {}  # 完整分辨率映射 {url: "宽x高"}
+        self.width_map = {}       # 宽度映射 {url: 宽}
+        self.height_map = {}      # 高度映射 {url: 高}
+        
+        # 尺寸提示（从HTML属性、srcset描述符收集），用于验证前过滤明显过小的图片
+        self.size_hints = {}  # {url: (宽或None, 高或None)}
+        self.size_hints_lock = threading.Lock()
+        
+        # 内联图片（data URI）解码结果 {伪URL: (Content-Type, 图片数据)}
+        self.max_inline_image_size = 5 * 1024 * 1024  # 单张内联图片的大小上限（5MB）
+        self.inline_images = {}
+        self.inline_images_size = 0  # 已缓存内联图片的总字节数，受memory_limit限制
+        self.inline_images_lock = threading.Lock()
+        
+        # 配置目录，用于保存跨运行的统计数据
+        self.config_dir = os.path.join(os.path.expanduser("~"), ".url_image_downloader")
+        
+        # 按域名统计提取策略效果，跳过无效策略（persist_stats为False时不读写磁盘）
+        stats_path = os.path.join(self.config_dir, "strategy_stats.json") if persist_stats else None
+        self.strategy_stats = StrategyStats(stats_path)
+        self.strategy_stats.load()
+        self.page_strategy_urls = {}  # 等待验证结果的页面 {页面URL: (域名, {策略: 图片URL集合})}
+        self.page_strategy_lock = threading.Lock()
+    
+    def _post_status(self, message):
+        """上报状态消息（可能在工作线程中调用），子类覆盖"""
+        pass
+    
+    def _post_progress(self, stage, current, total):
+        """上报进度，stage为'analyze'、'verify'或'download'（可能在工作线程中调用），子类覆盖"""
+        pass
+    
+    def _on_url_started(self, index, url):
+        """开始分析URL列表中第index个URL时调用，子类覆盖"""
+        pass
+    
+    def _on_crawl_progress(self, done, queued, found, max_pages):
+        """爬取进度：已访问页数、待访问页数、已找到图片数，子类覆盖"""
+        pass
+    
+    def _on_page_error(self, url, error):
+        """网页获取或解析失败时调用（此时返回的图片列表为空，与没有图片的网页区分），子类覆盖"""
+        pass
+    
+    def reset_session(self):
+        """开始新一轮分析前清空尺寸提示和内联图片"""
+        with self.size_hints_lock:
+            self.size_hints = {}
+        with self.layout_lock:
+            self.image_pages = {}
+        self._reset_inline_images()
+    
+    def load_url_source(self, location):
+        """读取URL文件（txt列表，或站点地图/订阅源XML，支持.gz、URL和"-"标准输入）
+        
+        返回(去重后的页面UrlStore, 站点地图中直接列出的图片URL列表)。
+        """
+        with self._open_feed_source(location) as f:
+            head = f.peek(64)
+            if head.startswith(b'\xef\xbb\xbf'):
+                head = head[3:]  # UTF-8 BOM
+            if head.lstrip().startswith(b'<'):
+                # 站点地图或订阅源：流式解析
+                return self._expand_url_sources([], initial_sources=[(location, f)])
+            # 普通文本列表：逐行读取并去重，其中的站点地图/订阅源URL会被展开
+            return self._read_url_lines(f)
+    
+    def analyze_urls(self, urls, direct_image_urls=()):
+        """并行分析网页，返回提取到的图片URL列表（未验证）"""
+        total_urls = len(urls)
+        # 站点地图中直接列出的图片不需要分析网页
+        all_img_urls = list(direct_image_urls)
+        analyzed_count = 0
+        
+        max_workers = self.max_workers
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 按窗口提交任务，不为整个列表一次性创建future
+            pending = {}
+            url_iter = enumerate(urls)
+            self._post_progress('analyze', 0, total_urls)
+            
+            # 收集结果
+            while self.is_downloading:  # 如果取消了分析则停止
+                for index, url in itertools.islice(url_iter, max_workers * 4 - len(pending)):
+                    pending[executor.submit(self._analyze_single_url_parallel, url, index)] = url
+                if not pending:
+                    break
+                
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    url = pending.pop(future)
+                    try:
+                        img_urls = future.result()
+                        if img_urls:
+                            all_img_urls.extend(img_urls)
+                            self._record_image_pages(url, img_urls)
+                            
+                    except Exception as e:
+                        self._post_status(f"分析 {url} 时出错: {str(e)}")
+                    
+                    # 更新已分析URL数量
+                    analyzed_count += 1
+                self._post_progress('analyze', analyzed_count, total_urls)
+            
+            # 取消时丢弃尚未开始的任务
+            for future in pending:
+                future.cancel()
+        
+        return all_img_urls
+    
+    def crawl_site(self, seeds, max_depth, max_pages):
+        """同站爬取：从种子页面出发，按优先级访问同站链接，返回提取到的图片URL列表（未验证）"""
+        frontier = CrawlFrontier(max_depth, max_pages)
+        for seed in seeds:
+            frontier.add(seed, 0)
+        throttle = HostThrottle(self.crawl_delay)
+        max_workers = self.max_workers
+        
+        all_img_urls = set()
+        pages_done = 0
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            while self.is_downloading:
+                # 保持线程池满载，多提交一些以掩盖同主机的等待间隔
+                while len(pending) < max_workers * 2:
+                    item = frontier.pop()
+                    if item is None:
+                        break
+                    page_url, depth = item
+                    future = executor.submit(self._crawl_single_page, page_url, depth, throttle)
+                    pending[future] = (page_url, depth)
+                
+                if not pending:
+                    break
+                
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    page_url, depth = pending.pop(future)
+                    pages_done += 1
+                    try:
+                        img_urls, links = future.result()
+                    except Exception as e:
+                        self._post_status(f"爬取 {page_url} 时出错: {str(e)}")
+                        continue
+                    
+                    all_img_urls.update(img_urls)
+                    self._record_image_pages(page_url, img_urls)
+                    if depth < max_depth:
+                        for link, priority in links:
+                            frontier.add(link, depth + 1, priority)
+                
+                self._on_crawl_progress(pages_done, len(frontier), len(all_img_urls), max_pages)
+            
+            if not self.is_downloading:
+                # 取消时不再等待排队中的页面
+                for future in pending:
+                    future.cancel()
+        
+        return list(all_img_urls)
+    
+    def finish_images(self, img_urls):
+        """分析结束后：按选项验证图片，并把验证结果计入策略统计，返回最终的图片URL列表"""
+        if self.verify_images and img_urls:
+            self._post_status("验证图片中...")
+            img_urls = self._verify_images(img_urls)
+            
+            # 未被取消时，将验证结果计入策略统计
+            self._record_strategy_verification(img_urls if self.is_downloading else None)
+        else:
+            self._record_strategy_verification()
+        return img_urls
+    
+    def download_images(self, img_urls, save_path):
+        """下载图片到save_path，返回成功下载的数量"""
+        # 每批下载开始时重新扫描目录，反映两次下载之间对目录的改动
+        with self.name_registries_lock:
+            self.name_registries = {}
+        with self.layout_lock:
+            self.file_manifests = {}
+        total = len(img_urls)
+        success_count = 0
+        done_count = 0
+        
+        def download_one(i, img_url):
+            if not self.is_downloading:
+                return None
+            try:
+                return self._save_image(img_url, save_path, i)
+            except Exception as e:
+                self._post_status(f"下载失败 ({i+1}/{total}): {str(e)}")
+                return None
+        
+        self._post_progress('download', 0, total)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            futures = [executor.submit(download_one, i, img_url) for i, img_url in enumerate(img_urls)]
+            for future in concurrent.futures.as_completed(futures):
+                done_count += 1
+                if future.result():
+                    success_count += 1
+                self._post_progress('download', done_count, total)
+        
+        return success_count
+    
+    def _save_image(self, img_url, save_path, index):
+        """下载单张图片并保存，index用于URL中没有文件名时生成文件名，返回保存路径
+        
+        设置了archive时写入归档分片，返回"分片路径#成员名"。
+        """
+        # 下载图片
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Referer': img_url
+        }
+        response = self._get_image_response(img_url, headers=headers, timeout=15, stream=True)
+        with response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            filename = self._image_filename(img_url, content_type, index)
+            
+            if self.archive is not None:
+                # 归档分片由多个下载线程共用，先在内存中收齐（受max_image_size限制）再整体写入
+                content = b''.join(self._iter_image_chunks(response, img_url))
+                return self.archive.add(filename, content, url=img_url, content_type=content_type)
+            
+            if self.dedupe and self.layout != 'content-hash':
+                # content-hash布局本身就按内容存放，无需另外去重
+                save_file_path, size, digest, is_new = self._save_deduplicated(response, img_url, save_path, filename)
+                if not is_new:
+                    return save_file_path  # 同一URL、相同内容已有文件和清单记录
+            elif self.layout == 'content-hash':
+                # 内容哈希要下载完才知道：先写入临时文件，再移动到以哈希命名的位置（相同内容只保留一份）
+                fd, tmp_path = tempfile.mkstemp(prefix=".partial-", dir=save_path)
+                try:
+                    with open(fd, 'wb') as f:
+                        size, digest = self._write_image_chunks(f, response, img_url)
+                    directory = self._layout_directory(save_path, os.path.join(digest[:2], digest[2:4]))
+                    save_file_path = os.path.join(directory, digest + os.path.splitext(filename)[1])
+                    os.replace(tmp_path, save_file_path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            else:
+                directory = self._layout_directory(save_path, self._layout_subdir(img_url))
+                
+                # 从登记中取得不重复的文件名，并以独占方式创建（并行下载或其他程序同时写入时也不会互相覆盖）
+                registry = self._name_registry(directory)
+                while True:
+                    save_file_path = os.path.join(directory, registry.reserve(filename))
+                    try:
+                        f = open(save_file_path, 'xb')
+                        break
+                    except FileExistsError:
+                        continue  # 扫描目录之后才出现的文件，已登记，换下一个名字
+                
+                # 边下载边写入，不在内存中保留整张图片
+                try:
+                    with f:
+                        size, digest = self._write_image_chunks(f, response, img_url)
+                except BaseException:
+                    os.remove(save_file_path)
+                    raise
+        
+        if self.layout != 'flat' or self.dedupe:
+            self._record_layout_entry(save_path, img_url, save_file_path, size, digest)
+        return save_file_path
+    
+    def _save_deduplicated(self, response, img_url, save_path, filename):
+        """边下载边计算哈希，内容不在存储中时才写入，再把文件名硬链接到存储中的数据
+        
+        存储位于保存目录下的.store/，跨网页、跨多次运行共用。无法创建硬链接时（如文件系统不支持）
+        不再另存副本，返回存储中的路径，由清单记录这一引用。返回(保存路径, 字节数, SHA-256, 是否新建)；
+        清单中已有同一URL、相同内容且仍链接到存储的文件时直接沿用，不再新建文件名和清单记录。
+        """
+        with tempfile.SpooledTemporaryFile(max_size=self.dedupe_spool_size) as spool:
+            size, digest = self._write_image_chunks(spool, response, img_url)
+            store_dir = self._layout_directory(save_path, os.path.join(DEDUPE_STORE_DIR, digest[:2], digest[2:4]))
+            blob_path = os.path.join(store_dir, digest)
+            if os.path.exists(blob_path):
+                with self.layout_lock:
+                    self.dedupe_hits += 1
+                    self.dedupe_saved_bytes += size
+            else:
+                # 先写临时文件再原子替换，同时下载相同内容的线程或进程不会看到写了一半的数据
+                spool.seek(0)
+                fd, tmp_path = tempfile.mkstemp(prefix=".partial-", dir=store_dir)
+                try:
+                    with open(fd, 'wb') as f:
+                        shutil.copyfileobj(spool, f, 1024 * 1024)
+                    os.replace(tmp_path, blob_path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+        
+        directory = self._layout_directory(save_path, self._layout_subdir(img_url))
+        existing = self._file_manifest(save_path).get(img_url)
+        if existing is not None and existing.get('sha256') == digest:
+            existing_path = os.path.normpath(os.path.join(save_path, existing['path']))
+            try:
+                if (os.path.dirname(existing_path) in (os.path.normpath(directory), os.path.normpath(store_dir))
+                        and os.path.samefile(existing_path, blob_path)):
+                    return existing_path, size, digest, False
+            except OSError:
+                pass  # 文件已被删除，重新链接
+        
+        registry = self._name_registry(directory)
+        while True:
+            save_file_path = os.path.join(directory, registry.reserve(filename))
+            try:
+                os.link(blob_path, save_file_path)  # 目标已存在时失败，与独占创建效果相同
+                return save_file_path, size, digest, True
+            except FileExistsError:
+                continue
+            except OSError:
+                return blob_path, size, digest, True
+    
+    def _file_manifest(self, save_path):
+        """取得保存目录清单中每个URL的最后一条记录，首次使用时读取"""
+        key = os.path.abspath(save_path)
+        with self.layout_lock:
+            manifest = self.file_manifests.get(key)
+            if manifest is None:
+                manifest = self.file_manifests[key] = _read_file_manifest(save_path)
+        return manifest
+    
+    def _write_image_chunks(self, f, response, img_url):
+        """把响应内容边下载边写入文件，返回(字节数, SHA-256十六进制摘要)"""
+        hasher = hashlib.sha256()
+        size = 0
+        for chunk in self._iter_image_chunks(response, img_url):
+            f.write(chunk)
+            hasher.update(chunk)
+            size += len(chunk)
+        return size, hasher.hexdigest()
+    
+    def _layout_subdir(self, img_url):
+        """按layout计算图片所在的子目录（相对保存目录），flat布局返回空字符串"""
+        if self.layout == 'url-hash':
+            digest = hashlib.sha1(img_url.encode('utf-8')).hexdigest()
+            return os.path.join(digest[:2], digest[2:4])
+        if self.layout == 'host':
+            # 内联图片的伪URL（inline://sha256/...）没有真正的主机
+            if img_url.startswith(INLINE_IMAGE_PREFIX):
+                return 'inline'
+            return self._safe_dirname(urlparse(img_url).netloc or 'inline')
+        if self.layout == 'page':
+            with self.layout_lock:
+                page_url = self.image_pages.get(img_url, img_url)
+            if page_url.startswith(INLINE_IMAGE_PREFIX):
+                return 'inline'  # 来源网页未知的内联图片
+            parts = urlparse(page_url)
+            # 可读的主机+路径，附加短哈希区分截断后相同的名称
+            readable = self._safe_dirname(f"{parts.netloc}{parts.path}".rstrip('/'))[:80]
+            return f"{readable}_{hashlib.sha1(page_url.encode('utf-8')).hexdigest()[:8]}"
+        return ''
+    
+    def _safe_dirname(self, text):
+        """把主机名或网页路径转换为合法的目录名"""
+        return re.sub(r'[\\/*?:"<>|\s]+', "_", text).strip('._') or '_'
+    
+    def _layout_directory(self, save_path, subdir):
+        """返回保存目录下的子目录路径，首次使用时创建"""
+        directory = os.path.join(save_path, subdir) if subdir else save_path
+        with self.layout_lock:
+            if directory not in self.layout_dirs:
+                os.makedirs(directory, exist_ok=True)
+                self.layout_dirs.add(directory)
+        return directory
+    
+    def _record_image_pages(self, page_url, img_urls):
+        """page布局时记录图片来自哪个网页（多个网页包含同一图片时取第一个）"""
+        if self.layout != 'page':
+            return
+        with self.layout_lock:
+            for img_url in img_urls:
+                self.image_pages.setdefault(img_url, page_url)
+    
+    def _record_layout_entry(self, save_path, img_url, file_path, size, digest):
+        """向保存目录的清单追加一条 原始URL -> 保存路径 记录，之后查找无需扫描目录"""
+        record = {
+            'url': img_url,
+            'path': os.path.relpath(file_path, save_path).replace(os.sep, '/'),
+            'size': size,
+            'sha256': digest,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.layout_lock:
+            with open(os.path.join(save_path, LAYOUT_MANIFEST_NAME), 'a', encoding='utf-8') as f:
+                f.write(line)
+            manifest = self.file_manifests.get(os.path.abspath(save_path))
+            if manifest is not None:
+                manifest[img_url] = record
+    
+    def _name_registry(self, save_path):
+        """取得保存目录的文件名登记，首次使用时扫描目录"""
+        key = os.path.abspath(save_path)
+        with self.name_registries_lock:
+            registry = self.name_registries.get(key)
+            if registry is None:
+                registry = self.name_registries[key] = NameRegistry(save_path)
+        return registry
+    
+    def _iter_image_chunks(self, response, img_url):
+        """按块读取图片内容，超过max_image_size时抛出ValueError"""
+        received = 0
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            received += len(chunk)
+            if received > self.max_image_size:
+                raise ValueError(f"图片超过大小上限: {img_url}")
+            yield chunk
+    
+    def _image_filename(self, img_url, content_type, index):
+        """根据URL或Content-Type生成带前缀的合法文件名"""
+        # 获取文件名前缀
+        prefix = self.prefix.strip() or "image"  # 如果前缀为空，使用默认值
+        
+        # 从URL或Content-Type获取文件扩展名
+        filename = os.path.basename(urlparse(img_url).path)
+        if filename and '.' in filename:
+            # 从URL提取文件名和扩展名
+            base_name, ext = os.path.splitext(filename)
+            # 确保扩展名是小写字母
+            ext = ext.lower()
+            # 在原文件名前添加前缀
+            filename = f"{prefix}_{base_name}{ext}"
+        else:
+            # 从Content-Type确定文件扩展名
+            if 'jpeg' in content_type or 'jpg' in content_type:
+                ext = '.jpg'
+            elif 'png' in content_type:
+                ext = '.png'
+            elif 'gif' in content_type:
+                ext = '.gif'
+            elif 'webp' in content_type:
+                ext = '.webp'
+            elif 'bmp' in content_type:
+                ext = '.bmp'
+            elif 'svg' in content_type:
+                ext = '.svg'
+            else:
+                ext = '.jpg'  # 默认扩展名
+        
+            # 使用前缀和序号生成文件名
+            filename = f"{prefix}_{index+1}{ext}"
+        
+        # 确保文件名合法
+        return re.sub(r'[\\/*?:"<>|]', "_", filename)
+    
+    def _read_url_lines(self, stream):
+        """逐行读取URL（不整体读入内存），返回(去重后的UrlStore, 站点地图中的图片URL列表)"""
+        store = UrlStore()
+        feed_urls = []
+        line_count = 0
+        for raw_line in stream:
+            line_count += 1
+            line = raw_line.strip()
+            if line and not line.startswith(b'#'):
+                url = line.decode('utf-8', 'ignore')
+                if self._is_feed_url(url):
+                    feed_urls.append(url)
+                else:
+                    store.add(url)
+            
+            if line_count % 100000 == 0:
+                self._post_status(f"已读取 {line_count} 行，去重后 {len(store)} 个URL...")
+        
+        image_urls = []
+        if feed_urls:
+            store, image_urls = self._expand_url_sources(feed_urls, page_urls=store)
+        return store, image_urls
+    
+    def _is_feed_url(self, url):
+        """根据URL路径判断是否为站点地图或订阅源（加载大文件时逐行调用，避免完整解析URL）"""
+        path = url.split('#', 1)[0].split('?', 1)[0]
+        return path.lower().endswith(FEED_URL_SUFFIXES)
+    
+    def _open_feed_source(self, location):
+        """打开站点地图/订阅源（本地路径或URL），返回支持peek的二进制流，自动识别gzip"""
+        if location == '-':
+            stream = sys.stdin.buffer
+        elif location.startswith(('http://', 'https://')):
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            }
+            response = self.http.get(location, headers=headers, timeout=self.connection_timeout, stream=True)
+            response.raise_for_status()
+            response.raw.decode_content = True  # 处理Content-Encoding: gzip
+            response.raw.auto_close = False  # 读到末尾时不自动关闭，否则缓冲区中的数据无法读取
+            stream = io.BufferedReader(response.raw)
+        else:
+            stream = open(location, 'rb')
+        
+        # .xml.gz文件本身是gzip压缩的
+        if stream.peek(2)[:2] == b'\x1f\x8b':
+            stream = io.BufferedReader(gzip.GzipFile(fileobj=stream))
+        return stream
+    
+    def _iter_feed_entries(self, stream):
+        """流式解析站点地图/订阅源，逐条产生 ('page'|'image'|'sitemap', url)
+        
+        条目中已经列出图片（image:image、图片enclosure、media:content）时只产生图片，
+        不再产生页面，避免再去分析网页。
+        """
+        parents = []  # 当前元素的祖先链，RSS的item在channel之下，需要从实际的父元素上移除
+        for event, elem in ElementTree.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                parents.append(elem)
+                continue
+            parents.pop()
+            
+            tag = elem.tag.rsplit('}', 1)[-1].lower()
+            if tag not in FEED_ENTRY_TAGS:
+                continue
+            
+            page_url = None
+            image_urls = []
+            for child in elem:
+                child_tag = child.tag.rsplit('}', 1)[-1].lower()
+                if child_tag == 'loc' and child.text and page_url is None:
+                    page_url = child.text.strip()
+                elif child_tag == 'image':
+                    # 图片站点地图扩展 <image:image><image:loc>
+                    for image_child in child:
+                        if image_child.tag.rsplit('}', 1)[-1].lower() == 'loc' and image_child.text:
+                            image_urls.append(image_child.text.strip())
+                elif child_tag == 'link':
+                    rel = (child.get('rel') or 'alternate').lower()
+                    href = child.get('href')
+                    if href and rel == 'enclosure' and (child.get('type') or '').startswith('image/'):
+                        image_urls.append(href.strip())
+                    elif href and rel == 'alternate' and page_url is None:
+                        page_url = href.strip()  # Atom
+                    elif not href and child.text and page_url is None:
+                        page_url = child.text.strip()  # RSS
+                elif child_tag in ('enclosure', 'content', 'group'):
+                    # RSS enclosure、media:content（可能包在media:group中）
+                    media_items = list(child) if child_tag == 'group' else [child]
+                    for media in media_items:
+                        media_url = media.get('url')
+                        media_type = media.get('type') or ''
+                        if media_url and (media_type.startswith('image/') or media.get('medium') == 'image'
+                                          or (not media_type and self._is_image_url(media_url))):
+                            image_urls.append(media_url.strip())
+            
+            if tag == 'sitemap':
+                if page_url:
+                    yield 'sitemap', page_url
+            elif image_urls:
+                for image_url in image_urls:
+                    yield 'image', image_url
+            elif page_url:
+                yield 'page', page_url
+            
+            # 释放已处理的元素，保持内存占用平稳
+            elem.clear()
+            if parents:
+                parents[-1].remove(elem)
+    
+    def _expand_url_sources(self, urls, initial_sources=None, page_urls=None):
+        """展开URL列表中的站点地图/订阅源（含站点地图索引），返回(页面UrlStore, 图片URL列表)
+        
+        传入page_urls时，页面URL追加到该UrlStore中。
+        """
+        page_urls = page_urls if page_urls is not None else UrlStore()
+        image_urls = []
+        seen_images = set()
+        sitemap_queue = collections.deque(initial_sources or [])
+        
+        for url in urls:
+            if self._is_feed_url(url):
+                sitemap_queue.append((url, None))
+            else:
+                page_urls.add(url)
+        
+        sitemaps_read = 0
+        visited_sitemaps = set()
+        while sitemap_queue and sitemaps_read < self.max_sitemaps:
+            location, stream = sitemap_queue.popleft()
+            if location in visited_sitemaps:
+                continue
+            visited_sitemaps.add(location)
+            sitemaps_read += 1
+            self._post_status(f"读取站点地图: {location}")
+            
+            try:
+                if stream is None:
+                    stream = self._open_feed_source(location)
+                with stream:
+                    for kind, entry_url in self._iter_feed_entries(stream):
+                        if kind == 'sitemap':
+                            sitemap_queue.append((entry_url, None))
+                        elif kind == 'page':
+                            page_urls.add(entry_url)
+                        elif entry_url not in seen_images:
+                            seen_images.add(entry_url)
+                            image_urls.append(entry_url)
+            except (requests.exceptions.RequestException, ElementTree.ParseError, OSError, EOFError) as e:
+                self._post_status(f"读取站点地图 {location} 出错: {str(e)}")
+        
+        return page_urls, image_urls
+    
+    def _analyze_single_url_parallel(self, url, index):
+        """并行分析单个URL的函数（供线程池使用），index为URL在列表中的位置"""
+        try:
+            # 通知界面当前处理的URL
+            self._on_url_started(index, url)
+            
+            # 显示当前处理的URL
+            self._post_status(f"分析: {url}")
+            
+            # 检查URL是否直接指向图片
+            if self._is_direct_image_url(url):
+                return [url]
+            
+            # 提取网页中的图片
+            img_urls = self._extract_images_from_url(url)
+            
+            # 记录提取结果
+            count = len(img_urls)
+            self._post_status(f"从 {url} 提取到 {count} 张图片")
+            
+            return img_urls
+                
+        except Exception as e:
+            self._post_status(f"分析 {url} 时出错: {str(e)}")
+            self._on_page_error(url, e)
+            return []
+    
+    def _crawl_single_page(self, url, depth, throttle):
+        """爬取单个页面，返回(图片URL列表, [(同站链接, 优先级)])"""
+        throttle.wait(urlparse(url).netloc.lower())
+        self._post_status(f"爬取 (深度{depth}): {url}")
+        
+        # 种子本身可能直接指向图片
+        if depth == 0 and self._is_direct_image_url(url):
+            return [url], []
+        
+        links = []
+        img_urls = self._extract_images_from_url(url, page_links=links)
+        return img_urls, links
+    
+    def _collect_page_links(self, soup, page_url, page_links):
+        """收集同站页面链接及优先级（数值越小越优先，分页链接优先）"""
+        site = self._site_key(urlparse(page_url).netloc)
+        for tag in soup.find_all(['a', 'link'], href=True):
+            rel = [value.lower() for value in (tag.get('rel') or [])]
+            if tag.name == 'link' and 'next' not in rel:
+                continue
+            href = tag['href'].strip()
+            if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:', 'data:')):
+                continue
+            
+            link = urllib.parse.urldefrag(urllib.parse.urljoin(page_url, href))[0]
+            parsed = urlparse(link)
+            if parsed.scheme not in ('http', 'https') or self._site_key(parsed.netloc) != site:
+                continue
+            path = parsed.path.lower()
+            if path.endswith(NON_PAGE_EXTENSIONS) or self._is_image_url(link):
+                continue
+            
+            is_pagination = 'next' in rel or bool(PAGINATION_RE.search(link))
+            page_links.append((link, -1 if is_pagination else 0))
+    
+    def _site_key(self, netloc):
+        """同站判断使用的主机名（忽略大小写、端口和www.前缀）"""
+        host = netloc.lower().rsplit('@', 1)[-1].split(':')[0]
+        return host[4:] if host.startswith('www.') else host
+    
+    def _verify_images(self, img_urls):
+        """验证图片有效性并过滤尺寸"""
+        
+        # 图片分辨率映射字典，用于保存分辨率信息
+        self.resolution_map = {}
+        self.width_map = {}
+        self.height_map = {}
+        
+        # 根据HTML和URL中的尺寸提示预先过滤，省去对小图标的网络请求
+        hinted_urls = self._prefilter_by_size_hints(img_urls, self.min_width, self.min_height,
+                                                    self.skip_small_images)
+        skipped = len(img_urls) - len(hinted_urls)
+        if skipped:
+            self._post_status(f"根据尺寸提示跳过 {skipped} 张小图片")
+        img_urls = hinted_urls
+        total = len(img_urls)
+        if not img_urls:
+            return []
+        
+        # 创建线程安全的计数器和结果列表
+        self.verified_count = 0
+        self.verified_lock = threading.Lock()
+        thread_safe_valid_urls = []
+        thread_safe_resolution_map = {}
+        thread_safe_width_map = {}
+        thread_safe_height_map = {}
+        
+        # 定义验证单个图片的函数
+        def verify_single_image(url, index):
+            if not self.is_downloading:
+                return None
+                
+            try:
+                # 获取图片尺寸
+                info = self._probe_image(url)
+                if info is None:
+                    return None
+                width, height, _ = info
+                
+                # 存储分辨率信息到线程安全的字典
+                with self.verified_lock:
+                    thread_safe_resolution_map[url] = f"{width}x{height}"
+                    thread_safe_width_map[url] = width
+                    thread_safe_height_map[url] = height
+                
+                # 图片验证通过时返回URL
+                return url if self._passes_size_filter(width, height) else None
+                
+            except Exception:
+                # 如果验证失败，跳过这个URL
+                return None
+            finally:
+                # 更新验证进度
+                with self.verified_lock:
+                    self.verified_count += 1
+        
+        # 使用线程池并行验证图片
+        self._post_progress('verify', 0, total)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.verify_workers) as executor:
+            # 提交所有验证任务到线程池
+            future_to_url = {executor.submit(verify_single_image, url, i): url 
+                           for i, url in enumerate(img_urls)}
+            
+            # 收集验证结果
+            for future in concurrent.futures.as_completed(future_to_url):
+                if not self.is_downloading:
+                    break
+                    
+                result = future.result()
+                if result:
+                    thread_safe_valid_urls.append(result)
+                self._post_progress('verify', self.verified_count, total)
+        
+        # 更新全局分辨率映射
+        self.resolution_map = thread_safe_resolution_map
+        self.width_map = thread_safe_width_map
+        self.height_map = thread_safe_height_map
+        
+        return thread_safe_valid_urls
+    
+    def _probe_image(self, url):
+        """获取图片的(宽, 高, Content-Type)，只下载到文件头；不是图片时返回None"""
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        response = self._get_image_response(url, headers=headers, timeout=10, stream=True)
+        
+        # 如果内容类型不是图片，跳过
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type.startswith('image/'):
+            response.close()
+            return None
+        
+        width, height = self._probe_image_size(response)
+        return width, height, content_type
+    
+    def _passes_size_filter(self, width, height):
+        """按skip_small_images、min_width/min_height和resolution_filter检查尺寸"""
+        # 跳过小图标
+        if self.skip_small_images and (width < 50 or height < 50):
+            return False
+            
+        # 检查最小尺寸
+        if (self.min_width > 0 and width < self.min_width) or (self.min_height > 0 and height < self.min_height):
+            return False
+        
+        # 如果开启了分辨率筛选
+        if self.resolution_filter and f"{width}x{height}" != self.resolution_filter:
+            return False
+        
+        return True
+    
+    def _extract_images_from_url(self, url, page_links=None):
+        """提取网页中的图片URL；传入page_links列表时同时收集同站页面链接（爬取模式）"""
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            'Referer': url
+        }
+        
+        try:
+            # 设置更长的超时时间，有些网站加载较慢
+            response = self.http.get(url, headers=headers, timeout=self.connection_timeout, stream=True)
+            response.raise_for_status()
+            
+            # 读取原始字节，最多读取memory_limit，深度搜索直接复用这些字节
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                chunks.append(chunk)
+                received += len(chunk)
+                if received >= self.memory_limit:
+                    # 内容太大，只分析部分
+                    self._post_status(f"警告: {url} 内容过大，只分析部分内容")
+                    break
+            response.close()
+            html_bytes = b''.join(chunks)[:self.memory_limit]
+            del chunks
+            
+            # 响应头未声明编码时（requests默认ISO-8859-1），交给BeautifulSoup根据meta和内容检测
+            encoding = response.encoding
+            if not encoding or encoding == 'ISO-8859-1':
+                encoding = None
+            
+            # 使用更快速的HTML解析方法
+            soup = BeautifulSoup(html_bytes, 'html.parser', from_encoding=encoding)
+            base_url = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(url))
+            
+            # 爬取模式下收集同站页面链接
+            if page_links is not None:
+                self._collect_page_links(soup, response.url or url, page_links)
+            
+            # 查找所有图片链接
+            img_urls = set()  # 使用集合避免重复
+            size_hints = {}  # 本页收集到的尺寸提示 {url: (宽, 高)}
+            
+            # 根据该域名的历史统计选择要运行的提取策略
+            domain = urlparse(url).netloc.lower()
+            strategies = self.strategy_stats.select(domain)
+            skipped = [name for name in StrategyStats.STRATEGIES if name not in strategies]
+            if skipped:
+                self._post_status(f"{domain} 跳过无效策略: {', '.join(skipped)}")
+            strategy_urls = {name: set() for name in strategies}  # 各策略找到的图片
+            
+            # 1. 从常规img标签获取图片
+            if 'img' in strategies:
+                found = strategy_urls['img']
+                for img in soup.find_all('img'):
+                    # 读取width/height属性作为尺寸提示
+                    attr_width = self._parse_size_attr(img.get('width'))
+                    attr_height = self._parse_size_attr(img.get('height'))
+                    
+                    # 检查多种可能的属性
+                    for attr in ['src', 'data-src', 'data-original', 'data-lazyload', 'data-lazy', 
+                                 'data-original-src', 'data-source', 'data-srcset', 'srcset',
+                                 'data-url', 'data-img', 'data-bg-src', 'data-image']:
+                        src = img.get(attr)
+                        if src:
+                            # 处理srcset属性（包含多个URL）
+                            if attr == 'srcset':
+                                # 提取srcset中的所有URL及其描述符
+                                for srcset_url, value, unit in SRCSET_CANDIDATE_RE.findall(src):
+                                    added = self._add_url_to_set(found, srcset_url, base_url, url)
+                                    if not added or not value:
+                                        continue
+                                    if unit == 'w':
+                                        # w描述符即图片的实际宽度
+                                        self._record_size_hint(size_hints, added, int(float(value)), None)
+                                    elif attr_width is not None:
+                                        # x描述符按显示宽度的倍数估算
+                                        height = int(attr_height * float(value)) if attr_height is not None else None
+                                        self._record_size_hint(size_hints, added, int(attr_width * float(value)), height)
+                            else:
+                                added = self._add_url_to_set(found, src, base_url, url)
+                                if added and (attr_width is not None or attr_height is not None):
+                                    self._record_size_hint(size_hints, added, attr_width, attr_height)
+            
+            # 2. 从a标签中寻找图片链接
+            if 'links' in strategies:
+                found = strategy_urls['links']
+                for a in soup.find_all('a'):
+                    href = a.get('href')
+                    if href and self._is_image_url(href):
+                        self._add_url_to_set(found, href, base_url, url)
+                    
+            # 3. 从style属性中提取背景图片
+            if 'style' in strategies:
+                found = strategy_urls['style']
+                for tag in soup.find_all(lambda tag: tag.has_attr('style')):
+                    style = tag['style']
+                    urls = re.findall(r'background(?:-image)?\s*:\s*url\s*\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)', style)
+                    for bg_url in urls:
+                        self._add_url_to_set(found, bg_url, base_url, url)
+            
+            # 4. 从所有标签的data-background属性中查找
+            if 'data_attrs' in strategies:
+                found = strategy_urls['data_attrs']
+                for tag in soup.find_all():
+                    for attr in ['data-background', 'data-bg', 'data-original', 'data-src', 'data-url', 'data-img']:
+                        bg_url = tag.get(attr)
+                        if bg_url:
+                            self._add_url_to_set(found, bg_url, base_url, url)
+            
+            # 5. 从CSS文件中提取背景图片
+            if 'css' in strategies:
+                found = strategy_urls['css']
+                for link in soup.find_all('link', rel='stylesheet'):
+                    css_url = link.get('href')
+                    if css_url:
+                        try:
+                            css_full_url = urllib.parse.urljoin(url, css_url)
+                            css_response = self.http.get(css_full_url, headers=headers, timeout=10)
+                            css_text = css_response.text
+                            bg_urls = re.findall(r'background(?:-image)?\s*:\s*url\s*\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)', css_text)
+                            for bg_url in bg_urls:
+                                self._add_url_to_set(found, bg_url, base_url, css_full_url)
+                        except Exception:
+                            # 忽略CSS获取错误
+                            pass
+            
+            # 6. 从meta标签中获取图片
+            if 'meta' in strategies:
+                found = strategy_urls['meta']
+                for meta in soup.find_all('meta'):
+                    if meta.get('property') in ['og:image', 'twitter:image', 'og:image:secure_url']:
+                        content = meta.get('content')
+                        if content:
+                            self._add_url_to_set(found, content, base_url, url)
+            
+            # 7. 从JSON数据中提取图片URL (针对一些使用JavaScript加载图片的网站)
+            # JSON-LD、__NEXT_DATA__等结构化数据按JSON解析，普通脚本才使用正则
+            if 'scripts' in strategies:
+                found = strategy_urls['scripts']
+                for script in soup.find_all('script'):
+                    if script.string:
+                        self._extract_images_from_script(script, found, base_url, url)
+            
+            for found in strategy_urls.values():
+                img_urls |= found
+            
+            # 记录各策略的产出，验证完成后再记录验证结果
+            self.strategy_stats.record_extraction(domain, strategy_urls)
+            with self.page_strategy_lock:
+                self.page_strategy_urls[url] = (domain, strategy_urls)
+            
+            # 保存尺寸提示，供验证前过滤使用
+            if size_hints:
+                with self.size_hints_lock:
+                    for hint_url, (width, height) in size_hints.items():
+                        self._record_size_hint(self.size_hints, hint_url, width, height)
+            
+            # 将集合转为列表
+            img_urls_list = list(img_urls)
+            
+            if not img_urls_list:
+                # 如果找不到图片，可能是因为网页使用了特殊的加载方式
+                # 尝试更深入的搜索
+                self._deep_search_images(html_bytes, img_urls, base_url, url, soup.original_encoding)
+                img_urls_list = list(img_urls)
+            
+            # 在状态栏显示找到的图片数量
+            self._post_status(f"从 {url} 找到 {len(img_urls_list)} 张图片")
+            
+            return img_urls_list
+            
+        except Exception as e:
+            self._post_status(f"处理URL时出错: {str(e)}")
+            self._on_page_error(url, e)
+            return []
+    
+    def _extract_images_from_script(self, script, img_urls, base_url, page_url):
+        """从script标签中提取图片URL，优先结构化解析JSON，失败时回退到正则"""
+        text = script.string
+        if len(text) > self.script_size_limit:
+            # 超出预算的脚本只用正则扫描前面一部分
+            text = text[:self.script_size_limit]
+            for img_url in SCRIPT_IMAGE_RE.findall(text):
+                self._add_url_to_set(img_urls, img_url, base_url, page_url)
+            return
+        
+        deadline = time.monotonic() + self.script_time_budget
+        script_type = (script.get('type') or '').split(';')[0].strip().lower()
+        
+        # 1. 整个脚本就是JSON（JSON-LD、Next.js的__NEXT_DATA__等）
+        if script_type in JSON_SCRIPT_TYPES or script.get('id') in JSON_SCRIPT_IDS:
+            try:
+                data = json.loads(text)
+            except ValueError:
+                pass
+            else:
+                self._collect_json_image_urls(data, img_urls, base_url, page_url, deadline)
+                return
+        
+        # 2. 内联JSON赋值，如 window.__INITIAL_STATE__ = {...}
+        decoder = json.JSONDecoder()
+        parsed_any = False
+        position = 0
+        while time.monotonic() < deadline:
+            match = JSON_ASSIGNMENT_RE.search(text, position)
+            if not match:
+                break
+            try:
+                data, end = decoder.raw_decode(text, match.end())
+            except ValueError:
+                # 不是合法JSON（普通JS对象字面量），继续查找下一个赋值
+                position = match.end()
+                continue
+            if isinstance(data, (dict, list)) and data:
+                parsed_any = True
+                self._collect_json_image_urls(data, img_urls, base_url, page_url, deadline)
+            position = end
+        
+        # 3. 普通JavaScript，使用正则查找图片URL
+        if not parsed_any:
+            for img_url in SCRIPT_IMAGE_RE.findall(text):
+                self._add_url_to_set(img_urls, img_url, base_url, page_url)
+    
+    def _collect_json_image_urls(self, data, img_urls, base_url, page_url, deadline):
+        """迭代遍历已解析的JSON对象，收集类似图片地址的字符串值"""
+        stack = [(None, data, False)]
+        visited = 0
+        while stack:
+            # 每处理一批节点检查一次时间预算
+            visited += 1
+            if visited % 1000 == 0 and time.monotonic() > deadline:
+                break
+            
+            key, value, in_image_object = stack.pop()
+            if isinstance(value, dict):
+                # JSON-LD中的ImageObject，其url/contentUrl即图片地址
+                is_image_object = value.get('@type') == 'ImageObject'
+                for child_key, child_value in value.items():
+                    stack.append((child_key, child_value, is_image_object))
+            elif isinstance(value, list):
+                for item in value:
+                    stack.append((key, item, in_image_object))
+            elif isinstance(value, str):
+                if len(value) > 2048 or not self._looks_like_image_ref(value):
+                    continue
+                key_name = key.lower() if isinstance(key, str) else ''
+                is_image_key = key_name in JSON_IMAGE_KEYS or (in_image_object and key_name in ('url', 'contenturl'))
+                self._add_url_to_set(img_urls, value, base_url, page_url, check_is_image=not is_image_key)
+    
+    def _looks_like_image_ref(self, value):
+        """粗略判断JSON字符串值是否可能是URL（排除普通文本）"""
+        if value.startswith(('http://', 'https://', '//', '/', 'data:image/')):
+            return True
+        return ' ' not in value and bool(JSON_IMAGE_EXT_RE.search(value))
+    
+    def _record_strategy_verification(self, verified_urls=None):
+        """将验证结果计入各页面所属域名的策略统计，并保存到磁盘
+        
+        verified_urls为None表示没有进行验证（或验证被取消），只清空待处理页面并保存。
+        """
+        with self.page_strategy_lock:
+            pages = self.page_strategy_urls
+            self.page_strategy_urls = {}
+        if verified_urls is not None:
+            verified_urls = set(verified_urls)
+            for domain, strategy_urls in pages.values():
+                self.strategy_stats.record_verification(domain, strategy_urls, verified_urls)
+        self.strategy_stats.save()
+    
+    def _deep_search_images(self, html_bytes, img_urls, base_url, page_url, encoding=None):
+        """更深入地搜索图片，针对特殊网站
+        
+        直接在原始响应字节上运行一次预编译正则，不遍历DOM树也不重新序列化HTML。
+        """
+        encoding = encoding or 'utf-8'
+        try:
+            for match in DEEP_SEARCH_RE.finditer(html_bytes):
+                raw_url = match.group(1) or match.group(2)
+                img_url = raw_url.decode(encoding, 'ignore')
+                if '&' in img_url:
+                    # 原始HTML中的URL可能包含&amp;等实体
+                    img_url = html.unescape(img_url)
+                self._add_url_to_set(img_urls, img_url, base_url, page_url)
+        except (LookupError, ValueError):
+            pass
+    
+    def _add_url_to_set(self, url_set, src, base_url, page_url, check_is_image=True):
+        """将URL添加到集合中，同时处理相对路径"""
+        if not src:
+            return
+            
+        # data URI（内联图片）在本地解码，不需要网络请求
+        if src.startswith('data:'):
+            inline_url = self._decode_inline_image(src)
+            if inline_url:
+                url_set.add(inline_url)
+            return inline_url
+            
+        # 忽略javascript:和about:协议
+        if src.startswith(('javascript:', 'about:')):
+            return
+            
+        # 修复URL中的特殊字符
+        src = src.replace(' ', '%20').replace('\\', '/')
+            
+        # 处理相对URL
+        if not src.startswith(('http://', 'https://')):
+            if src.startswith('//'):  # 协议相对URL
+                parsed_url = urlparse(page_url)
+                src = f"{parsed_url.scheme}:{src}"
+            elif src.startswith('/'):  # 绝对路径
+                src = base_url + src
+            else:  # 相对路径
+                src = urllib.parse.urljoin(page_url, src)
+        
+        # 检查是否为图片URL
+        if check_is_image and not self._is_image_url(src):
+            return
+            
+        url_set.add(src)
+        return src
+    
+    def _decode_inline_image(self, data_uri):
+        """解码data URI图片并按内容哈希缓存，返回伪URL；不是图片或超出大小限制时返回None"""
+        start = data_uri.find(',') + 1
+        if not start:
+            return None
+        params = data_uri[5:start - 1].split(';')
+        content_type = params[0].strip().lower() or 'text/plain'
+        if not content_type.startswith('image/'):
+            return None
+        is_base64 = any(param.strip().lower() == 'base64' for param in params[1:])
+        
+        # 按编码长度预估解码后大小，过大的直接跳过（百分号编码最多缩小为1/3）
+        payload_length = len(data_uri) - start
+        estimated_size = payload_length * 3 // 4 if is_base64 else payload_length // 3
+        if estimated_size > self.max_inline_image_size:
+            return None
+        
+        # 直接从data_uri分块切片解码，不复制整个payload；解码结果最后只拼接一次
+        hasher = hashlib.sha256()
+        parts = []
+        size = 0
+        chunk_size = 64 * 1024
+        carry = ''
+        try:
+            for offset in range(start, len(data_uri), chunk_size):
+                chunk = carry + data_uri[offset:offset + chunk_size]
+                if is_base64:
+                    chunk = ''.join(chunk.split())
+                    usable = len(chunk) - len(chunk) % 4
+                else:
+                    # 百分号编码（常见于内联SVG），不在%XX中间切开
+                    percent = chunk.rfind('%', max(0, len(chunk) - 2))
+                    usable = percent if percent >= 0 else len(chunk)
+                carry = chunk[usable:]
+                if usable:
+                    if is_base64:
+                        data = binascii.a2b_base64(chunk[:usable])
+                    else:
+                        data = urllib.parse.unquote_to_bytes(chunk[:usable])
+                    hasher.update(data)
+                    parts.append(data)
+                    size += len(data)
+                if size > self.max_inline_image_size:
+                    return None
+            if not is_base64:
+                parts.append(urllib.parse.unquote_to_bytes(carry))  # 末尾不完整的%按原样保留
+                hasher.update(parts[-1])
+            elif carry.strip('='):
+                # 末尾缺少填充的情况
+                parts.append(base64.b64decode(carry + '=' * (-len(carry) % 4)))
+                hasher.update(parts[-1])
+        except (binascii.Error, ValueError):
+            return None
+        
+        content = b''.join(parts)
+        if not content or len(content) > self.max_inline_image_size:
+            return None
+        
+        ext = INLINE_IMAGE_EXTENSIONS.get(content_type, '.img')
+        inline_url = f"{INLINE_IMAGE_PREFIX}{hasher.hexdigest()}{ext}"
+        with self.inline_images_lock:
+            if inline_url not in self.inline_images:
+                # 总量超出内存限制时不再缓存新的内联图片
+                if self.inline_images_size + len(content) > self.memory_limit:
+                    return None
+                self.inline_images[inline_url] = (content_type, content)
+                self.inline_images_size += len(content)
+        return inline_url
+    
+    def _reset_inline_images(self):
+        """清空内联图片缓存（开始新的分析时调用）"""
+        with self.inline_images_lock:
+            self.inline_images = {}
+            self.inline_images_size = 0
+    
+    def _get_image_response(self, url, **kwargs):
+        """获取图片响应，内联图片直接从缓存返回，其余发起网络请求"""
+        if url.startswith(INLINE_IMAGE_PREFIX):
+            with self.inline_images_lock:
+                entry = self.inline_images.get(url)
+            if entry is None:
+                raise ValueError(f"内联图片已失效: {url}")
+            content_type, content = entry
+            return InlineImageResponse(url, content_type, content)
+        return self.http.get(url, **kwargs)
+    
+    def _parse_size_attr(self, value):
+        """解析width/height属性值，无法确定时返回None（如百分比）"""
+        if not value or not isinstance(value, str):
+            return None
+        match = SIZE_ATTR_RE.match(value)
+        if match:
+            return int(match.group(1))
+        return None
+    
+    def _record_size_hint(self, hints, url, width, height):
+        """记录尺寸提示，同一URL多次出现时保留较大的值，避免误删"""
+        old_width, old_height = hints.get(url, (None, None))
+        if old_width is not None and width is not None:
+            width = max(old_width, width)
+        elif width is None:
+            width = old_width
+        if old_height is not None and height is not None:
+            height = max(old_height, height)
+        elif height is None:
+            height = old_height
+        hints[url] = (width, height)
+    
+    def _size_hint_from_url(self, url):
+        """从URL中的CDN尺寸参数（w=、h=）或路径（/64x64/）推断图片尺寸"""
+        width = height = None
+        parsed_url = urlparse(url)
+        
+        # 查询参数中的尺寸，如?w=64&h=64
+        if parsed_url.query:
+            for key, value in urllib.parse.parse_qsl(parsed_url.query):
+                name = URL_SIZE_PARAM_NAMES.get(key.lower())
+                if name and value.isdigit():
+                    if name == 'width':
+                        width = int(value)
+                    else:
+                        height = int(value)
+        
+        # 路径中的尺寸，取最后一个匹配（通常是文件名中的缩略图尺寸）
+        matches = URL_SIZE_PATH_RE.findall(parsed_url.path)
+        if matches:
+            path_width, path_height = matches[-1]
+            width = width if width is not None else int(path_width)
+            height = height if height is not None else int(path_height)
+        
+        return width, height
+    
+    def _prefilter_by_size_hints(self, img_urls, min_width, min_height, skip_small):
+        """根据尺寸提示在发起请求前剔除明显过小的图片，无法确定的交给验证"""
+        limit_width = max(min_width, 50 if skip_small else 0)
+        limit_height = max(min_height, 50 if skip_small else 0)
+        if limit_width <= 0 and limit_height <= 0:
+            return img_urls
+        
+        with self.size_hints_lock:
+            stored_hints = {url: self.size_hints[url] for url in img_urls if url in self.size_hints}
+        
+        kept = []
+        for url in img_urls:
+            hints = {}
+            if url in stored_hints:
+                self._record_size_hint(hints, url, *stored_hints[url])
+            url_width, url_height = self._size_hint_from_url(url)
+            if url_width is not None or url_height is not None:
+                self._record_size_hint(hints, url, url_width, url_height)
+            width, height = hints.get(url, (None, None))
+            
+            # 任一已知尺寸低于阈值即视为明显过小
+            if (width is not None and width < limit_width) or (height is not None and height < limit_height):
+                continue
+            kept.append(url)
+        return kept
+    
+    def _is_image_url(self, url):
+        """检查URL是否指向图片文件"""
+        # 图片文件扩展名
+        image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff']
+        parsed_url = urlparse(url)
+        path = parsed_url.path.lower()
+        
+        # 检查是否以图片扩展名结尾
+        if any(path.endswith(ext) for ext in image_extensions):
+            return True
+            
+        # 检查URL是否包含图片相关关键词
+        if 'image' in path or 'img' in path or 'photo' in path or 'picture' in path:
+            return True
+            
+        # 检查URL参数是否包含图片扩展名（如?file=image.jpg）
+        query = parsed_url.query.lower()
+        if any(ext[1:] in query for ext in image_extensions):  # ext[1:] 移除点号
+            return True
+            
+        return False
+    
+    def _is_direct_image_url(self, url):
+        """检查URL是否直接指向图片文件"""
+        try:
+            # 首先检查URL格式
+            if self._is_image_url(url):
+                # 然后发送HEAD请求验证
+                headers = {
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                }
+                response = self.http.head(url, headers=headers, timeout=10)
+                content_type = response.headers.get('Content-Type', '')
+                
+                # 验证内容类型是否为图片
+                return content_type.startswith('image/')
+        except Exception:
+            pass
+            
+        return False
+    
+    def _decode_image(self, pil_img, target_size=None):
+        """解码已打开的图片；指定target_size时尽量以不小于目标的缩小比例解码
+        
+        只有JPEG等格式支持缩小解码（draft），PNG、WebP等格式总是解码整张位图。
+        实际要解码的像素数超过max_decode_pixels时在解码前抛出ValueError，避免解压炸弹耗尽内存。
+        """
+        if target_size:
+            pil_img.draft(None, target_size)  # 不支持的格式忽略，尺寸保持不变
+        # 此时的size就是load()将要解码的尺寸：缩小解码成功时为缩小后的尺寸，否则为原始尺寸
+        width, height = pil_img.size
+        if width * height > self.max_decode_pixels:
+            raise ValueError(f"图片像素过多 ({width}x{height})，超出解码上限")
+        pil_img.load()
+        return pil_img
+    
+    def _probe_image_size(self, response):
+        """边下载边解析文件头，得到图片尺寸后立即停止，无需下载和解码整张图片
+        
+        Parser每收到一块数据都会拼接已有数据重新尝试解析，无法识别的内容（如SVG或
+        以image/类型返回的网页）读取probe_header_limit字节后即放弃，避免读完整个响应。
+        """
+        limit = min(self.probe_header_limit, self.max_image_size)
+        parser = ImageFile.Parser()
+        received = 0
+        try:
+            with response:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    parser.feed(chunk)
+                    if parser.image is not None:
+                        return parser.image.size
+                    received += len(chunk)
+                    if received >= limit:
+                        break
+            raise ValueError("无法解析图片尺寸")
+        finally:
+            # 丢弃缓冲的数据，close()不再重新打开并解码它
+            parser.data = None
+            try:
+                parser.close()
+            except Exception:
+                pass
+
+def _read_file_manifest(save_path):
+    """读取保存目录的清单，返回{原始URL: 记录}；同一URL多次下载时取最后一次"""
+    records = {}
+    manifest_path = os.path.join(save_path, LAYOUT_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 中断时可能只写了半行
+            records[record['url']] = record
+    return records
+
+def load_file_manifest(save_path):
+    """读取保存目录的清单（非flat布局时生成），返回{原始URL: 保存路径}；同一URL多次下载时取最后一次"""
+    return {url: os.path.join(save_path, record['path']) for url, record in _read_file_manifest(save_path).items()}
+
+def _make_engine(**options):
+    """创建库接口使用的独立引擎：不读写磁盘上的统计数据，options覆盖同名选项属性"""
+    engine = ImageEngine(persist_stats=False)
+    for name, value in options.items():
+        if name.startswith('_') or not hasattr(engine, name):
+            raise TypeError(f"未知选项: {name}")
+        setattr(engine, name, value)
+    engine.is_downloading = True
+    return engine
+
+def _register_items(engine, items):
+    """把输入统一为URL，带data的记录（内联图片）同时登记到引擎的内联图片缓存"""
+    for item in items:
+        if isinstance(item, str):
+            yield item
+            continue
+        if getattr(item, 'data', None) is not None:
+            with engine.inline_images_lock:
+                engine.inline_images[item.url] = (item.content_type, item.data)
+        yield item.url
+
+def _iter_completed(engine, func, items, workers):
+    """在线程池中对items逐个调用func，按完成顺序产出结果（None不产出）
+    
+    按窗口提交任务，输入可以是无限的生成器；调用方提前关闭生成器时停止engine并取消尚未开始的任务。
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = set()
+    items = iter(items)
+    completed = False
+    try:
+        while True:
+            for item in itertools.islice(items, workers * 2 - len(pending)):
+                pending.add(executor.submit(func, item))
+            if not pending:
+                break
+            finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                if result is not None:
+                    yield result
+        completed = True
+    finally:
+        if not completed:
+            # 正常结束时engine可以继续使用（服务和工作端会复用同一个引擎）
+            engine.is_downloading = False
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+def extract_images(url, **options):
+    """提取网页中的图片（不验证），逐条产出ExtractedImage；url本身是图片时直接产出"""
+    engine = _make_engine(**options)
+    if engine._is_direct_image_url(url):
+        yield ExtractedImage(url, url, None, None)
+        return
+    for img_url in engine._extract_images_from_url(url):
+        entry = engine.inline_images.get(img_url)
+        if entry is None:
+            yield ExtractedImage(img_url, url, None, None)
+        else:
+            yield ExtractedImage(img_url, url, entry[0], entry[1])
+
+def iter_verified(urls, min_size=0, workers=10, **options):
+    """并行获取图片尺寸并过滤，按完成顺序产出VerifiedImage
+    
+    urls可以是URL字符串或extract_images产出的记录（任意可迭代对象）；
+    min_size为最小边长，或(最小宽度, 最小高度)。无法访问或不是图片的URL直接跳过。
+    """
+    min_width, min_height = min_size if isinstance(min_size, tuple) else (min_size, min_size)
+    engine = _make_engine(min_width=min_width, min_height=min_height, **options)
+    
+    def verify(url):
+        if not engine.is_downloading:
+            return None
+        try:
+            info = engine._probe_image(url)
+        except Exception:
+            return None
+        if info is None or not engine._passes_size_filter(info[0], info[1]):
+            return None
+        entry = engine.inline_images.get(url)
+        return VerifiedImage(url, info[0], info[1], info[2], entry[1] if entry else None)
+    
+    yield from _iter_completed(engine, verify, _register_items(engine, urls), max(1, workers))
+
+def _iter_downloads(engine, urls, dest, workers):
+    """用engine并行下载urls到dest目录，按完成顺序产出DownloadResult（供download_all和服务模式共用）"""
+    counter = itertools.count()  # 文件名序号（URL中没有文件名时使用）
+    
+    def download(url):
+        if not engine.is_downloading:
+            return None
+        try:
+            return DownloadResult(url, engine._save_image(url, dest, next(counter)), None)
+        except Exception as e:
+            return DownloadResult(url, None, e)
+    
+    yield from _iter_completed(engine, download, urls, max(1, workers))
+
+def download_all(urls, dest, workers=4, prefix="image", **options):
+    """并行下载图片到dest目录，按完成顺序为每个URL产出一条DownloadResult（包括失败的）"""
+    engine = _make_engine(prefix=prefix, **options)
+    os.makedirs(dest, exist_ok=True)
+    yield from _iter_downloads(engine, _register_items(engine, urls), dest, workers)
@@ -0,0 +1,518 @@
+"""URL图片批量下载器的HTTP服务模式（无界面，多人共用一台下载机器）
+
+用法示例:
+    python -m downloader_service --port 8700 -o ./downloads --jobs 2
+
+接口（请求和响应均为JSON）:
+    POST   /jobs                 提交任务 {"urls": [...], "options": {...}}，返回任务信息
+    GET    /jobs                 最近的任务列表
+    GET    /jobs/<id>            任务状态、进度和吞吐量
+    GET    /jobs/<id>/results    下载结果，每行一个JSON；?after=<结果id>只取新结果，?follow=1持续输出直到任务结束
+    POST   /jobs/<id>/cancel     取消任务（DELETE /jobs/<id> 同样有效）
+
+任务保存在SQLite中，服务重启后未完成的任务会继续执行（已下载成功的图片不会重复下载）。
+所有任务共用同一个HTTP连接池和策略统计。
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from downloader_engine import ImageEngine, StrategyStats, _iter_downloads
+
+# 任务可以设置的选项及其类型；crawl、depth、max_pages控制运行方式，其余是引擎的同名属性
+JOB_OPTIONS = {
+    'verify_images': bool,
+    'skip_small_images': bool,
+    'min_width': int,
+    'min_height': int,
+    'resolution_filter': str,
+    'prefix': str,
+    'crawl': bool,
+    'depth': int,
+    'max_pages': int,
+}
+RUN_OPTIONS = {'crawl', 'depth', 'max_pages'}
+FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+MAX_REQUEST_SIZE = 32 * 1024 * 1024  # 提交任务的请求体大小上限（32MB）
+
+class JobStore:
+    """持久化的任务队列和下载结果（SQLite，多线程共用一个连接，由锁保护）"""
+    def __init__(self, path):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT NOT NULL, urls TEXT NOT NULL, options TEXT NOT NULL,
+                created REAL NOT NULL, started REAL, finished REAL,
+                found INTEGER NOT NULL DEFAULT 0, downloaded INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0, bytes INTEGER NOT NULL DEFAULT 0, error TEXT)""")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY, job_id TEXT NOT NULL, url TEXT NOT NULL,
+                path TEXT, size INTEGER, error TEXT)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS results_job ON results (job_id, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            # 上次退出时还在运行的任务重新排队；失败的结果删除以便重试，成功的保留
+            self.conn.execute("""UPDATE jobs SET failed = 0, status = 'queued'
+                WHERE status = 'running'""")
+            self.conn.execute("""DELETE FROM results WHERE error IS NOT NULL
+                AND job_id IN (SELECT id FROM jobs WHERE status = 'queued')""")
+    
+    def _job(self, row):
+        job = dict(row)
+        job['urls'] = json.loads(job['urls'])
+        job['options'] = json.loads(job['options'])
+        return job
+    
+    def submit(self, urls, options):
+        """新建排队中的任务，返回任务ID"""
+        job_id = uuid.uuid4().hex[:16]
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO jobs (id, status, urls, options, created) VALUES (?, 'queued', ?, ?, ?)",
+                              (job_id, json.dumps(urls), json.dumps(options), time.time()))
+        return job_id
+    
+    def claim_next(self):
+        """取出最早排队的任务并标记为运行中，没有时返回None"""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if row is None:
+                return None
+            # 重启后继续的任务保留最初的开始时间
+            self.conn.execute("UPDATE jobs SET status = 'running', started = COALESCE(started, ?) WHERE id = ?",
+                              (time.time(), row['id']))
+        return self._job(row)
+    
+    def get(self, job_id, with_urls=False):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._job(row)
+        if not with_urls:
+            job['urls'] = len(job['urls'])
+        return job
+    
+    def list(self, limit=100):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        jobs = [self._job(row) for row in rows]
+        for job in jobs:
+            job['urls'] = len(job['urls'])
+        return jobs
+    
+    def set_found(self, job_id, found):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET found = ? WHERE id = ?", (found, job_id))
+    
+    def add_result(self, job_id, url, path, size, error):
+        """记录一条下载结果并更新任务计数"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO results (job_id, url, path, size, error) VALUES (?, ?, ?, ?, ?)",
+                              (job_id, url, path, size, error))
+            if error is None:
+                self.conn.execute("UPDATE jobs SET downloaded = downloaded + 1, bytes = bytes + ? WHERE id = ?",
+                                  (size or 0, job_id))
+            else:
+                self.conn.execute("UPDATE jobs SET failed = failed + 1 WHERE id = ?", (job_id,))
+    
+    def downloaded_urls(self, job_id):
+        """已成功下载的图片URL（继续中断的任务时跳过）"""
+        with self.lock:
+            rows = self.conn.execute("SELECT url FROM results WHERE job_id = ? AND error IS NULL", (job_id,)).fetchall()
+        return {row['url'] for row in rows}
+    
+    def results(self, job_id, after=0, limit=1000):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM results WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+                                     (job_id, after, limit)).fetchall()
+        return [dict(row) for row in rows]
+    
+    def finish(self, job_id, status, error=None):
+        """结束运行中的任务；任务已被取消时保持取消状态，返回是否更新"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute("UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ? AND status = 'running'",
+                                       (status, time.time(), error, job_id))
+        return cursor.rowcount > 0
+    
+    def is_cancelled(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and row['status'] == 'cancelled'
+    
+    def cancel(self, job_id):
+        """取消排队中或运行中的任务，返回任务取消前的状态（任务不存在时返回None）"""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row['status'] not in FINISHED_STATUSES:
+                self.conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ?",
+                                  (time.time(), job_id))
+        return row['status']
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class JobEngine(ImageEngine):
+    """运行单个任务的引擎，记录当前阶段的进度和最后一条状态消息"""
+    def __init__(self, service):
+        super().__init__(persist_stats=False)
+        # 共用服务的连接池和策略统计
+        self.http = service.session
+        self.strategy_stats = service.strategy_stats
+        self.max_workers = service.job_workers
+        self.verify_workers = service.job_workers * 2
+        self.download_workers = service.job_workers
+        self.progress = None  # (阶段, 当前, 总数)
+        self.last_message = None
+    
+    def _post_status(self, message):
+        self.last_message = message
+    
+    def _post_progress(self, stage, current, total):
+        self.progress = (stage, current, total)
+    
+    def _on_crawl_progress(self, done, queued, found, max_pages):
+        self.progress = ('crawl', done, max_pages)
+    
+    def _open_feed_source(self, location):
+        # 服务模式下只读取网络上的站点地图，不允许任务读取服务器本地文件
+        if not location.startswith(('http://', 'https://')):
+            raise OSError(f"不支持的站点地图地址: {location}")
+        return super()._open_feed_source(location)
+
+class DownloadService:
+    """从JobStore中取任务并运行，最多同时运行max_jobs个任务"""
+    def __init__(self, store, output_dir, max_jobs=2, job_workers=5, stats_path=None):
+        self.store = store
+        self.output_dir = output_dir
+        self.max_jobs = max_jobs
+        self.job_workers = job_workers
+        
+        # 所有任务共用的连接池和策略统计
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=100, pool_maxsize=max_jobs * job_workers * 2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.strategy_stats = StrategyStats(stats_path)
+        self.strategy_stats.load()
+        
+        self.running = {}  # {任务ID: JobEngine}
+        self.running_lock = threading.Lock()
+        self.job_available = threading.Event()
+        self.stopping = False
+        self.threads = []
+    
+    def start(self):
+        for i in range(self.max_jobs):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def stop(self):
+        """停止服务：中断运行中的任务，它们保持运行中状态，下次启动时继续"""
+        self.stopping = True
+        self.job_available.set()
+        with self.running_lock:
+            for engine in self.running.values():
+                engine.is_downloading = False
+        for thread in self.threads:
+            thread.join()
+        self.session.close()
+    
+    def submit(self, payload):
+        """校验并提交任务，返回任务ID；参数不合法时抛出ValueError"""
+        if not isinstance(payload, dict):
+            raise ValueError("请求体必须是JSON对象")
+        urls = payload.get('urls')
+        if not isinstance(urls, list) or not urls:
+            raise ValueError("urls必须是非空的URL列表")
+        for url in urls:
+            if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+                raise ValueError(f"不支持的URL: {url!r}")
+        
+        options = payload.get('options') or {}
+        if not isinstance(options, dict):
+            raise ValueError("options必须是JSON对象")
+        for name, value in options.items():
+            expected = JOB_OPTIONS.get(name)
+            if expected is None:
+                raise ValueError(f"未知选项: {name}")
+            # bool是int的子类，需要单独排除
+            if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+                if not (expected is str and value is None):
+                    raise ValueError(f"选项{name}的类型应为{expected.__name__}")
+        
+        job_id = self.store.submit(urls, options)
+        self.job_available.set()
+        return job_id
+    
+    def cancel(self, job_id):
+        """取消任务，返回取消前的状态（任务不存在时返回None）"""
+        previous = self.store.cancel(job_id)
+        with self.running_lock:
+            engine = self.running.get(job_id)
+            if engine is not None:
+                engine.is_downloading = False
+        return previous
+    
+    def status(self, job_id):
+        """任务信息，附带运行中任务的进度和吞吐量"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        with self.running_lock:
+            engine = self.running.get(job_id)
+        if engine is not None:
+            if engine.progress:
+                stage, current, total = engine.progress
+                job['progress'] = {'stage': stage, 'current': current, 'total': total}
+            job['message'] = engine.last_message
+        
+        if job['started']:
+            elapsed = (job['finished'] or time.time()) - job['started']
+            job['elapsed'] = round(elapsed, 3)
+            if elapsed > 0:
+                job['images_per_second'] = round(job['downloaded'] / elapsed, 3)
+                job['bytes_per_second'] = round(job['bytes'] / elapsed)
+        return job
+    
+    def _worker(self):
+        while not self.stopping:
+            job = self.store.claim_next()
+            if job is None:
+                self.job_available.wait(1.0)
+                self.job_available.clear()
+                continue
+            self._run_job(job)
+    
+    def _run_job(self, job):
+        job_id = job['id']
+        options = job['options']
+        engine = JobEngine(self)
+        for name, value in options.items():
+            if name not in RUN_OPTIONS:
+                setattr(engine, name, value)
+        engine.is_downloading = True
+        with self.running_lock:
+            self.running[job_id] = engine
+            # 取消可能发生在claim_next之后、登记引擎之前，此时cancel找不到引擎，需要在这里补上
+            if self.store.is_cancelled(job_id):
+                engine.is_downloading = False
+        
+        try:
+            if not engine.is_downloading:
+                return
+            # 展开站点地图后分析网页（或同站爬取），再按选项验证
+            page_urls, image_urls = engine._expand_url_sources(job['urls'])
+            if options.get('crawl'):
+                img_urls = engine.crawl_site(list(page_urls), max(0, options.get('depth', 2)),
+                                             max(1, options.get('max_pages', 100)))
+                img_urls = list(dict.fromkeys(image_urls + img_urls))
+            else:
+                img_urls = engine.analyze_urls(page_urls, image_urls)
+            img_urls = engine.finish_images(img_urls)
+            self.store.set_found(job_id, len(img_urls))
+            
+            # 继续中断的任务时跳过已下载的图片
+            done = self.store.downloaded_urls(job_id)
+            if done:
+                img_urls = [url for url in img_urls if url not in done]
+            
+            dest = os.path.join(self.output_dir, job_id)
+            os.makedirs(dest, exist_ok=True)
+            if engine.is_downloading:
+                for result in _iter_downloads(engine, img_urls, dest, engine.download_workers):
+                    if result.error is None:
+                        self.store.add_result(job_id, result.url, result.path, os.path.getsize(result.path), None)
+                    else:
+                        self.store.add_result(job_id, result.url, None, None, str(result.error))
+                    if not engine.is_downloading:
+                        break
+            
+            # 服务停止时保持运行中状态，下次启动继续；被取消的任务保持取消状态
+            if not self.stopping and not self.store.is_cancelled(job_id):
+                self.store.finish(job_id, 'done')
+        except Exception as e:
+            if not self.stopping:
+                self.store.finish(job_id, 'failed', str(e))
+        finally:
+            with self.running_lock:
+                self.running.pop(job_id, None)
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """REST接口，self.server.service为DownloadService"""
+    server_version = "ImageDownloaderService/1.0"
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+    
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_error(self, status, message):
+        self._send_json(status, {'error': message})
+    
+    def _route(self):
+        """返回(路径片段列表, 查询参数字典)"""
+        parsed = urllib.parse.urlsplit(self.path)
+        parts = [part for part in parsed.path.split('/') if part]
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        return parts, query
+    
+    def do_GET(self):
+        service = self.server.service
+        parts, query = self._route()
+        if parts == ['jobs']:
+            self._send_json(HTTPStatus.OK, {'jobs': service.store.list()})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = service.status(parts[1])
+            if job is None:
+                self._send_error(HTTPStatus.NOT_FOUND, "任务不存在")
+            else:
+                self._send_json(HTTPStatus.OK, job)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'results':
+            self._stream_results(parts[1], query)
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "未知的接口")
+    
+    def do_POST(self):
+        service = self.server.service
+        parts, _ = self._route()
+        if parts == ['jobs']:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_REQUEST_SIZE:
+                self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "请求体过大")
+                return
+            try:
+                payload = json.loads(self.rfile.read(length) or b'null')
+                job_id = service.submit(payload)
+            except ValueError as e:  # 包括JSON解析错误
+                self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+                return
+            self._send_json(HTTPStatus.CREATED, service.status(job_id))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            self._cancel(parts[1])
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "未知的接口")
+    
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == 'jobs':
+            self._cancel(parts[1])
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "未知的接口")
+    
+    def _cancel(self, job_id):
+        service = self.server.service
+        if service.cancel(job_id) is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "任务不存在")
+        else:
+            self._send_json(HTTPStatus.OK, service.status(job_id))
+    
+    def _stream_results(self, job_id, query):
+        """以JSON行输出下载结果；follow时持续输出直到任务结束或客户端断开"""
+        store = self.server.service.store
+        if store.get(job_id) is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "任务不存在")
+            return
+        try:
+            after = int(query.get('after', 0))
+        except ValueError:
+            self._send_error(HTTPStatus.BAD_REQUEST, "after必须是整数")
+            return
+        follow = query.get('follow') in ('1', 'true')
+        
+        # 长度未知，输出完毕后关闭连接
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                # 先读状态再读结果，保证任务结束前写入的结果都能输出
+                finished = store.get(job_id)['status'] in FINISHED_STATUSES
+                rows = store.results(job_id, after)
+                for row in rows:
+                    del row['job_id']
+                    self.wfile.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b"\n")
+                if rows:
+                    after = rows[-1]['id']
+                    self.wfile.flush()
+                    continue
+                if not follow or finished:
+                    break
+                time.sleep(0.5)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def create_server(service, host="127.0.0.1", port=8700, verbose=False):
+    """创建HTTP服务器（port为0时自动选择端口，可从server.server_address读取）"""
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+def build_parser():
+    config_dir = os.path.join(os.path.expanduser("~"), ".url_image_downloader")
+    parser = argparse.ArgumentParser(prog="python -m downloader_service",
+                                     description="以HTTP服务方式运行图片下载器，接收并排队执行下载任务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8700, help="监听端口（默认8700）")
+    parser.add_argument("-o", "--output", default="downloads", help="保存目录，每个任务一个子目录（默认./downloads）")
+    parser.add_argument("--db", default=os.path.join(config_dir, "jobs.sqlite3"), help="任务数据库路径")
+    parser.add_argument("--jobs", type=int, default=2, help="同时运行的任务数（默认2）")
+    parser.add_argument("-j", "--concurrency", type=int, default=5, help="每个任务的并发数（默认5）")
+    parser.add_argument("--no-stats", action="store_true", help="不读写磁盘上的策略统计")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每个HTTP请求的日志")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stats_path = None if args.no_stats else os.path.join(os.path.dirname(os.path.abspath(args.db)), "strategy_stats.json")
+    
+    store = JobStore(args.db)
+    service = DownloadService(store, os.path.abspath(args.output), max(1, args.jobs),
+                              max(1, args.concurrency), stats_path)
+    server = create_server(service, args.host, args.port, args.verbose)
+    service.start()
+    host, port = server.server_address[:2]
+    sys.stderr.write(f"服务已启动: http://{host}:{port}/jobs\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
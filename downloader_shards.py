@@ -0,0 +1,304 @@
+"""多进程分片批量下载（多核机器上绕开GIL，分析、验证和解码在各自的进程中进行）
+
+用法示例:
+    python -m downloader_shards urls.txt -o ./images -p 16 -j 8 --min-width 300
+
+网页URL按主机名哈希分到各个工作进程（同一主机的请求集中在一个进程，连接池可复用），
+每个进程有自己的连接池。进度和结果通过队列汇总到主进程，由主进程写入唯一的清单文件
+<输出目录>/manifest.jsonl。按Ctrl+C取消后，用相同参数重新运行即可继续：
+清单中已分析的网页不再分析，已下载的图片不再下载。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from downloader_cli import CommandLineDownloader
+from downloader_engine import INLINE_IMAGE_PREFIX, ImageEngine, _iter_downloads
+
+MANIFEST_NAME = "manifest.jsonl"
+
+class ShardEngine(ImageEngine):
+    """工作进程中的引擎，把进度和每个网页的分析结果发送给主进程"""
+    def __init__(self, shard, events):
+        super().__init__(persist_stats=False)  # 各进程同时写同一个统计文件会互相覆盖
+        self.shard = shard
+        self.events = events
+    
+    def _post_status(self, message):
+        self.events.put(('status', self.shard, message))
+    
+    def _post_progress(self, stage, current, total):
+        self.events.put(('progress', self.shard, stage, current, total))
+    
+    def _analyze_single_url_parallel(self, url, index):
+        img_urls = super()._analyze_single_url_parallel(url, index)
+        # 只记录找到图片的网页，出错或暂时没有图片的网页继续时重新分析
+        if img_urls:
+            # 尺寸提示一并记录，继续时不重新分析网页也能预先过滤小图片
+            with self.size_hints_lock:
+                hints = {img_url: self.size_hints[img_url] for img_url in img_urls if img_url in self.size_hints}
+            self.events.put(('page', self.shard, url, img_urls, hints))
+        return img_urls
+
+def shard_of(url, shards):
+    """按主机名的稳定哈希选择分片（不能用hash()，它在每个进程中不同）"""
+    host = urlparse(url).netloc.lower()
+    return zlib.crc32(host.encode('utf-8')) % shards
+
+def _run_shard(shard, page_urls, image_urls, size_hints, done_images, options, output_dir, events, cancel_event):
+    """工作进程入口：分析本分片的网页，验证并下载图片，结果逐条发送给主进程"""
+    # Ctrl+C由主进程处理，工作进程通过cancel_event得知取消
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        engine = ShardEngine(shard, events)
+        for name, value in options.items():
+            setattr(engine, name, value)
+        engine.http = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(engine.max_workers, engine.verify_workers, engine.download_workers))
+        engine.http.mount('http://', adapter)
+        engine.http.mount('https://', adapter)
+        engine.size_hints.update(size_hints)
+        engine.is_downloading = True
+        
+        def watch_cancel():
+            cancel_event.wait()
+            engine.is_downloading = False
+        threading.Thread(target=watch_cancel, daemon=True).start()
+        
+        img_urls = engine.analyze_urls(page_urls, image_urls) if page_urls else list(image_urls)
+        img_urls = [url for url in dict.fromkeys(img_urls) if url not in done_images]
+        img_urls = engine.finish_images(img_urls)
+        events.put(('found', shard, len(img_urls)))
+        
+        if engine.is_downloading:
+            engine._post_progress('download', 0, len(img_urls))
+            for done_count, result in enumerate(_iter_downloads(engine, img_urls, output_dir, engine.download_workers), 1):
+                size = os.path.getsize(result.path) if result.error is None else None
+                events.put(('result', shard, result.url, result.path, size,
+                            None if result.error is None else str(result.error)))
+                engine._post_progress('download', done_count, len(img_urls))
+                if not engine.is_downloading:
+                    break
+        events.put(('done', shard, None))
+    except Exception as e:
+        events.put(('done', shard, str(e)))
+
+class ShardedRunner:
+    """主进程：读取URL、分片、启动工作进程，汇总进度并写入清单"""
+    def __init__(self, output, processes, options, cli):
+        self.output = output
+        self.processes = processes
+        self.options = options
+        self.cli = cli  # CommandLineDownloader，用于读取URL和输出事件
+        self.manifest_path = os.path.join(output, MANIFEST_NAME)
+        self.progress = {}  # {分片: {阶段: (当前, 总数)}}
+        self.last_progress = 0
+        self.found = 0
+        self.downloaded = 0
+        self.failed = 0
+    
+    def load_manifest(self):
+        """读取已有清单，返回({网页URL: (图片URL列表, 尺寸提示)}, 已下载图片URL集合)"""
+        known_pages = {}
+        done_images = set()
+        if not os.path.exists(self.manifest_path):
+            return known_pages, done_images
+        with open(self.manifest_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 上次中断时可能只写了半行
+                if record.get('type') == 'page':
+                    hints = {url: tuple(size) for url, size in record.get('hints', {}).items()}
+                    known_pages[record['url']] = (record['images'], hints)
+                elif record.get('type') == 'image' and record.get('error') is None:
+                    done_images.add(record['url'])
+        return known_pages, done_images
+    
+    def split(self, page_urls, image_urls, known_pages, done_images=()):
+        """按主机分片，返回[(待分析网页, 无需分析的图片, 尺寸提示)]；清单中已分析的网页直接使用记录的图片
+        
+        内联图片（data URI）的内容只保存在上次运行的进程中，网页中还有未下载的内联图片时重新分析。
+        """
+        shards = [([], [], {}) for _ in range(self.processes)]
+        for url in page_urls:
+            if url in known_pages and not any(img_url.startswith(INLINE_IMAGE_PREFIX) and img_url not in done_images
+                                              for img_url in known_pages[url][0]):
+                images, hints = known_pages[url]
+                for img_url in images:
+                    shard = shards[shard_of(img_url, self.processes)]
+                    shard[1].append(img_url)
+                    if img_url in hints:
+                        shard[2][img_url] = hints[img_url]
+            else:
+                shards[shard_of(url, self.processes)][0].append(url)
+        for img_url in image_urls:
+            shards[shard_of(img_url, self.processes)][1].append(img_url)
+        return shards
+    
+    def run(self, page_urls, image_urls):
+        """运行所有分片，返回是否被取消"""
+        os.makedirs(self.output, exist_ok=True)
+        known_pages, done_images = self.load_manifest()
+        if known_pages or done_images:
+            self.cli.emit('resume', pages=len(known_pages), images=len(done_images))
+        shards = self.split(page_urls, image_urls, known_pages, done_images)
+        
+        context = multiprocessing.get_context('spawn')  # 不继承主进程的线程和连接
+        events = context.Queue()
+        cancel_event = context.Event()
+        workers = []
+        for shard, (shard_pages, shard_images, shard_hints) in enumerate(shards):
+            if not shard_pages and not shard_images:
+                continue
+            process = context.Process(target=_run_shard, name=f"shard-{shard}",
+                                      args=(shard, shard_pages, shard_images, shard_hints, done_images, self.options,
+                                            self.output, events, cancel_event))
+            process.start()
+            workers.append(process)
+        
+        cancelled = False
+        remaining = len(workers)
+        try:
+            with open(self.manifest_path, 'a', encoding='utf-8') as manifest:
+                while remaining:
+                    try:
+                        try:
+                            event = events.get(timeout=0.5)
+                        except queue.Empty:
+                            if not any(process.is_alive() for process in workers):
+                                break  # 工作进程异常退出，没有发送done
+                            continue
+                        if event[0] == 'done':
+                            remaining -= 1
+                            if event[2]:
+                                self.cli.emit('error', shard=event[1], message=event[2])
+                        else:
+                            self.handle_event(event, manifest)
+                    except KeyboardInterrupt:
+                        # 通知所有分片停止，继续接收已完成的结果直到进程退出；再次按Ctrl+C时不再等待
+                        if cancelled:
+                            raise
+                        cancelled = True
+                        cancel_event.set()
+            
+            for process in workers:
+                process.join()
+        except BaseException:
+            # 工作进程忽略SIGINT，主进程提前退出时必须通知并结束它们，否则会继续下载
+            cancel_event.set()
+            raise
+        finally:
+            for process in workers:
+                process.join(timeout=5)  # 正常结束时已退出；取消后给分片一点时间停止
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+        self.emit_progress(force=True)
+        return cancelled
+    
+    def handle_event(self, event, manifest):
+        kind, shard = event[0], event[1]
+        if kind == 'status':
+            if not self.cli.json_output:
+                self.cli.emit('status', message=f"[{shard}] {event[2]}")
+        elif kind == 'progress':
+            self.progress.setdefault(shard, {})[event[2]] = (event[3], event[4])
+            self.emit_progress()
+        elif kind == 'found':
+            self.found += event[2]
+        elif kind == 'page':
+            record = {'type': 'page', 'url': event[2], 'images': event[3], 'hints': event[4]}
+            manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+            manifest.flush()
+        elif kind == 'result':
+            _, _, url, path, size, error = event
+            if error is None:
+                self.downloaded += 1
+            else:
+                self.failed += 1
+            manifest.write(json.dumps({'type': 'image', 'url': url, 'path': path, 'size': size, 'error': error},
+                                      ensure_ascii=False) + "\n")
+            manifest.flush()
+    
+    def emit_progress(self, force=False):
+        """合并各分片的进度，每0.5秒最多输出一次"""
+        now = time.monotonic()
+        if not force and now - self.last_progress < 0.5:
+            return
+        self.last_progress = now
+        totals = {}
+        for stages in self.progress.values():
+            for stage, (current, total) in stages.items():
+                done, count = totals.get(stage, (0, 0))
+                totals[stage] = (done + current, count + total)
+        for stage, (current, total) in totals.items():
+            self.cli.emit('progress', stage=stage, current=current, total=total)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m downloader_shards",
+                                     description="多进程分片批量下载图片（按主机分片，可中断后继续）")
+    parser.add_argument("input", help="URL文件（每行一个URL，或站点地图/订阅源，支持.gz、URL和\"-\"表示标准输入）")
+    parser.add_argument("-o", "--output", default=".", help="保存目录，清单写入其中的manifest.jsonl（默认当前目录）")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1, help="工作进程数（默认CPU核数）")
+    parser.add_argument("-j", "--concurrency", type=int, default=5, help="每个进程分析和下载的并发数（默认5）")
+    parser.add_argument("--verify-workers", type=int, default=10, help="每个进程验证图片的并发数（默认10）")
+    parser.add_argument("--min-width", type=int, default=0, help="最小图片宽度")
+    parser.add_argument("--min-height", type=int, default=0, help="最小图片高度")
+    parser.add_argument("--keep-small", action="store_true", help="不跳过小于50x50的图标")
+    parser.add_argument("--resolution", help="只保留指定分辨率，如800x600")
+    parser.add_argument("--no-verify", action="store_true", help="不验证图片（同时不按尺寸过滤）")
+    parser.add_argument("--prefix", default="image", help="文件名前缀（默认image）")
+    parser.add_argument("--json", action="store_true", help="以JSON行输出进度和结果")
+    parser.add_argument("-q", "--quiet", action="store_true", help="文本模式下不输出进度")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    cli = CommandLineDownloader(json_output=args.json, quiet=args.quiet)
+    options = {
+        'max_workers': max(1, args.concurrency),
+        'download_workers': max(1, args.concurrency),
+        'verify_workers': max(1, args.verify_workers),
+        'verify_images': not args.no_verify,
+        'min_width': max(0, args.min_width),
+        'min_height': max(0, args.min_height),
+        'skip_small_images': not args.keep_small,
+        'resolution_filter': args.resolution,
+        'prefix': args.prefix,
+    }
+    
+    try:
+        urls, image_urls = cli.load_url_source(args.input)
+    except Exception as e:
+        cli.emit('error', message=f"读取URL文件时出错: {str(e)}")
+        return 2
+    cli.emit('loaded', urls=len(urls), images=len(image_urls))
+    
+    runner = ShardedRunner(args.output, max(1, args.processes), options, cli)
+    try:
+        cancelled = runner.run(list(urls), image_urls)
+    except KeyboardInterrupt:
+        cancelled = True  # 再次按Ctrl+C，工作进程已被结束
+    if cancelled:
+        cli.emit('cancelled', downloaded=runner.downloaded)
+        return 130
+    
+    cli.emit('done', downloaded=runner.downloaded, failed=runner.failed, found=runner.found,
+             manifest=os.path.abspath(runner.manifest_path))
+    return 0 if runner.failed == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
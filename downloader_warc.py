@@ -0,0 +1,292 @@
+"""WARC输出：把抓取时的HTTP请求和响应原样记录下来，供归档和回放使用
+
+用法:
+    writer = WarcWriter("./capture")
+    engine.http = WarcRecordingSession(engine.http, writer)
+    ...
+    writer.close()
+
+网页、样式表和图片的请求都经过engine.http，记录在读取响应的同时进行：响应体边读边写入
+临时缓冲（超过spool_size后转存到磁盘），响应读完或关闭时再整体写成一条WARC记录，
+不会重复下载，也不会在内存中保留整个响应。每条记录单独gzip压缩，文件写满max_file_size
+后滚动到下一个，响应记录同时写入CDX索引（capture.cdx）。
+
+重定向由WarcRecordingSession逐跳跟随，每一跳都记录为单独的响应，回放时可以还原跳转。
+只读取了一部分就关闭的响应（如只读取文件头来获取图片尺寸）会带有WARC-Truncated标记，
+且不写入CDX索引，避免回放时把不完整的内容当作抓取结果。
+"""
+import base64
+import gzip
+import hashlib
+import ipaddress
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+CDX_HEADER = " CDX N b a m s k r M S V g\n"
+MAX_REDIRECTS = 30  # 与requests的默认值一致
+
+def _warc_date(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+def _record_id():
+    return f"<urn:uuid:{uuid.uuid4()}>"
+
+def _sha1_label(hasher):
+    return "sha1:" + base64.b32encode(hasher.digest()).decode('ascii')
+
+def surt_key(url):
+    """CDX使用的SURT形式URL键，如https://www.example.com/a?b -> com,example)/a?b（IP地址不反转）"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        if host.startswith('www.'):
+            host = host[4:]
+        host = ','.join(reversed(host.split('.')))
+    key = host + ')' + (parts.path or '/').lower()
+    if parts.query:
+        key += '?' + parts.query.lower()
+    return key
+
+class _Exchange:
+    """一次请求/响应：记录元数据，响应体边读边写入临时缓冲并计算摘要"""
+    def __init__(self, writer, response, fp):
+        self.writer = writer
+        self.timestamp = time.time()
+        self.url = response.url
+        self.request = response.request
+        self.status = fp.status
+        self.status_line = f"HTTP/{'1.1' if fp.version == 11 else '1.0'} {fp.status} {fp.reason}"
+        # 响应体已去掉分块编码，不再保留Transfer-Encoding头
+        self.headers = [(name, value) for name, value in fp.msg.items() if name.lower() != 'transfer-encoding']
+        self.content_type = fp.msg.get('Content-Type', '')
+        self.spool = tempfile.SpooledTemporaryFile(max_size=writer.spool_size)
+        self.payload_hash = hashlib.sha1()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.finished = False
+    
+    def feed(self, data):
+        if data:
+            self.spool.write(data)
+            self.payload_hash.update(data)
+            self.size += len(data)
+    
+    def finish(self, truncated=False):
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+        try:
+            self.writer.write_exchange(self, truncated)
+        finally:
+            self.spool.close()
+
+class _TeeReader:
+    """包装http.client响应，把读取到的原始响应体（仍是Content-Encoding压缩后的形式）同时交给_Exchange"""
+    def __init__(self, fp, exchange):
+        self._fp = fp
+        self._exchange = exchange
+    
+    def _after_read(self, data):
+        self._exchange.feed(data)
+        if not data or self._fp.isclosed():
+            self._exchange.finish()
+        return data
+    
+    def read(self, amt=None):
+        return self._after_read(self._fp.read() if amt is None else self._fp.read(amt))
+    
+    def read1(self, n=-1):
+        return self._after_read(self._fp.read1(n))
+    
+    def readinto(self, buffer):
+        count = self._fp.readinto(buffer)
+        self._after_read(bytes(memoryview(buffer)[:count]))
+        return count
+    
+    def close(self):
+        self._fp.close()
+        self._exchange.finish(truncated=True)  # 已完整读取时finish不会重复写入
+    
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+class WarcWriter:
+    """线程安全的WARC写入器，文件写满max_file_size字节后滚动"""
+    def __init__(self, output_dir, name="capture", max_file_size=1024 * 1024 * 1024, spool_size=1024 * 1024):
+        self.output_dir = output_dir
+        self.name = name
+        self.max_file_size = max_file_size
+        self.spool_size = spool_size
+        self.lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # 接着已有的文件编号继续
+        pattern = re.compile(rf'^{re.escape(name)}-(\d+)\.warc\.gz$')
+        numbers = [int(match.group(1)) for match in map(pattern.match, os.listdir(output_dir)) if match]
+        self.file_number = max(numbers) + 1 if numbers else 0
+        self.file = None
+        self.filename = None
+        
+        cdx_path = os.path.join(output_dir, f"{name}.cdx")
+        new_cdx = not os.path.exists(cdx_path)
+        self.cdx = open(cdx_path, 'a', encoding='utf-8')
+        if new_cdx:
+            self.cdx.write(CDX_HEADER)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _open_file(self):
+        self.filename = f"{self.name}-{self.file_number:05d}.warc.gz"
+        self.file_number += 1
+        self.file = open(os.path.join(self.output_dir, self.filename), 'xb')
+        info = b"software: URL Image Downloader\r\nformat: WARC File Format 1.1\r\n"
+        self._write_record([
+            ('WARC-Type', 'warcinfo'),
+            ('WARC-Record-ID', _record_id()),
+            ('WARC-Date', _warc_date(time.time())),
+            ('WARC-Filename', self.filename),
+            ('Content-Type', 'application/warc-fields'),
+        ], info, None, len(info))
+    
+    def _write_record(self, fields, head, body, length):
+        """写入一条gzip压缩的记录，body为可读的文件对象（可为None），返回(偏移, 压缩后长度)"""
+        offset = self.file.tell()
+        header = "WARC/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in fields)
+        header += f"Content-Length: {length}\r\n\r\n"
+        with gzip.GzipFile(fileobj=self.file, mode='wb') as gz:
+            gz.write(header.encode('utf-8'))
+            gz.write(head)
+            if body is not None:
+                shutil.copyfileobj(body, gz, 64 * 1024)
+            gz.write(b"\r\n\r\n")
+        return offset, self.file.tell() - offset
+    
+    def write_exchange(self, exchange, truncated=False):
+        """写入一对request/response记录，并为响应追加CDX行"""
+        request = exchange.request
+        parts = urlsplit(exchange.url)
+        request_head = f"{request.method} {request.path_url} HTTP/1.1\r\n"
+        request_headers = dict(request.headers)
+        request_headers.setdefault('Host', parts.netloc)
+        request_head += "".join(f"{name}: {value}\r\n" for name, value in request_headers.items()) + "\r\n"
+        request_block = request_head.encode('latin-1', 'replace')
+        
+        response_head = exchange.status_line + "\r\n"
+        response_head += "".join(f"{name}: {value}\r\n" for name, value in exchange.headers) + "\r\n"
+        response_head = response_head.encode('latin-1', 'replace')
+        block_hash = hashlib.sha1(response_head)
+        exchange.spool.seek(0)
+        for chunk in iter(lambda: exchange.spool.read(64 * 1024), b''):
+            block_hash.update(chunk)
+        exchange.spool.seek(0)
+        
+        date = _warc_date(exchange.timestamp)
+        response_id = _record_id()
+        response_fields = [
+            ('WARC-Type', 'response'),
+            ('WARC-Record-ID', response_id),
+            ('WARC-Date', date),
+            ('WARC-Target-URI', exchange.url),
+            ('WARC-Payload-Digest', _sha1_label(exchange.payload_hash)),
+            ('WARC-Block-Digest', _sha1_label(block_hash)),
+            ('Content-Type', 'application/http;msgtype=response'),
+        ]
+        if truncated:
+            response_fields.append(('WARC-Truncated', 'disconnect'))
+        request_fields = [
+            ('WARC-Type', 'request'),
+            ('WARC-Record-ID', _record_id()),
+            ('WARC-Date', date),
+            ('WARC-Target-URI', exchange.url),
+            ('WARC-Concurrent-To', response_id),
+            ('Content-Type', 'application/http;msgtype=request'),
+        ]
+        
+        with self.lock:
+            if self.file is None:
+                self._open_file()
+            self._write_record(request_fields, request_block, None, len(request_block))
+            offset, length = self._write_record(response_fields, response_head, exchange.spool,
+                                                len(response_head) + exchange.size)
+            # HEAD响应没有内容、截断的响应内容不完整，只保留记录，不进入回放索引
+            if request.method != 'HEAD' and not truncated:
+                mime = exchange.content_type.split(';', 1)[0].strip() or '-'
+                timestamp = time.strftime('%Y%m%d%H%M%S', time.gmtime(exchange.timestamp))
+                self.cdx.write(f"{surt_key(exchange.url)} {timestamp} {exchange.url} {mime} {exchange.status} "
+                               f"{_sha1_label(exchange.payload_hash)[5:]} - - {length} {offset} {self.filename}\n")
+            
+            if self.file.tell() >= self.max_file_size:
+                self.file.close()
+                self.file = None
+    
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            self.cdx.close()
+
+class WarcRecordingSession:
+    """包装engine.http（requests模块或Session），记录经过它的每个请求和响应"""
+    def __init__(self, http, writer):
+        self.http = http
+        self.writer = writer
+    
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', False)  # 与requests.head一致
+        return self.request('HEAD', url, **kwargs)
+    
+    def request(self, method, url, **kwargs):
+        """发送请求并记录；重定向在这里逐跳跟随，每一跳的响应都单独记录，回放时可以还原跳转"""
+        # 始终以流式方式请求，先接上记录再读取响应体；调用方不要求流式时在这里读完
+        stream = kwargs.pop('stream', False)
+        allow_redirects = kwargs.pop('allow_redirects', True)
+        response = self._send(method, url, kwargs)
+        history = []
+        while allow_redirects and response.is_redirect:
+            if len(history) >= MAX_REDIRECTS:
+                response.close()
+                raise requests.TooManyRedirects(f"超过{MAX_REDIRECTS}次重定向", response=response)
+            response.content  # 读完跳转响应的内容，写入记录并释放连接
+            history.append(response)
+            url = urljoin(response.url, response.headers['Location'])
+            # 与requests一致：303以及POST的301/302改为GET并去掉请求体
+            if (response.status_code == 303 and method != 'HEAD') or (
+                    response.status_code in (301, 302) and method == 'POST'):
+                method = 'GET'
+                kwargs.pop('data', None)
+                kwargs.pop('json', None)
+            response = self._send(method, url, kwargs)
+        if history:
+            response.history = history
+        if not stream:
+            response.content
+        return response
+    
+    def _send(self, method, url, kwargs):
+        response = self.http.request(method, url, stream=True, allow_redirects=False, **kwargs)
+        fp = getattr(response.raw, '_fp', None)
+        if fp is not None and hasattr(fp, 'msg'):
+            exchange = _Exchange(self.writer, response, fp)
+            response.raw._fp = _TeeReader(fp, exchange)
+            if fp.isclosed():
+                exchange.finish()  # HEAD等没有响应体的请求
+        return response
@@ -0,0 +1,339 @@
+"""分布式下载：多台机器通过共享的工作队列处理同一批URL
+
+用法示例:
+    python -m downloader_workqueue submit /shared/batch.sqlite3 urls.txt     # 协调端：写入工作项
+    python -m downloader_workqueue work /shared/batch.sqlite3 -o ./images    # 每台机器运行一个或多个
+    python -m downloader_workqueue status /shared/batch.sqlite3
+
+工作端按批租用工作项（带超时），对整批执行分析、验证和下载，再逐项确认结果；获取失败的网页不确认，稍后重试。
+运行中定期续租；工作端崩溃或断开时租约过期，工作项自动回到队列由其他工作端处理。
+默认后端是SQLite文件（放在共享目录中），新增机器只需多运行一个工作端，无需手动拆分输入文件。
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from downloader_cli import CommandLineDownloader
+from downloader_engine import _iter_downloads
+
+class SqliteWorkQueue:
+    """基于SQLite文件的租约式工作队列
+    
+    工作项状态: pending（待处理）-> leased（已租用，lease_expires前有效）-> done/failed。
+    租约过期的工作项在下次lease时被重新分配；处理失败的工作项在retry_delay秒后重试，
+    尝试max_attempts次仍失败的标记为failed。
+    每个操作使用独立的短事务，多个进程或机器可以同时访问同一个文件。
+    """
+    def __init__(self, path, max_attempts=3, retry_delay=30.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, status TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT, updated REAL)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS items_status ON items (status, lease_expires)")
+    
+    def _transaction(self, func, *args):
+        """在写事务中执行func（BEGIN IMMEDIATE，保证多个工作端不会租到同一项）"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(*args)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+    
+    def put_many(self, urls, batch_size=10000):
+        """写入工作项（已存在的URL忽略），返回新增数量"""
+        added = 0
+        batch = []
+        
+        def insert(rows):
+            cursor = self.conn.executemany("INSERT OR IGNORE INTO items (url, updated) VALUES (?, ?)", rows)
+            return cursor.rowcount
+        
+        now = time.time()
+        for url in urls:
+            batch.append((url, now))
+            if len(batch) >= batch_size:
+                added += self._transaction(insert, batch)
+                batch = []
+        if batch:
+            added += self._transaction(insert, batch)
+        return added
+    
+    def lease(self, owner, count, lease_seconds):
+        """租用最多count个工作项（包括租约已过期的），返回[(id, url)]"""
+        def take():
+            now = time.time()
+            rows = self.conn.execute("""SELECT id, url FROM items
+                WHERE (status IN ('pending', 'leased') AND COALESCE(lease_expires, 0) < ?) AND attempts < ?
+                ORDER BY id LIMIT ?""", (now, self.max_attempts, count)).fetchall()
+            self.conn.executemany("""UPDATE items SET status = 'leased', owner = ?, lease_expires = ?,
+                attempts = attempts + 1, updated = ? WHERE id = ?""",
+                                  [(owner, now + lease_seconds, now, item_id) for item_id, _ in rows])
+            # 租约过期且已用完尝试次数的工作项不再分配
+            self.conn.execute("""UPDATE items SET status = 'failed', updated = ?
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""", (now, now, self.max_attempts))
+            return rows
+        return self._transaction(take)
+    
+    def renew(self, owner, item_ids, lease_seconds):
+        """延长仍由owner持有的租约"""
+        def update():
+            self.conn.executemany("UPDATE items SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                                  [(time.time() + lease_seconds, item_id, owner) for item_id in item_ids])
+        self._transaction(update)
+    
+    def ack(self, owner, item_id, result):
+        """确认工作项完成；租约已被他人接手时返回False（结果以先确认的为准）"""
+        def update():
+            cursor = self.conn.execute("""UPDATE items SET status = 'done', result = ?, updated = ?
+                WHERE id = ? AND owner = ? AND status = 'leased'""",
+                                       (json.dumps(result, ensure_ascii=False), time.time(), item_id, owner))
+            return cursor.rowcount > 0
+        return self._transaction(update)
+    
+    def release(self, owner, item_ids, error=None):
+        """归还未完成的工作项；error为None时（如取消）不计入尝试次数"""
+        def update():
+            now = time.time()
+            for item_id in item_ids:
+                if error is None:
+                    self.conn.execute("""UPDATE items SET status = 'pending', owner = NULL, lease_expires = NULL,
+                        attempts = attempts - 1, updated = ? WHERE id = ? AND owner = ? AND status = 'leased'""",
+                                      (now, item_id, owner))
+                else:
+                    self.conn.execute("""UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        owner = NULL, lease_expires = ?, result = ?, updated = ?
+                        WHERE id = ? AND owner = ? AND status = 'leased'""",
+                                      (self.max_attempts, now + self.retry_delay,
+                                       json.dumps({'error': error}, ensure_ascii=False), now, item_id, owner))
+        self._transaction(update)
+    
+    def fail(self, owner, item_id, error):
+        """记录一次失败的尝试：未用完尝试次数时回到队列等待重试，否则标记为failed
+        
+        返回(新状态, 已尝试次数)；租约已被他人接手时返回None。
+        """
+        def update():
+            row = self.conn.execute("SELECT attempts FROM items WHERE id = ? AND owner = ? AND status = 'leased'",
+                                    (item_id, owner)).fetchone()
+            if row is None:
+                return None
+            attempts = row[0]
+            status = 'failed' if attempts >= self.max_attempts else 'pending'
+            now = time.time()
+            # 待重试的工作项借用lease_expires记录最早重试时间
+            self.conn.execute("""UPDATE items SET status = ?, owner = NULL, lease_expires = ?, result = ?, updated = ?
+                WHERE id = ?""", (status, now + self.retry_delay,
+                                  json.dumps({'error': error, 'attempts': attempts}, ensure_ascii=False), now, item_id))
+            return status, attempts
+        return self._transaction(update)
+    
+    def counts(self):
+        """各状态的工作项数量（租约已过期的计入pending）"""
+        with self.lock:
+            rows = self.conn.execute("""SELECT CASE WHEN status = 'leased' AND lease_expires < ? THEN 'pending'
+                ELSE status END, COUNT(*) FROM items GROUP BY 1""", (time.time(),)).fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class QueueWorker(CommandLineDownloader):
+    """工作端：循环租用一批工作项，执行分析、验证和下载后逐项确认"""
+    def __init__(self, work_queue, output, batch_size=20, lease_seconds=300, json_output=False, quiet=False):
+        super().__init__(json_output=json_output, quiet=quiet)
+        self.work_queue = work_queue
+        self.output = output
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self.page_images = {}  # 当前批次 {网页URL: 图片URL列表}
+        self.page_errors = {}  # 当前批次获取或解析失败的网页 {网页URL: 错误信息}
+        self.page_images_lock = threading.Lock()
+    
+    def _analyze_single_url_parallel(self, url, index):
+        img_urls = super()._analyze_single_url_parallel(url, index)
+        with self.page_images_lock:
+            self.page_images[url] = img_urls
+        return img_urls
+    
+    def _on_page_error(self, url, error):
+        with self.page_images_lock:
+            self.page_errors[url] = str(error)
+    
+    def run(self, wait=False, poll_interval=5.0):
+        """处理工作项直到队列为空（wait为True时持续等待新工作项），返回处理的工作项数"""
+        processed = 0
+        self.is_downloading = True
+        while self.is_downloading:
+            items = self.work_queue.lease(self.owner, self.batch_size, self.lease_seconds)
+            if not items:
+                counts = self.work_queue.counts()
+                if not wait and counts['pending'] == 0 and counts['leased'] == 0:
+                    break
+                # 其他工作端仍持有租约：等待它们完成或租约过期
+                time.sleep(poll_interval)
+                continue
+            
+            # 处理期间定期续租，避免长批次的租约过期被他人接手
+            stop_renew = threading.Event()
+            item_ids = [item_id for item_id, _ in items]
+            
+            def renew_leases():
+                while not stop_renew.wait(self.lease_seconds / 3):
+                    self.work_queue.renew(self.owner, item_ids, self.lease_seconds)
+            renewer = threading.Thread(target=renew_leases, daemon=True)
+            renewer.start()
+            try:
+                self._process_batch(items)
+                processed += len(items)
+            except KeyboardInterrupt:
+                self.is_downloading = False
+                self.work_queue.release(self.owner, item_ids)
+                raise
+            except Exception as e:
+                self.emit('error', message=f"处理批次时出错: {str(e)}")
+                self.work_queue.release(self.owner, item_ids, str(e))
+            finally:
+                stop_renew.set()
+                renewer.join()
+        return processed
+    
+    def _process_batch(self, items):
+        with self.page_images_lock:
+            self.page_images = {}
+            self.page_errors = {}
+        self.reset_session()
+        urls = [url for _, url in items]
+        
+        img_urls = self.analyze_urls(urls)
+        img_urls = self.finish_images(list(dict.fromkeys(img_urls)))
+        if not self.is_downloading:
+            raise KeyboardInterrupt
+        
+        results = {}
+        for result in _iter_downloads(self, img_urls, self.output, self.download_workers):
+            results[result.url] = result
+            if not self.is_downloading:
+                raise KeyboardInterrupt
+        
+        # 逐项确认：每个网页记录其图片的下载结果（被过滤的图片不列出）
+        for item_id, url in items:
+            error = self.page_errors.get(url)
+            if error is not None:
+                # 网页获取失败（超时、5xx、DNS等）不能当作没有图片而确认，计入尝试次数后重试
+                outcome = self.work_queue.fail(self.owner, item_id, error)
+                if outcome is None:
+                    self.emit('lease_lost', url=url)
+                else:
+                    self.emit('item_failed' if outcome[0] == 'failed' else 'item_retry',
+                              url=url, attempts=outcome[1], error=error)
+                continue
+            downloaded = []
+            failed = []
+            for img_url in self.page_images.get(url, ()):
+                result = results.get(img_url)
+                if result is None:
+                    continue
+                if result.error is None:
+                    downloaded.append({'url': img_url, 'path': result.path})
+                else:
+                    failed.append({'url': img_url, 'error': str(result.error)})
+            if self.work_queue.ack(self.owner, item_id, {'downloaded': downloaded, 'failed': failed}):
+                self.emit('item', url=url, downloaded=len(downloaded), failed=len(failed))
+            else:
+                self.emit('lease_lost', url=url)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m downloader_workqueue",
+                                     description="通过共享的SQLite工作队列在多台机器上分布式下载图片")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    submit = commands.add_parser("submit", help="读取URL文件并写入工作队列")
+    submit.add_argument("queue", help="工作队列文件（SQLite，放在所有机器都能访问的共享目录中）")
+    submit.add_argument("input", help="URL文件（每行一个URL，或站点地图/订阅源，支持.gz、URL和\"-\"表示标准输入）")
+    
+    status = commands.add_parser("status", help="查看工作队列进度")
+    status.add_argument("queue", help="工作队列文件")
+    
+    work = commands.add_parser("work", help="作为工作端处理队列中的URL")
+    work.add_argument("queue", help="工作队列文件")
+    work.add_argument("-o", "--output", default=".", help="保存目录（默认当前目录）")
+    work.add_argument("-j", "--concurrency", type=int, default=5, help="分析和下载的并发数（默认5）")
+    work.add_argument("--verify-workers", type=int, default=10, help="验证图片的并发数（默认10）")
+    work.add_argument("--batch", type=int, default=20, help="每次租用的URL数（默认20）")
+    work.add_argument("--lease", type=float, default=300, help="租约时长秒数，超时未续租的工作项会被重新分配（默认300）")
+    work.add_argument("--wait", action="store_true", help="队列为空时继续等待新工作项")
+    work.add_argument("--min-width", type=int, default=0, help="最小图片宽度")
+    work.add_argument("--min-height", type=int, default=0, help="最小图片高度")
+    work.add_argument("--keep-small", action="store_true", help="不跳过小于50x50的图标")
+    work.add_argument("--resolution", help="只保留指定分辨率，如800x600")
+    work.add_argument("--no-verify", action="store_true", help="不验证图片（同时不按尺寸过滤）")
+    work.add_argument("--prefix", default="image", help="文件名前缀（默认image）")
+    
+    for command in (submit, status, work):
+        command.add_argument("--json", action="store_true", help="以JSON行输出进度和结果")
+        command.add_argument("-q", "--quiet", action="store_true", help="文本模式下不输出进度")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    work_queue = SqliteWorkQueue(args.queue)
+    try:
+        if args.command == "submit":
+            cli = CommandLineDownloader(json_output=args.json, quiet=args.quiet)
+            try:
+                urls, image_urls = cli.load_url_source(args.input)
+            except Exception as e:
+                cli.emit('error', message=f"读取URL文件时出错: {str(e)}")
+                return 2
+            # 站点地图中直接列出的图片URL也作为工作项，工作端会识别为直接图片
+            added = work_queue.put_many(list(urls) + image_urls)
+            cli.emit('submitted', added=added, **work_queue.counts())
+            return 0
+        
+        if args.command == "status":
+            CommandLineDownloader(json_output=args.json).emit('queue', **work_queue.counts())
+            return 0
+        
+        worker = QueueWorker(work_queue, args.output, max(1, args.batch), max(1.0, args.lease),
+                             json_output=args.json, quiet=args.quiet)
+        worker.max_workers = max(1, args.concurrency)
+        worker.download_workers = max(1, args.concurrency)
+        worker.verify_workers = max(1, args.verify_workers)
+        worker.verify_images = not args.no_verify
+        worker.min_width = max(0, args.min_width)
+        worker.min_height = max(0, args.min_height)
+        worker.skip_small_images = not args.keep_small
+        worker.resolution_filter = args.resolution
+        worker.prefix = args.prefix
+        os.makedirs(args.output, exist_ok=True)
+        try:
+            processed = worker.run(wait=args.wait)
+        except KeyboardInterrupt:
+            worker.emit('cancelled')
+            return 130
+        worker.emit('done', processed=processed, **work_queue.counts())
+        return 0
+    finally:
+        work_queue.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
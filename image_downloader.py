@@ -1,18 +1,161 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
+import tkinter.font as tkfont
 import requests
-from bs4 import BeautifulSoup
 import os
 import threading
-import re
-import urllib.parse
 from urllib.parse import urlparse
 from io import BytesIO
 from PIL import Image, ImageTk
-import json
 import traceback
 import webbrowser
 import concurrent.futures  # 添加concurrent.futures用于线程池
+import bisect
+import collections
+import sys
+from array import array
+
+from downloader_engine import ImageEngine, UrlStore
+
+class PreviewCache:
+    """按字节预算淘汰的预览图片LRU缓存（线程安全）
+    
+    值为(解码图, 适应画布的缩放图, 缩放比例, 原始尺寸, 图片数据)，按图片像素和数据字节数计入预算。
+    同一key正在加载时，其他线程等待它完成而不重复下载。
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.items = collections.OrderedDict()  # key -> (值, 字节数)
+        self.loading = {}  # key -> threading.Event
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def value_bytes(value):
+        size = 0
+        seen = set()
+        for item in value:
+            if id(item) in seen:
+                continue  # 无需缩放时解码图和缩放图是同一对象
+            seen.add(id(item))
+            if isinstance(item, Image.Image):
+                size += item.width * item.height * len(item.getbands())
+            elif isinstance(item, bytes):
+                size += len(item)
+        return size
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None:
+                return None
+            self.items.move_to_end(key)
+            return entry[0]
+    
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items or key in self.loading
+    
+    def begin(self, key):
+        """开始加载key，返回None表示由调用者负责加载，否则返回可等待的Event"""
+        with self.lock:
+            event = self.loading.get(key)
+            if event is None:
+                self.loading[key] = threading.Event()
+            return event
+    
+    def end(self, key, value=None):
+        """加载结束（value为None表示失败或取消），唤醒等待的线程"""
+        with self.lock:
+            if value is not None:
+                size = self.value_bytes(value)
+                if size <= self.max_bytes:
+                    old = self.items.pop(key, None)
+                    if old is not None:
+                        self.total_bytes -= old[1]
+                    self.items[key] = (value, size)
+                    self.total_bytes += size
+                    while self.total_bytes > self.max_bytes:
+                        _, (_, evicted_size) = self.items.popitem(last=False)
+                        self.total_bytes -= evicted_size
+            event = self.loading.pop(key, None)
+        if event is not None:
+            event.set()
+    
+    def get_data(self, url):
+        """返回任一画布尺寸下缓存的该URL原始图片数据，没有时返回None"""
+        with self.lock:
+            for (cached_url, _, _), (value, _) in self.items.items():
+                if cached_url == url:
+                    return value[4]
+        return None
+    
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.total_bytes = 0
+
+class UiEventBus:
+    """工作线程与Tk主循环之间的事件总线
+    
+    工作线程只往队列里放事件，主线程按固定节拍统一处理，避免每条状态都调用root.after淹没事件队列。
+    日志消息成批交给on_log；post()按key合并，同一节拍内只执行最新的一次（如进度、高亮）。
+    """
+    def __init__(self, root, on_log, interval=100):
+        self.root = root
+        self.on_log = on_log  # 接收一批日志消息的回调
+        self.interval = interval  # 刷新间隔（毫秒）
+        self.lock = threading.Lock()
+        self.events = []  # 按顺序的(回调, 参数, 关键字参数)，回调为None表示日志消息
+        self.latest = {}  # key -> (回调, 参数)，新事件覆盖旧事件
+    
+    def start(self):
+        self.root.after(self.interval, self._tick)
+    
+    def log(self, message):
+        with self.lock:
+            self.events.append((None, message, None))
+    
+    def call(self, callback, *args, **kwargs):
+        """在主线程中按顺序执行一次回调"""
+        with self.lock:
+            self.events.append((callback, args, kwargs))
+    
+    def post(self, key, callback, *args):
+        """可合并的事件，同一key只保留最新的"""
+        with self.lock:
+            self.latest[key] = (callback, args)
+    
+    def flush(self):
+        with self.lock:
+            events, latest = self.events, self.latest
+            self.events, self.latest = [], {}
+        
+        # 先处理合并的事件，保证随后的完成回调不会被旧进度覆盖
+        for callback, args in latest.values():
+            self._run(callback, args)
+        
+        messages = []
+        for callback, args, kwargs in events:
+            if callback is None:
+                messages.append(args)
+                continue
+            if messages:
+                self._run(self.on_log, (messages,))
+                messages = []
+            self._run(callback, args, kwargs)
+        if messages:
+            self._run(self.on_log, (messages,))
+    
+    def _run(self, callback, args, kwargs=None):
+        try:
+            callback(*args, **(kwargs or {}))
+        except Exception as e:
+            print(f"处理界面事件出错: {str(e)}")
+    
+    def _tick(self):
+        self.flush()
+        self.root.after(self.interval, self._tick)
 
 # 定义应用程序颜色主题
 class AppTheme:
@@ -26,8 +169,384 @@ class AppTheme:
     HOVER_COLOR = "#0052a3"  # 悬停色，更深
     BORDER_COLOR = "#e6e6e6"  # 边框色
 
-class ImageDownloader:
+class VirtualListView(ttk.Frame):
+    """只绘制可见行的虚拟列表
+    
+    数据源可以是任何支持len()和下标访问的序列（list、UrlStore），十万行以上也不会卡顿。
+    支持增量搜索过滤、O(1)跳转到指定下标，高亮当前项时只重绘可见的几十行。
+    """
+    FILTER_CHUNK = 20000  # 过滤时每次事件循环处理的行数
+    
+    def __init__(self, master, font=("Microsoft YaHei UI", 9), height=6, on_activate=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.font = tkfont.Font(font=font)
+        self.row_height = self.font.metrics("linespace") + 2
+        self.on_activate = on_activate  # 双击或回车时回调，参数为数据下标
+        
+        self.items = []
+        self.view = None  # 过滤后的数据下标array，None表示未过滤
+        self.top = 0  # 第一可见行（视图中的行号）
+        self.current = -1  # 高亮的数据下标（如正在处理的URL）
+        self.selected = -1  # 用户选中的数据下标
+        self.empty_text = ""
+        self._filter_job = None
+        
+        self.scrollbar = ttk.Scrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(self, height=height * self.row_height, bg="white", highlightthickness=0,
+                                takefocus=True)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)  # Windows
+        self.canvas.bind("<Button-4>", self._on_wheel)    # Linux上滚
+        self.canvas.bind("<Button-5>", self._on_wheel)    # Linux下滚
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", lambda e: self._activate())
+        self.canvas.bind("<Return>", lambda e: self._activate())
+        self.canvas.bind("<Up>", lambda e: self._move_selection(-1))
+        self.canvas.bind("<Down>", lambda e: self._move_selection(1))
+        self.canvas.bind("<Prior>", lambda e: self._move_selection(-self._visible_rows()))
+        self.canvas.bind("<Next>", lambda e: self._move_selection(self._visible_rows()))
+    
+    def set_items(self, items, empty_text=""):
+        """设置数据源并重置滚动位置和过滤条件"""
+        self._cancel_filter()
+        self.items = items
+        self.view = None
+        self.top = 0
+        self.current = -1
+        self.selected = -1
+        self.empty_text = empty_text
+        self.redraw()
+    
+    def row_count(self):
+        return len(self.view) if self.view is not None else len(self.items)
+    
+    def _item_index(self, row):
+        return self.view[row] if self.view is not None else row
+    
+    def _row_of(self, index):
+        """数据下标对应的视图行号，过滤后不在视图中时返回-1"""
+        if self.view is None:
+            return index if 0 <= index < len(self.items) else -1
+        row = bisect.bisect_left(self.view, index)
+        return row if row < len(self.view) and self.view[row] == index else -1
+    
+    def _visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+    
+    def redraw(self):
+        """只重绘可见行"""
+        self.canvas.delete("all")
+        count = self.row_count()
+        visible = self._visible_rows()
+        self.top = max(0, min(self.top, count - visible))
+        width = self.canvas.winfo_width()
+        
+        if count == 0 and self.empty_text:
+            self.canvas.create_text(4, 2, anchor="nw", text=self.empty_text, font=self.font, fill="gray")
+        
+        for row in range(self.top, min(self.top + visible + 1, count)):
+            index = self._item_index(row)
+            y = (row - self.top) * self.row_height
+            if index == self.selected or index == self.current:
+                color = "#cce0ff" if index == self.selected else "#e0e0e0"
+                self.canvas.create_rectangle(0, y, width, y + self.row_height, fill=color, width=0)
+            self.canvas.create_text(4, y + 1, anchor="nw", text=f"{index + 1}. {self.items[index]}", font=self.font)
+        
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + visible) / count))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def see(self, index):
+        """滚动使指定数据下标可见（O(1)，过滤时O(log n)）"""
+        row = self._row_of(index)
+        if row < 0:
+            self.redraw()
+            return
+        visible = self._visible_rows()
+        if row < self.top or row >= self.top + visible:
+            self.top = max(0, row - visible // 2)
+        self.redraw()
+    
+    def set_current(self, index, see=True):
+        """设置高亮项，-1表示清除高亮"""
+        self.current = index
+        if see and index >= 0:
+            self.see(index)
+        else:
+            self.redraw()
+    
+    def set_filter(self, text):
+        """按子串过滤（不区分大小写），分批在事件循环中完成，不阻塞界面"""
+        self._cancel_filter()
+        text = text.strip().lower()
+        if not text:
+            self.view = None
+            self.redraw()
+            return
+        self.view = array('l')
+        self.top = 0
+        self._filter_job = self.after_idle(self._filter_step, text, 0)
+    
+    def _filter_step(self, text, start):
+        end = min(start + self.FILTER_CHUNK, len(self.items))
+        items = self.items
+        self.view.extend(i for i in range(start, end) if text in items[i].lower())
+        self.redraw()
+        if end < len(self.items):
+            self._filter_job = self.after(1, self._filter_step, text, end)
+        else:
+            self._filter_job = None
+    
+    def _cancel_filter(self):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+            self._filter_job = None
+    
+    def _on_scrollbar(self, *args):
+        count = self.row_count()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * count)
+        elif args[0] == "scroll":
+            step = self._visible_rows() if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.redraw()
+    
+    def _on_wheel(self, event):
+        if event.num == 5 or event.delta < 0:
+            self.top += 3
+        elif event.num == 4 or event.delta > 0:
+            self.top -= 3
+        self.redraw()
+    
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        row = self.top + event.y // self.row_height
+        if 0 <= row < self.row_count():
+            self.selected = self._item_index(row)
+            self.redraw()
+    
+    def _move_selection(self, delta):
+        count = self.row_count()
+        if not count:
+            return
+        row = self._row_of(self.selected) if self.selected >= 0 else -1
+        row = max(0, min(count - 1, row + delta if row >= 0 else 0))
+        self.selected = self._item_index(row)
+        self.see(self.selected)
+    
+    def _activate(self):
+        if self.on_activate and self.selected >= 0:
+            self.on_activate(self.selected)
+
+class ThumbnailGrid(ttk.Frame):
+    """只绘制可见格子的缩略图网格
+    
+    缩略图由load_thumbnail(url, size)在后台线程池中生成，通过post(回调, *参数)交回主线程；
+    只保留最近的max_thumbnails张缩略图，PhotoImage对象按可见格子复用，几千张图片也不会全部载入内存。
+    点击切换选中（Shift+点击选中一段），选中状态直接写入selected集合（元素为URL）。
+    """
+    def __init__(self, master, items, selected, load_thumbnail, post, on_activate=None,
+                 on_selection_changed=None, thumb_size=128, workers=4, max_thumbnails=500, **kwargs):
+        super().__init__(master, **kwargs)
+        self.items = items
+        self.selected = selected
+        self.load_thumbnail = load_thumbnail
+        self.post = post
+        self.on_activate = on_activate  # 双击回调，参数为下标
+        self.on_selection_changed = on_selection_changed
+        self.thumb_size = thumb_size
+        self.cell_size = thumb_size + 24  # 留出边框和编号的位置
+        self.max_thumbnails = max_thumbnails
+        
+        self.thumbnails = collections.OrderedDict()  # 下标 -> PIL缩略图（LRU）
+        self.requested = set()  # 已提交但尚未完成的下标
+        self.failed = set()  # 无法生成缩略图的下标
+        self.photos = []  # 复用的PhotoImage，按可见格子顺序分配
+        self.photo_contents = []  # 每个PhotoImage当前显示的下标
+        self.top_row = 0
+        self.visible = (0, 0)  # 上次绘制的下标范围，供后台线程判断是否仍需生成
+        self.anchor = None  # Shift多选的起点
+        self.redraw_job = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        
+        self.scrollbar = ttk.Scrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(self, bg="white", highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)  # Windows
+        self.canvas.bind("<Button-4>", self._on_wheel)    # Linux上滚
+        self.canvas.bind("<Button-5>", self._on_wheel)    # Linux下滚
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Shift-Button-1>", lambda e: self._on_click(e, extend=True))
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        self.bind("<Destroy>", lambda e: self.executor.shutdown(wait=False) if e.widget is self else None)
+    
+    def _columns(self):
+        return max(1, self.canvas.winfo_width() // self.cell_size)
+    
+    def _visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.cell_size + 1)
+    
+    def _row_count(self):
+        return (len(self.items) + self._columns() - 1) // self._columns()
+    
+    def _visible_range(self):
+        columns = self._columns()
+        start = self.top_row * columns
+        return start, min(len(self.items), start + self._visible_rows() * columns)
+    
+    def redraw(self):
+        """只绘制可见格子，并为缺少缩略图的格子提交生成任务"""
+        self.canvas.delete("all")
+        columns = self._columns()
+        visible_rows = self._visible_rows()
+        row_count = self._row_count()
+        self.top_row = max(0, min(self.top_row, row_count - visible_rows + 1))
+        start, end = self._visible_range()
+        self.visible = (start, end)
+        
+        # 按需扩充PhotoImage池，大小等于可见格子数
+        while len(self.photos) < end - start:
+            self.photos.append(ImageTk.PhotoImage("RGB", (self.thumb_size, self.thumb_size)))
+            self.photo_contents.append(None)
+        
+        for slot, index in enumerate(range(start, end)):
+            x = (index % columns) * self.cell_size
+            y = (index // columns - self.top_row) * self.cell_size
+            url = self.items[index]
+            is_selected = url in self.selected
+            self.canvas.create_rectangle(x + 2, y + 2, x + self.cell_size - 2, y + self.cell_size - 2,
+                                         outline=AppTheme.PRIMARY_COLOR if is_selected else AppTheme.BORDER_COLOR,
+                                         width=3 if is_selected else 1)
+            thumb_x = x + (self.cell_size - self.thumb_size) // 2
+            thumb_y = y + 4
+            
+            thumbnail = self.thumbnails.get(index)
+            if thumbnail is not None:
+                self.thumbnails.move_to_end(index)
+                if self.photo_contents[slot] != index:
+                    self.photos[slot].paste(thumbnail)
+                    self.photo_contents[slot] = index
+                self.canvas.create_image(thumb_x, thumb_y, image=self.photos[slot], anchor="nw")
+            else:
+                text = "无法加载" if index in self.failed else "加载中..."
+                self.canvas.create_text(x + self.cell_size // 2, thumb_y + self.thumb_size // 2,
+                                        text=text, fill="gray")
+                if index not in self.failed:
+                    self._request(index)
+            
+            label = f"✔ {index + 1}" if is_selected else str(index + 1)
+            self.canvas.create_text(x + self.cell_size // 2, y + self.cell_size - 10, text=label,
+                                    fill=AppTheme.PRIMARY_COLOR if is_selected else AppTheme.TEXT_COLOR)
+        
+        if row_count:
+            self.scrollbar.set(self.top_row / row_count, min(1.0, (self.top_row + visible_rows) / row_count))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def _request(self, index):
+        if index in self.requested:
+            return
+        self.requested.add(index)
+        self.executor.submit(self._generate, index, self.items[index])
+    
+    def _generate(self, index, url):
+        """后台线程：生成缩略图；格子已滚出可见区域时跳过"""
+        start, end = self.visible
+        if not start <= index < end:
+            self.post(self._thumbnail_ready, index, None, False)
+            return
+        try:
+            thumbnail = self.load_thumbnail(url, self.thumb_size)
+            self.post(self._thumbnail_ready, index, thumbnail, True)
+        except Exception as e:
+            print(f"生成缩略图 {url} 出错: {str(e)}")
+            self.post(self._thumbnail_ready, index, None, True)
+    
+    def _thumbnail_ready(self, index, thumbnail, finished):
+        """主线程：保存缩略图并重绘（窗口已关闭时忽略）"""
+        self.requested.discard(index)
+        if not self.winfo_exists():
+            return
+        if thumbnail is not None:
+            self.thumbnails[index] = thumbnail
+            while len(self.thumbnails) > self.max_thumbnails:
+                self.thumbnails.popitem(last=False)
+        elif finished:
+            self.failed.add(index)
+        start, end = self.visible
+        if finished and start <= index < end and self.redraw_job is None:
+            # 同一批完成的缩略图只重绘一次
+            self.redraw_job = self.after_idle(self._scheduled_redraw)
+    
+    def _scheduled_redraw(self):
+        self.redraw_job = None
+        self.redraw()
+    
+    def _index_at(self, event):
+        column = event.x // self.cell_size
+        if column >= self._columns():
+            return None
+        index = (self.top_row + event.y // self.cell_size) * self._columns() + column
+        return index if index < len(self.items) else None
+    
+    def _on_click(self, event, extend=False):
+        index = self._index_at(event)
+        if index is None:
+            return
+        if extend and self.anchor is not None:
+            # Shift+点击：选中起点到当前格子之间的全部图片
+            low, high = sorted((self.anchor, index))
+            self.selected.update(self.items[i] for i in range(low, high + 1))
+        else:
+            url = self.items[index]
+            if url in self.selected:
+                self.selected.discard(url)
+            else:
+                self.selected.add(url)
+            self.anchor = index
+        self.redraw()
+        if self.on_selection_changed:
+            self.on_selection_changed()
+    
+    def _on_double_click(self, event):
+        index = self._index_at(event)
+        if index is not None and self.on_activate:
+            self.on_activate(index)
+    
+    def select_all(self, selected=True):
+        if selected:
+            self.selected.update(self.items)
+        else:
+            self.selected.clear()
+        self.redraw()
+        if self.on_selection_changed:
+            self.on_selection_changed()
+    
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.top_row = int(float(args[1]) * self._row_count())
+        elif args[0] == "scroll":
+            step = self._visible_rows() - 1 if args[2] == "pages" else 1
+            self.top_row += int(args[1]) * max(1, step)
+        self.redraw()
+    
+    def _on_wheel(self, event):
+        if event.num == 5 or event.delta < 0:
+            self.top_row += 1
+        elif event.num == 4 or event.delta > 0:
+            self.top_row -= 1
+        self.redraw()
+
+class ImageDownloader(ImageEngine):
     def __init__(self, root):
+        super().__init__()
         self.root = root
         self.root.title("URL图片批量下载器")
         
@@ -38,15 +557,9 @@ class ImageDownloader:
         self.root.minsize(800, 800)  # 最小高度，防止窗口缩小导致功能隐藏
         self.root.configure(bg=AppTheme.BG_COLOR)
         
-        # 性能优化设置
-        self.max_connections = 10  # 最大并发连接数
-        self.connection_timeout = 15  # 连接超时（秒）
-        self.max_image_size = 20 * 1024 * 1024  # 最大图片大小（20MB）
-        self.chunk_size = 8192  # 文件下载分块大小
-        self.memory_limit = 100 * 1024 * 1024  # 内存使用限制（100MB）
-        
         # 初始化变量
-        self.url_list = []  # URL列表
+        self.url_list = UrlStore()  # URL列表（去重，支持O(1)按URL查下标）
+        self.direct_image_urls = []  # 站点地图/订阅源中直接列出的图片，无需分析网页
         self.is_downloading = False  # 是否正在下载
         self.preview_images = []  # 预览图片URL列表
         self.current_preview_index = 0  # 当前预览图片索引
@@ -56,10 +569,29 @@ class ImageDownloader:
         self.prefix_var = tk.StringVar(value="image")  # 默认前缀为"image"
         
         # 图片缩放相关变量
-        self.original_pil_img = None  # 存储原始PIL图片对象
+        self.original_pil_img = None  # 存储解码后的PIL图片对象（预览时可能是缩小解码的）
+        self.original_size = (0, 0)  # 图片的原始尺寸
+        self.preview_source = None  # 图片原始数据，放大超过解码分辨率时按需全尺寸解码
+        self.full_resolution_source = None  # 正在后台全尺寸解码的preview_source，避免重复提交
+        self.zoom_pyramid = []  # 缩放用的图片金字塔，每层按2倍缩小
+        self.zoom_pyramid_source = None  # 金字塔对应的解码图片，图片变化时重建
+        self.zoom_render_job = None  # 滚轮停止后的高质量重绘任务
+        self.zoom_settle_delay = 150  # 滚轮停止多久后高质量重绘（毫秒）
         self.current_scale = 1.0  # 当前缩放比例
         self.base_scale = 1.0     # 基础缩放比例（适应画布的比例）
         
+        # 预览图片在后台线程中加载，preview_generation用于丢弃过期的结果
+        self.preview_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.preview_generation = 0
+        
+        # 已解码预览图片的LRU缓存，并在后台预取相邻图片（优先浏览方向）
+        self.preview_cache = PreviewCache(256 * 1024 * 1024)
+        self.prefetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.prefetch_ahead = 4  # 浏览方向上预取的张数
+        self.prefetch_behind = 2  # 反方向预取的张数
+        self.preview_direction = 1
+        self.last_preview_index = -1
+        
         # 分辨率筛选相关变量
         self.resolution_info_collected = False  # 标记是否已收集分辨率信息
         self.image_resolutions = {}  # 存储图片URL到分辨率的映射
@@ -92,15 +624,18 @@ class ImageDownloader:
         self.is_downloading = False
         
         # 存储URL列表
-        self.url_list = []
+        self.url_list = UrlStore()
         
-        # 调试日志
-        self.debug_log = []
+        # 调试日志（环形缓冲区，只保留最近的max_log_lines条）
+        self.max_log_lines = 1000
+        self.debug_log = collections.deque(maxlen=self.max_log_lines)
+        self.log_text = None
+        
+        # 工作线程通过事件总线更新界面
+        self.ui_events = UiEventBus(self.root, self._append_log)
+        self.ui_events.start()
         
         # 分辨率信息缓存
-        self.resolution_map = {}  # 完整分辨率映射 {url: "宽x高"}
-        self.width_map = {}       # 宽度映射 {url: 宽}
-        self.height_map = {}      # 高度映射 {url: 高}
         self.resolution_info_collected = False  # 标记是否已收集过分辨率信息
         
         # 设置应用图标
@@ -214,6 +749,7 @@ class ImageDownloader:
         self.popup_menu = tk.Menu(self.root, tearoff=0)
         self.popup_menu.add_command(label="查看日志", command=self.show_log_window)
         self.popup_menu.add_command(label="图片列表", command=self.show_image_list)
+        self.popup_menu.add_command(label="缩略图浏览", command=self.show_thumbnail_gallery)
         self.popup_menu.add_separator()
         self.popup_menu.add_command(label="帮助", command=self.show_help)
         self.popup_menu.add_command(label="关于", command=self.show_about)
@@ -308,18 +844,22 @@ class ImageDownloader:
         clear_button.pack(side=tk.LEFT)
         
         # URL列表区域
-        url_list_label = ttk.Label(self.url_list_frame, text="已加载URL列表:")
-        url_list_label.pack(anchor=tk.W, padx=5, pady=(10, 0))
+        url_list_header = ttk.Frame(self.url_list_frame)
+        url_list_header.pack(fill=tk.X, padx=5, pady=(10, 0))
+        
+        url_list_label = ttk.Label(url_list_header, text="已加载URL列表:")
+        url_list_label.pack(side=tk.LEFT)
         
-        # URL文本区域和滚动条
-        url_scroll = ttk.Scrollbar(self.url_list_frame)
-        url_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        # 增量搜索
+        self.url_filter_var = tk.StringVar()
+        url_filter_entry = ttk.Entry(url_list_header, textvariable=self.url_filter_var, width=15)
+        url_filter_entry.pack(side=tk.RIGHT)
+        ttk.Label(url_list_header, text="搜索:").pack(side=tk.RIGHT, padx=(0, 5))
+        self.url_filter_var.trace_add("write", lambda *args: self.url_view.set_filter(self.url_filter_var.get()))
         
-        self.url_text = tk.Text(self.url_list_frame, height=6, width=30, 
-                              font=("Microsoft YaHei UI", 9),
-                              yscrollcommand=url_scroll.set)
-        self.url_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        url_scroll.config(command=self.url_text.yview)
+        # 虚拟列表，只绘制可见的URL
+        self.url_view = VirtualListView(self.url_list_frame, height=6)
+        self.url_view.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # URL状态标签
         self.url_status = ttk.Label(self.url_list_frame, text="已加载 0 个URL")
@@ -418,6 +958,29 @@ class ImageDownloader:
         min_height_entry = ttk.Entry(size_frame, textvariable=self.min_height_var, width=6)
         min_height_entry.grid(row=0, column=3, sticky=tk.W)
         
+        # 同站爬取设置
+        crawl_frame = ttk.Frame(self.advanced_frame)
+        crawl_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.crawl_var = tk.BooleanVar(value=False)
+        crawl_check = ttk.Checkbutton(crawl_frame, text="同站爬取（跟随页面链接）",
+                                      variable=self.crawl_var)
+        crawl_check.grid(row=0, column=0, columnspan=4, sticky=tk.W)
+        
+        crawl_depth_label = ttk.Label(crawl_frame, text="最大深度:")
+        crawl_depth_label.grid(row=1, column=0, sticky=tk.W, padx=(0, 5))
+        
+        self.crawl_depth_var = tk.StringVar(value="2")
+        crawl_depth_entry = ttk.Entry(crawl_frame, textvariable=self.crawl_depth_var, width=6)
+        crawl_depth_entry.grid(row=1, column=1, sticky=tk.W, padx=(0, 10))
+        
+        crawl_pages_label = ttk.Label(crawl_frame, text="最大页数:")
+        crawl_pages_label.grid(row=1, column=2, sticky=tk.W, padx=(0, 5))
+        
+        self.crawl_pages_var = tk.StringVar(value="100")
+        crawl_pages_entry = ttk.Entry(crawl_frame, textvariable=self.crawl_pages_var, width=6)
+        crawl_pages_entry.grid(row=1, column=3, sticky=tk.W)
+        
         # 下载设置框架
         self.download_frame = ttk.LabelFrame(self.left_panel, text="下载设置", style="Card.TLabelframe")
         self.download_frame.pack(fill=tk.X, pady=(0, 10), padx=5)
@@ -490,7 +1053,7 @@ class ImageDownloader:
         self.next_button.pack(side=tk.LEFT, padx=(5, 0))
         
         # 选择性下载复选框
-        self.selected_var = tk.BooleanVar(value=True)
+        self.selected_var = tk.BooleanVar(value=False)
         self.select_check = ttk.Checkbutton(nav_frame, text="选中此图片",
                                            variable=self.selected_var,
                                            command=self.toggle_selection)
@@ -593,11 +1156,15 @@ class ImageDownloader:
     def load_urls_from_file(self):
         file_path = filedialog.askopenfilename(
             title="选择URL文件",
-            filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
+            filetypes=[("文本文件", "*.txt"), ("站点地图/订阅源", "*.xml;*.gz;*.rss;*.atom"), ("所有文件", "*.*")]
         )
         if not file_path:
             return
         
+        self.load_urls_from_path(file_path)
+    
+    def load_urls_from_path(self, file_path):
+        """加载指定路径的URL文件，"-"表示从标准输入读取"""
         # 开始加载前，显示加载状态
         self._update_status("正在加载URL文件...")
         self.progress_bar["value"] = 0
@@ -607,50 +1174,57 @@ class ImageDownloader:
         threading.Thread(target=self._load_urls_file_thread, args=(file_path,), daemon=True).start()
     
     def _load_urls_file_thread(self, file_path):
-        """在后台线程中加载URL文件"""
+        """在后台线程中流式加载URL文件（txt列表，或站点地图/订阅源XML，支持.gz和标准输入）"""
         try:
-            # 读取文件
-            with open(file_path, "r", encoding="utf-8") as f:
-                urls = [line.strip() for line in f.readlines() if line.strip()]
-                
-            if not urls:
-                self.root.after(0, lambda: messagebox.showwarning("警告", "文件中未找到URL"))
-                self.root.after(0, lambda: self._update_status("就绪"))
+            urls, image_urls = self.load_url_source(file_path)
+            if not urls and not image_urls:
+                self.ui_events.call(messagebox.showwarning, "警告", "文件中未找到URL")
+                self._post_status("就绪")
                 return
             
             # 更新UI需要在主线程中进行
-            self.root.after(0, lambda: self._update_loaded_urls(urls))
+            self.ui_events.call(self._update_loaded_urls, urls, image_urls)
             
         except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("错误", f"读取文件时出错: {str(e)}"))
-            self.root.after(0, lambda: self._update_status("就绪"))
+            self.ui_events.call(messagebox.showerror, "错误", f"读取文件时出错: {str(e)}")
+            self._post_status("就绪")
+    
+    def _load_feed_urls_thread(self, urls):
+        """在后台线程中展开输入的站点地图/订阅源URL，完成后开始分析"""
+        try:
+            page_urls, image_urls = self._expand_url_sources(urls)
+        except Exception as e:
+            self.ui_events.call(self._handle_error, f"读取站点地图时出错: {str(e)}")
+            return
+        self.ui_events.call(self._update_loaded_urls, page_urls, image_urls, True)
     
-    def _update_loaded_urls(self, urls):
+    def _update_loaded_urls(self, urls, image_urls=None, start_analysis=False):
         """更新加载的URL到UI（在主线程中调用）"""
         self.url_list = urls
+        self.direct_image_urls = image_urls or []
         
-        # 显示URLs到文本区域
-        self.url_text.delete(1.0, tk.END)
-        self.url_text.tag_configure("current", background="#e0e0e0")  # 定义高亮样式
-        
-        # 使用批处理更新文本，减少UI更新次数
-        url_text = ""
-        for i, url in enumerate(urls):
-            url_text += f"{i+1}. {url}\n"
-        
-        self.url_text.insert(tk.END, url_text)
+        # 显示URL列表（虚拟列表只绘制可见行）
+        self.url_filter_var.set("")
+        self.url_view.set_items(urls)
         
         # 更新URL状态
-        self.url_status.config(text=f"已加载 {len(urls)} 个URL")
+        summary = f"已加载 {len(urls)} 个URL"
+        if self.direct_image_urls:
+            summary += f"，{len(self.direct_image_urls)} 张直接图片"
+        self.url_status.config(text=summary)
+        
+        if start_analysis:
+            self.analyze_all_urls()
+            return
         
         # 将第一个URL显示在状态栏，提示用户可以开始分析
-        self._update_status(f"已加载 {len(urls)} 个URL，可以开始分析")
+        self._update_status(f"{summary}，可以开始分析")
         
         # 显示成功消息
-        messagebox.showinfo("成功", f"已加载 {len(urls)} 个URL")
+        messagebox.showinfo("成功", summary)
     
     def analyze_all_urls(self):
-        if not self.url_list:
+        if not self.url_list and not self.direct_image_urls:
             messagebox.showwarning("警告", "没有可分析的URL")
             return
             
@@ -658,493 +1232,80 @@ class ImageDownloader:
         self.progress_bar["value"] = 0
         self.root.update()
         
-        # 重置预览图片列表
+        # 重置预览图片列表和尺寸提示
         self.preview_images = []
+        self.reset_session()
+        self._sync_engine_options()
         
         # 在新线程中处理，避免UI冻结
         self.is_downloading = True  # 重用此标志用于取消操作
         self.cancel_btn.config(state=tk.NORMAL)
-        threading.Thread(target=self._analyze_all_urls_thread, daemon=True).start()
         
-    def _analyze_all_urls_thread(self):
-        total_urls = len(self.url_list)
-        all_img_urls = []
+        # 同站爬取模式：以URL列表为种子，继续跟随同站页面链接
+        if self.crawl_var.get():
+            try:
+                max_depth = max(0, int(self.crawl_depth_var.get()))
+                max_pages = max(1, int(self.crawl_pages_var.get()))
+            except ValueError:
+                max_depth, max_pages = 2, 100
+            threading.Thread(target=self._crawl_thread, args=(list(self.url_list), max_depth, max_pages),
+                             daemon=True).start()
+            return
         
-        # 创建进度跟踪变量
-        self.analyzed_count = 0
-        self.analyzed_urls_lock = threading.Lock()
+        threading.Thread(target=self._analyze_all_urls_thread, daemon=True).start()
         
-        # 创建一个线程池
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            # 保存所有future对象
-            future_to_url = {executor.submit(self._analyze_single_url_parallel, url): url for url in self.url_list}
-            
-            # 更新进度和状态的定时器
-            def update_progress():
-                if not self.is_downloading:
-                    return
-                    
-                with self.analyzed_urls_lock:
-                    progress = (self.analyzed_count / total_urls) * 100
-                    self._update_progress(progress, self.analyzed_count, total_urls, prefix="分析URL")
-                
-                # 每500毫秒更新一次进度
-                if self.is_downloading:
-                    self.root.after(500, update_progress)
-                    
-            # 启动进度更新定时器
-            update_progress()
-            
-            # 收集结果
-            for future in concurrent.futures.as_completed(future_to_url):
-                if not self.is_downloading:  # 如果取消了分析
-                    break
-                    
-                url = future_to_url[future]
-                try:
-                    img_urls = future.result()
-                    if img_urls:
-                        all_img_urls.extend(img_urls)
-                        
-                    # 更新已分析URL数量
-                    with self.analyzed_urls_lock:
-                        self.analyzed_count += 1
-                        
-                except Exception as e:
-                    self.root.after(0, lambda url=url, e=str(e): 
-                                  self._update_status(f"分析 {url} 时出错: {e}"))
-                    
-                    # 更新已分析URL数量
-                    with self.analyzed_urls_lock:
-                        self.analyzed_count += 1
+    def _analyze_all_urls_thread(self):
+        all_img_urls = self.analyze_urls(self.url_list, self.direct_image_urls)
         
         # 清除高亮
-        self.root.after(0, self._clear_url_highlight)
+        self.ui_events.call(self._clear_url_highlight)
         
-        # 验证图片
-        if self.verify_images_var.get() and all_img_urls:
-            self.root.after(0, lambda: self._update_status("验证图片中..."))
-            all_img_urls = self._verify_images(all_img_urls)
+        self._finish_analysis(all_img_urls)
+    
+    def _finish_analysis(self, all_img_urls):
+        """批量分析或爬取结束后：验证图片、更新预览并重置状态（在后台线程中调用）"""
+        all_img_urls = self.finish_images(all_img_urls)
             
         # 更新UI必须在主线程进行
-        self.root.after(0, lambda: self._update_preview(all_img_urls))
+        self.ui_events.call(self._update_preview, all_img_urls)
         
         # 重置下载状态
         self.is_downloading = False
-        self.root.after(0, lambda: self.cancel_btn.config(state=tk.DISABLED))
-    
-    def _analyze_single_url_parallel(self, url):
-        """并行分析单个URL的函数（供线程池使用）"""
-        try:
-            # 高亮当前处理的URL
-            self.root.after(0, lambda i=self.url_list.index(url), url=url: 
-                           self._highlight_current_url(i, url))
-            
-            # 显示当前处理的URL
-            self.root.after(0, lambda url=url: self._update_status(f"分析: {url}"))
-            
-            # 检查URL是否直接指向图片
-            if self._is_direct_image_url(url):
-                return [url]
-            
-            # 提取网页中的图片
-            img_urls = self._extract_images_from_url(url)
-            
-            # 记录提取结果
-            count = len(img_urls)
-            self.root.after(0, lambda url=url, count=count: 
-                           self._update_status(f"从 {url} 提取到 {count} 张图片"))
-            
-            return img_urls
-                
-        except Exception as e:
-            self.root.after(0, lambda url=url, e=str(e): 
-                           self._update_status(f"分析 {url} 时出错: {e}"))
-            return []
-    
-    def _verify_images(self, img_urls):
-        """验证图片有效性并过滤尺寸"""
-        valid_urls = []
-        total = len(img_urls)
-        
-        # 图片分辨率映射字典，用于保存分辨率信息
-        self.resolution_map = {}
-        self.width_map = {}
-        self.height_map = {}
-        
-        # 获取分辨率筛选设置
-        filter_by_resolution = self.filter_resolution_var.get()
-        selected_resolution = self.resolution_var.get()
-        
-        # 尝试获取最小尺寸设置
-        try:
-            min_width = int(self.min_width_var.get())
-            min_height = int(self.min_height_var.get())
-        except ValueError:
-            min_width = 0
-            min_height = 0
-        
-        skip_small = self.skip_small_images_var.get()
-        
-        # 创建线程安全的计数器和结果列表
-        self.verified_count = 0
-        self.verified_lock = threading.Lock()
-        thread_safe_valid_urls = []
-        thread_safe_resolution_map = {}
-        thread_safe_width_map = {}
-        thread_safe_height_map = {}
-        
-        # 定义验证单个图片的函数
-        def verify_single_image(url, index):
-            if not self.is_downloading:
-                return None
-                
-            try:
-                # 获取图片并检查尺寸
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                response = requests.get(url, headers=headers, timeout=10, stream=True)
-                
-                # 只读取前几个字节来验证是否为有效图片
-                content_type = response.headers.get('Content-Type', '')
-                
-                # 如果内容类型不是图片，跳过
-                if not content_type.startswith('image/'):
-                    return None
-                
-                # 获取完整图片并检查尺寸
-                img_data = response.content
-                image = Image.open(BytesIO(img_data))
-                width, height = image.size
-                
-                # 记录图片分辨率信息
-                resolution_str = f"{width}x{height}"
-                
-                # 存储分辨率信息到线程安全的字典
-                with self.verified_lock:
-                    thread_safe_resolution_map[url] = resolution_str
-                    thread_safe_width_map[url] = width
-                    thread_safe_height_map[url] = height
-                
-                # 跳过小图标
-                if skip_small and (width < 50 or height < 50):
-                    return None
-                    
-                # 检查最小尺寸
-                if (min_width > 0 and width < min_width) or (min_height > 0 and height < min_height):
-                    return None
-                
-                # 如果开启了分辨率筛选且选择了特定分辨率
-                if filter_by_resolution and selected_resolution != "全部":
-                    if resolution_str != selected_resolution:
-                        return None
-                
-                # 图片验证通过，返回URL
-                return url
-                
-            except Exception:
-                # 如果验证失败，跳过这个URL
-                return None
-            finally:
-                # 更新验证进度
-                with self.verified_lock:
-                    self.verified_count += 1
-        
-        # 更新进度的定时器函数
-        def update_verify_progress():
-            if not self.is_downloading:
-                return
-                
-            with self.verified_lock:
-                progress = (self.verified_count / total) * 100
-                self._update_progress(progress, self.verified_count, total, prefix="验证图片")
-            
-            # 每500毫秒更新一次进度
-            if self.is_downloading:
-                self.root.after(500, update_verify_progress)
-        
-        # 开始进度更新
-        update_verify_progress()
-        
-        # 使用线程池并行验证图片
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            # 提交所有验证任务到线程池
-            future_to_url = {executor.submit(verify_single_image, url, i): url 
-                           for i, url in enumerate(img_urls)}
-            
-            # 收集验证结果
-            for future in concurrent.futures.as_completed(future_to_url):
-                if not self.is_downloading:
-                    break
-                    
-                result = future.result()
-                if result:
-                    thread_safe_valid_urls.append(result)
-        
-        # 更新全局分辨率映射
-        self.resolution_map = thread_safe_resolution_map
-        self.width_map = thread_safe_width_map
-        self.height_map = thread_safe_height_map
-        
-        return thread_safe_valid_urls
+        self.ui_events.call(self.cancel_btn.config, state=tk.DISABLED)
     
-    def _extract_images_from_url(self, url):
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Referer': url
-        }
-        
-        try:
-            # 设置更长的超时时间，有些网站加载较慢
-            response = requests.get(url, headers=headers, timeout=self.connection_timeout, stream=True)
-            response.raise_for_status()
-            
-            # 检查内容大小
-            content_length = int(response.headers.get('Content-Length', 0))
-            if content_length > self.memory_limit:
-                # 内容太大，只读取部分
-                html_content = response.text[:self.memory_limit]
-                self.root.after(0, lambda: self._update_status(f"警告: {url} 内容过大，只分析部分内容"))
-            else:
-                # 尝试检测网页编码
-                if response.encoding == 'ISO-8859-1':
-                    # 可能是错误检测，尝试使用apparent_encoding
-                    response.encoding = response.apparent_encoding
-                
-                html_content = response.text
-            
-            # 使用更快速的HTML解析方法
-            soup = BeautifulSoup(html_content, 'html.parser')
-            base_url = '{uri.scheme}://{uri.netloc}'.format(uri=urlparse(url))
-            
-            # 查找所有图片链接
-            img_urls = set()  # 使用集合避免重复
-            
-            # 1. 从常规img标签获取图片
-            for img in soup.find_all('img'):
-                # 检查多种可能的属性
-                for attr in ['src', 'data-src', 'data-original', 'data-lazyload', 'data-lazy', 
-                             'data-original-src', 'data-source', 'data-srcset', 'srcset',
-                             'data-url', 'data-img', 'data-bg-src', 'data-image']:
-                    src = img.get(attr)
-                    if src:
-                        # 处理srcset属性（包含多个URL）
-                        if attr == 'srcset':
-                            # 提取srcset中的所有URL
-                            srcset_urls = re.findall(r'([^\s,]+)(?:\s+\d+[wx][^,]*)?(?:,|$)', src)
-                            for srcset_url in srcset_urls:
-                                self._add_url_to_set(img_urls, srcset_url, base_url, url)
-                        else:
-                            self._add_url_to_set(img_urls, src, base_url, url)
-            
-            # 2. 从a标签中寻找图片链接
-            for a in soup.find_all('a'):
-                href = a.get('href')
-                if href and self._is_image_url(href):
-                    self._add_url_to_set(img_urls, href, base_url, url)
-                    
-            # 3. 从style属性中提取背景图片
-            for tag in soup.find_all(lambda tag: tag.has_attr('style')):
-                style = tag['style']
-                urls = re.findall(r'background(?:-image)?\s*:\s*url\s*\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)', style)
-                for bg_url in urls:
-                    self._add_url_to_set(img_urls, bg_url, base_url, url)
-            
-            # 4. 从所有标签的data-background属性中查找
-            for tag in soup.find_all():
-                for attr in ['data-background', 'data-bg', 'data-original', 'data-src', 'data-url', 'data-img']:
-                    bg_url = tag.get(attr)
-                    if bg_url:
-                        self._add_url_to_set(img_urls, bg_url, base_url, url)
-            
-            # 5. 从CSS文件中提取背景图片
-            for link in soup.find_all('link', rel='stylesheet'):
-                css_url = link.get('href')
-                if css_url:
-                    try:
-                        css_full_url = urllib.parse.urljoin(url, css_url)
-                        css_response = requests.get(css_full_url, headers=headers, timeout=10)
-                        css_text = css_response.text
-                        bg_urls = re.findall(r'background(?:-image)?\s*:\s*url\s*\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)', css_text)
-                        for bg_url in bg_urls:
-                            self._add_url_to_set(img_urls, bg_url, base_url, css_full_url)
-                    except Exception:
-                        # 忽略CSS获取错误
-                        pass
-            
-            # 6. 从meta标签中获取图片
-            for meta in soup.find_all('meta'):
-                if meta.get('property') in ['og:image', 'twitter:image', 'og:image:secure_url']:
-                    content = meta.get('content')
-                    if content:
-                        self._add_url_to_set(img_urls, content, base_url, url)
-            
-            # 7. 从JSON数据中提取图片URL (针对一些使用JavaScript加载图片的网站)
-            # 在script标签中查找可能的JSON数据
-            for script in soup.find_all('script'):
-                if script.string:
-                    # 尝试在JavaScript中查找图片URL
-                    urls = re.findall(r'(?:src|url|image|img|source)(?:["\']|\s*:\s*["\']\s*)([^"\']+\.(?:jpg|jpeg|png|gif|webp|bmp|svg))', script.string, re.IGNORECASE)
-                    for img_url in urls:
-                        self._add_url_to_set(img_urls, img_url, base_url, url)
-                    
-                    # 尝试查找JSON数据
-                    json_objects = re.findall(r'({[^{]*"(?:url|src|image|img|source)"[^}]*})', script.string)
-                    for json_obj in json_objects:
-                        try:
-                            # 提取JSON字符串并修复常见的JavaScript格式问题
-                            fixed_json = re.sub(r'([{,])\s*(\w+):', r'\1"\2":', json_obj)
-                            data = json.loads(fixed_json)
-                            for key in ['url', 'src', 'image', 'img', 'source']:
-                                if key in data and isinstance(data[key], str):
-                                    self._add_url_to_set(img_urls, data[key], base_url, url)
-                        except (json.JSONDecodeError, ValueError):
-                            pass
-            
-            # 将集合转为列表
-            img_urls_list = list(img_urls)
-            
-            if not img_urls_list:
-                # 如果找不到图片，可能是因为网页使用了特殊的加载方式
-                # 尝试更深入的搜索
-                self._deep_search_images(soup, img_urls, base_url, url)
-                img_urls_list = list(img_urls)
-            
-            # 在状态栏显示找到的图片数量
-            self.root.after(0, lambda msg=f"从 {url} 找到 {len(img_urls_list)} 张图片": self._update_status(msg))
-            
-            return img_urls_list
-            
-        except Exception as e:
-            self.root.after(0, lambda msg=f"处理URL时出错: {str(e)}": self._update_status(msg))
-            return []
+    def _crawl_thread(self, seeds, max_depth, max_pages):
+        """同站爬取：从种子页面出发，按优先级访问同站链接并提取图片"""
+        self._finish_analysis(self.crawl_site(seeds, max_depth, max_pages))
     
-    def _deep_search_images(self, soup, img_urls, base_url, page_url):
-        """更深入地搜索图片，针对特殊网站"""
-        try:
-            # 1. 查找所有可能包含图片URL的属性
-            for tag in soup.find_all():
-                for attr in tag.attrs:
-                    if isinstance(tag[attr], str):
-                        attr_value = tag[attr].lower()
-                        # 检查属性值是否包含图片扩展名
-                        if re.search(r'\.(jpg|jpeg|png|gif|webp|bmp|svg)(\?|$|#)', attr_value):
-                            self._add_url_to_set(img_urls, tag[attr], base_url, page_url)
-            
-            # 2. 查找HTML中的所有URL模式
-            html_text = str(soup)
-            # 匹配各种URL格式的图片
-            urls = re.findall(r'(?:https?:)?//[^/\s]+/\S+?\.(?:jpg|jpeg|png|gif|webp|bmp|svg)(?:\?[^\'"\s]*)?(?=[\'"\s])', html_text)
-            for url in urls:
-                self._add_url_to_set(img_urls, url, base_url, page_url)
-                
-        except Exception:
-            pass
-            
-    def _add_url_to_set(self, url_set, src, base_url, page_url, check_is_image=True):
-        """将URL添加到集合中，同时处理相对路径"""
-        if not src:
-            return
-            
-        # 忽略data URIs (base64编码的图片)，除非特别要求
-        if src.startswith('data:'):
-            return
-            
-        # 忽略javascript:和about:协议
-        if src.startswith(('javascript:', 'about:')):
-            return
-            
-        # 修复URL中的特殊字符
-        src = src.replace(' ', '%20').replace('\\', '/')
-            
-        # 处理相对URL
-        if not src.startswith(('http://', 'https://')):
-            if src.startswith('//'):  # 协议相对URL
-                parsed_url = urlparse(page_url)
-                src = f"{parsed_url.scheme}:{src}"
-            elif src.startswith('/'):  # 绝对路径
-                src = base_url + src
-            else:  # 相对路径
-                src = urllib.parse.urljoin(page_url, src)
-        
-        # 检查是否为图片URL
-        if check_is_image and not self._is_image_url(src):
-            return
-            
-        url_set.add(src)
-    
-    def _is_image_url(self, url):
-        """检查URL是否指向图片文件"""
-        # 图片文件扩展名
-        image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff']
-        parsed_url = urlparse(url)
-        path = parsed_url.path.lower()
-        
-        # 检查是否以图片扩展名结尾
-        if any(path.endswith(ext) for ext in image_extensions):
-            return True
-            
-        # 检查URL是否包含图片相关关键词
-        if 'image' in path or 'img' in path or 'photo' in path or 'picture' in path:
-            return True
-            
-        # 检查URL参数是否包含图片扩展名（如?file=image.jpg）
-        query = parsed_url.query.lower()
-        if any(ext[1:] in query for ext in image_extensions):  # ext[1:] 移除点号
-            return True
-            
-        return False
+    def _update_crawl_progress(self, done, queued, found, max_pages):
+        """更新爬取进度（在主线程中调用）"""
+        self.progress_bar["value"] = min(100, done / max_pages * 100)
+        self.status_label.config(text=f"爬取中: 已访问 {done} 页，待访问 {queued} 页，找到 {found} 张图片")
     
     def _analyze_url_thread(self, url):
         try:
-            self.root.after(0, lambda: self._update_status(f"正在分析: {url}"))
+            self._post_status(f"正在分析: {url}")
             print(f"开始分析URL: {url}")  # 调试信息
             
             # 检查URL是否直接指向图片文件
             if self._is_direct_image_url(url):
                 print(f"检测到直接图片URL: {url}")  # 调试信息
-                self.root.after(0, lambda: self._update_preview([url]))
+                self.ui_events.call(self._update_preview, [url])
                 return
                 
             img_urls = self._extract_images_from_url(url)
             print(f"从URL提取到 {len(img_urls)} 张图片")  # 调试信息
             
             # 验证图片
-            if self.verify_images_var.get() and img_urls:
-                self.root.after(0, lambda: self._update_status("验证图片中..."))
-                print("开始验证图片...")  # 调试信息
-                img_urls = self._verify_images(img_urls)
-                print(f"验证后剩余 {len(img_urls)} 张有效图片")  # 调试信息
+            img_urls = self.finish_images(img_urls)
             
             # 更新UI必须在主线程进行
-            self.root.after(0, lambda: self._update_preview(img_urls))
+            self.ui_events.call(self._update_preview, img_urls)
         except Exception as e:
             print(f"分析URL出错: {str(e)}")  # 调试信息
             traceback_info = traceback.format_exc()
             print(f"详细错误信息: {traceback_info}")  # 打印完整堆栈
-            self.root.after(0, lambda: self._handle_error(f"分析URL时出错: {str(e)}"))
-    
-    def _is_direct_image_url(self, url):
-        """检查URL是否直接指向图片文件"""
-        try:
-            # 首先检查URL格式
-            if self._is_image_url(url):
-                # 然后发送HEAD请求验证
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                response = requests.head(url, headers=headers, timeout=10)
-                content_type = response.headers.get('Content-Type', '')
-                
-                # 验证内容类型是否为图片
-                return content_type.startswith('image/')
-        except Exception:
-            pass
-            
-        return False
+            self.ui_events.call(self._handle_error, f"分析URL时出错: {str(e)}")
     
     def _update_preview(self, img_urls):
         """更新预览区域显示新的图片列表"""
@@ -1152,6 +1313,7 @@ class ImageDownloader:
         
         self.preview_images = img_urls
         self.current_preview_index = 0
+        self.selected_images.clear()
         
         if not img_urls:
             self.status_label.config(text="未找到图片")
@@ -1199,187 +1361,230 @@ class ImageDownloader:
             self.root.after(1000, self._update_resolution_list)
     
     def load_preview_image(self):
-        """加载当前索引的预览图片"""
+        """加载当前索引的预览图片（下载和解码在后台线程中进行，不阻塞界面）"""
+        # 新的请求使之前尚未完成的预览失效，后台线程检测到后会中断下载
+        self.preview_generation += 1
+        generation = self.preview_generation
+        
+        if not self.preview_images or len(self.preview_images) == 0:
+            print("没有预览图片可加载")
+            return
+            
+        if self.current_preview_index < 0 or self.current_preview_index >= len(self.preview_images):
+            print(f"图片索引超出范围: {self.current_preview_index}, 总数: {len(self.preview_images)}")
+            return
+        
+        # 获取画布实际尺寸
+        canvas_width = self.preview_canvas.winfo_width()
+        canvas_height = self.preview_canvas.winfo_height()
+        
+        # 如果画布尺寸还未确定，使用默认尺寸
+        if canvas_width <= 1 or canvas_height <= 1:
+            canvas_width = 500
+            canvas_height = 400
+        
+        # 获取当前索引的图片URL，并记录浏览方向用于预取
+        index = self.current_preview_index
+        img_url = self.preview_images[index]
+        if index != self.last_preview_index:
+            self.preview_direction = 1 if index > self.last_preview_index else -1
+            self.last_preview_index = index
+        
+        # 更新预览标签和选中状态
+        self.image_counter_label.config(text=f"{index + 1}/{len(self.preview_images)}")
+        self.selected_var.set(img_url in self.selected_images)
+        
+        # 同时在状态栏也显示预览信息
+        self._update_status(f"预览图片: {index + 1}/{len(self.preview_images)}")
+        
+        # 命中缓存时直接显示，无需等待网络
+        key = (img_url, canvas_width, canvas_height)
+        cached = self.preview_cache.get(key)
+        if cached is not None:
+            self._show_preview_image(generation, *cached, canvas_width, canvas_height)
+            self._prefetch_neighbors(index, canvas_width, canvas_height)
+            return
+        
+        # 清空画布并显示加载信息
+        self._show_preview_message(generation, "加载图片中...", canvas_width, canvas_height, fill="black", size=16)
+        self.preview_executor.submit(self._load_preview_worker, generation, index, img_url, canvas_width, canvas_height)
+    
+    def _load_preview_worker(self, generation, index, img_url, canvas_width, canvas_height):
+        """后台线程：加载预览图片（或等待正在进行的预取），完成后交给主线程显示"""
         try:
-            if not self.preview_images or len(self.preview_images) == 0:
-                print("没有预览图片可加载")
+            value = self._load_preview_cached(img_url, canvas_width, canvas_height,
+                                              lambda: generation != self.preview_generation)
+            if value is None:
                 return
-                
-            if self.current_preview_index < 0 or self.current_preview_index >= len(self.preview_images):
-                print(f"图片索引超出范围: {self.current_preview_index}, 总数: {len(self.preview_images)}")
-                return
-                
-            # 获取画布实际尺寸
-            self.root.update_idletasks()
-            canvas_width = self.preview_canvas.winfo_width()
-            canvas_height = self.preview_canvas.winfo_height()
-            
-            print(f"画布尺寸: {canvas_width} x {canvas_height}")  # 调试信息
-            
-            # 如果画布尺寸还未确定，使用默认尺寸
-            if canvas_width <= 1 or canvas_height <= 1:
-                canvas_width = 500
-                canvas_height = 400
-                print(f"使用默认画布尺寸: {canvas_width} x {canvas_height}")  # 调试信息
-            
-            # 清空画布并显示加载信息
-            self.preview_canvas.delete("all")
-            loading_text_id = self.preview_canvas.create_text(
-                canvas_width // 2,
-                canvas_height // 2,
-                text="加载图片中...",
-                fill="black",
-                font=("Arial", 16)
-            )
-            self.root.update()  # 强制更新UI，确保加载文本立即显示
-            
-            # 更新预览标签
-            self.image_counter_label.config(text=f"{self.current_preview_index + 1}/{len(self.preview_images)}")
-            
-            # 同时在状态栏也显示预览信息
-            self._update_status(f"预览图片: {self.current_preview_index + 1}/{len(self.preview_images)}")
-            
-            # 获取当前索引的图片URL
-            img_url = self.preview_images[self.current_preview_index]
-            print(f"加载预览图片: {img_url}")  # 调试信息
-            
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-                }
-                
-                # 添加错误处理和超时
-                try:
-                    response = requests.get(img_url, headers=headers, timeout=15, stream=True)
-                    response.raise_for_status()  # 检查HTTP错误
-                except requests.exceptions.RequestException as e:
-                    print(f"请求图片出错: {str(e)}")  # 调试信息
-                    self.preview_canvas.delete("all")
-                    self.preview_canvas.create_text(
-                        canvas_width // 2,
-                        canvas_height // 2,
-                        text=f"无法加载图片:\n{str(e)}",
-                        fill="red",
-                        font=("Arial", 14),
-                        justify="center"
-                    )
-                    return
-                
-                # 使用BytesIO读取图片
-                img_data = BytesIO(response.content)
-                try:
-                    pil_img = Image.open(img_data)
-                    print(f"成功加载原始图片，尺寸: {pil_img.width} x {pil_img.height}")  # 调试信息
-                    
-                    # 保存原始图片对象以供缩放使用
-                    self.original_pil_img = pil_img
-                    self.current_scale = 1.0  # 重置缩放比例
-                    
-                except Exception as e:
-                    print(f"无法解析图片数据: {str(e)}")
-                    self.preview_canvas.delete("all")
-                    self.preview_canvas.create_text(
-                        canvas_width // 2,
-                        canvas_height // 2,
-                        text=f"无法解析图片数据:\n{str(e)}",
-                        fill="red",
-                        font=("Arial", 14),
-                        justify="center"
-                    )
-                    return
-                
-                # 计算缩放比例以适应画布
-                width_ratio = canvas_width / pil_img.width
-                height_ratio = canvas_height / pil_img.height
-                scale_ratio = min(width_ratio, height_ratio) * 0.9  # 留出一些边距
-                
-                # 对于非常大的图片，不要缩小太多
-                if pil_img.width > canvas_width * 2 or pil_img.height > canvas_height * 2:
-                    # 如果图片非常大，我们保持一定的最小尺寸，用户可以通过滚动查看
-                    scale_ratio = max(scale_ratio, 0.5)  # 确保图片不会缩小太多
-                
-                # 保存基础缩放比例
-                self.base_scale = scale_ratio
-                
-                # 计算缩放后的尺寸
-                new_width = int(pil_img.width * scale_ratio)
-                new_height = int(pil_img.height * scale_ratio)
-                
-                print(f"缩放比例: {scale_ratio}, 新尺寸: {new_width} x {new_height}")  # 调试信息
-                
-                if new_width <= 0 or new_height <= 0:
-                    raise ValueError(f"计算的图片尺寸无效: {new_width}x{new_height}")
-                    
-                # 缩放图片
-                pil_img = pil_img.resize((new_width, new_height), Image.LANCZOS)
-                
-                # 更新缩放指示器
-                zoom_percentage = int(self.current_scale * 100)
-                self.zoom_label.config(text=f"缩放: {zoom_percentage}%")
-                
-                # 转换为PhotoImage
-                try:
-                    img = ImageTk.PhotoImage(pil_img)
-                except Exception as e:
-                    print(f"创建PhotoImage失败: {str(e)}")
-                    self.preview_canvas.delete("all")
-                    self.preview_canvas.create_text(
-                        canvas_width // 2,
-                        canvas_height // 2,
-                        text=f"无法创建图片预览:\n{str(e)}",
-                        fill="red",
-                        font=("Arial", 14),
-                        justify="center"
-                    )
-                    return
-                
-                # 保存引用以防止垃圾回收
-                self._photo_image = img
-                
-                # 计算居中位置
-                x_center = canvas_width // 2
-                y_center = canvas_height // 2
-                
-                # 清空画布并添加图像
-                self.preview_canvas.delete("all")
-                image_id = self.preview_canvas.create_image(
-                    x_center, y_center,
-                    image=img,
-                    anchor="center"  # 使用中心点作为锚点
-                )
-                
-                # 调整画布的滚动区域以适应图片
-                self.preview_canvas.config(scrollregion=self.preview_canvas.bbox("all"))
-                
-                print(f"成功显示预览图片，ID: {image_id}")  # 调试信息
-                
-            except Exception as e:
-                print(f"加载图片过程中出错: {str(e)}")  # 调试信息
-                traceback_info = traceback.format_exc()
-                print(f"详细错误信息: {traceback_info}")  # 打印完整堆栈
-                self.preview_canvas.delete("all")
-                self.preview_canvas.create_text(
-                    canvas_width // 2,
-                    canvas_height // 2,
-                    text=f"加载图片失败:\n{str(e)}",
-                    fill="red",
-                    font=("Arial", 14),
-                    justify="center"
-                )
-                
+            self.ui_events.call(self._show_preview_image, generation, *value, canvas_width, canvas_height)
+            self.ui_events.call(self._prefetch_neighbors, index, canvas_width, canvas_height)
+        except requests.exceptions.RequestException as e:
+            print(f"请求图片出错: {str(e)}")  # 调试信息
+            self.ui_events.call(self._show_preview_message, generation, f"无法加载图片:\n{str(e)}",
+                                canvas_width, canvas_height)
         except Exception as e:
-            print(f"预览图片加载函数发生错误: {str(e)}")  # 调试信息
-            traceback_info = traceback.format_exc()
-            print(f"详细错误信息: {traceback_info}")  # 打印完整堆栈
-            self.preview_canvas.delete("all")
-            self.preview_canvas.create_text(
-                canvas_width // 2 if 'canvas_width' in locals() else 200,
-                canvas_height // 2 if 'canvas_height' in locals() else 100,
-                text=f"发生错误:\n{str(e)}",
-                fill="red",
-                font=("Arial", 14),
-                justify="center"
-            )
+            print(f"加载图片过程中出错: {str(e)}")  # 调试信息
+            self.ui_events.call(self._show_preview_message, generation, f"加载图片失败:\n{str(e)}",
+                                canvas_width, canvas_height)
+    
+    def _load_preview_cached(self, img_url, canvas_width, canvas_height, is_stale):
+        """通过缓存加载预览图片，返回(原图, 缩放图, 缩放比例)，被取消时返回None"""
+        key = (img_url, canvas_width, canvas_height)
+        while True:
+            cached = self.preview_cache.get(key)
+            if cached is not None:
+                return cached
+            event = self.preview_cache.begin(key)
+            if event is None:
+                break
+            # 其他线程（如预取）正在加载同一张图片，等待其结果
+            while not event.wait(0.1):
+                if is_stale():
+                    return None
+            if is_stale():
+                return None
+        
+        value = None
+        try:
+            value = self._fetch_preview(img_url, canvas_width, canvas_height, is_stale)
+            return value
+        finally:
+            self.preview_cache.end(key, value)
+    
+    def _fetch_preview(self, img_url, canvas_width, canvas_height, is_stale):
+        """下载、解码并缩放图片以适应画布，返回(原图, 缩放图, 缩放比例)，被取消时返回None"""
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+        }
+        response = self._get_image_response(img_url, headers=headers, timeout=15, stream=True)
+        response.raise_for_status()  # 检查HTTP错误
+        
+        # 分块读取，用户切换图片后立即中断下载
+        img_data = BytesIO()
+        with response:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if is_stale():
+                    return None
+                img_data.write(chunk)
+                if img_data.tell() > self.max_image_size:
+                    raise ValueError("图片过大，无法预览")
+        
+        try:
+            data = img_data.getvalue()
+            pil_img = Image.open(BytesIO(data))  # 只解析文件头，尚未解码像素
+        except Exception as e:
+            raise ValueError(f"无法解析图片数据: {str(e)}")
+        
+        if is_stale():
+            return None
+        
+        # 根据文件头中的尺寸计算缩放比例以适应画布
+        original_size = pil_img.size
+        width_ratio = canvas_width / pil_img.width
+        height_ratio = canvas_height / pil_img.height
+        scale_ratio = min(width_ratio, height_ratio) * 0.9  # 留出一些边距
+        
+        # 对于非常大的图片，不要缩小太多
+        if pil_img.width > canvas_width * 2 or pil_img.height > canvas_height * 2:
+            # 如果图片非常大，我们保持一定的最小尺寸，用户可以通过滚动查看
+            scale_ratio = max(scale_ratio, 0.5)  # 确保图片不会缩小太多
+        
+        # 计算缩放后的尺寸
+        new_width = int(pil_img.width * scale_ratio)
+        new_height = int(pil_img.height * scale_ratio)
+        
+        if new_width <= 0 or new_height <= 0:
+            raise ValueError(f"计算的图片尺寸无效: {new_width}x{new_height}")
+        
+        # 按接近目标的尺寸解码（JPEG直接以1/2~1/8比例解码），再缩放到目标尺寸
+        pil_img = self._decode_image(pil_img, (new_width, new_height))
+        resized_img = pil_img
+        if pil_img.size != (new_width, new_height):
+            resized_img = pil_img.resize((new_width, new_height), Image.LANCZOS, reducing_gap=2.0)
+        return pil_img, resized_img, scale_ratio, original_size, data
+    
+    def _prefetch_neighbors(self, index, canvas_width, canvas_height):
+        """在后台预取当前图片附近的图片，浏览方向上的优先"""
+        direction = self.preview_direction
+        order = [index + direction * d for d in range(1, self.prefetch_ahead + 1)]
+        order[1:1] = [index - direction * d for d in range(1, self.prefetch_behind + 1)]
+        
+        for neighbor in order:
+            if 0 <= neighbor < len(self.preview_images):
+                key = (self.preview_images[neighbor], canvas_width, canvas_height)
+                if key not in self.preview_cache:
+                    self.prefetch_executor.submit(self._prefetch_preview, neighbor, key)
+    
+    def _prefetch_preview(self, index, key):
+        """预取单张图片；用户已经离开该位置或列表已变化时跳过"""
+        img_url, canvas_width, canvas_height = key
+        
+        def is_stale():
+            current = self.current_preview_index
+            if not current - self.prefetch_behind - 1 <= index <= current + self.prefetch_ahead + 1:
+                return True
+            return index >= len(self.preview_images) or self.preview_images[index] != img_url
+        
+        if is_stale():
+            return
+        try:
+            self._load_preview_cached(img_url, canvas_width, canvas_height, is_stale)
+        except Exception as e:
+            print(f"预取图片 {img_url} 出错: {str(e)}")
+    
+    def _show_preview_message(self, generation, text, canvas_width, canvas_height, fill="red", size=14):
+        """在预览画布中央显示提示信息（已被新请求取代的结果直接丢弃）"""
+        if generation != self.preview_generation:
+            return
+        self.preview_canvas.delete("all")
+        self.preview_canvas.create_text(
+            canvas_width // 2,
+            canvas_height // 2,
+            text=text,
+            fill=fill,
+            font=("Arial", size),
+            justify="center"
+        )
+    
+    def _show_preview_image(self, generation, pil_img, resized_img, scale_ratio, original_size, data,
+                            canvas_width, canvas_height):
+        """主线程：把后台线程准备好的图片转换为PhotoImage并显示"""
+        if generation != self.preview_generation:
+            return
+        
+        # 取消上一张图片尚未执行的缩放重绘
+        if self.zoom_render_job is not None:
+            self.root.after_cancel(self.zoom_render_job)
+            self.zoom_render_job = None
+        
+        # 保存解码后的图片及原始数据以供缩放使用
+        self.original_pil_img = pil_img
+        self.original_size = original_size
+        self.preview_source = data
+        self.current_scale = 1.0  # 重置缩放比例
+        self.base_scale = scale_ratio
+        
+        # 更新缩放指示器
+        zoom_percentage = int(self.current_scale * 100)
+        self.zoom_label.config(text=f"缩放: {zoom_percentage}%")
+        
+        # 转换为PhotoImage
+        try:
+            img = ImageTk.PhotoImage(resized_img)
+        except Exception as e:
+            print(f"创建PhotoImage失败: {str(e)}")
+            self._show_preview_message(generation, f"无法创建图片预览:\n{str(e)}", canvas_width, canvas_height)
+            return
+        
+        # 保存引用以防止垃圾回收
+        self._photo_image = img
+        
+        # 清空画布并添加图像，使用中心点作为锚点
+        self.preview_canvas.delete("all")
+        self.preview_canvas.create_image(canvas_width // 2, canvas_height // 2, image=img, anchor="center")
+        
+        # 调整画布的滚动区域以适应图片
+        self.preview_canvas.config(scrollregion=self.preview_canvas.bbox("all"))
     
     def prev_image(self):
         if not self.preview_images or len(self.preview_images) <= 1:
@@ -1401,7 +1606,7 @@ class ImageDownloader:
     
     def start_download(self):
         # 检查是否有URL列表，如果有但还没分析过，先分析
-        if self.url_list and not self.preview_images:
+        if (self.url_list or self.direct_image_urls) and not self.preview_images:
             self.analyze_all_urls()
             return
             
@@ -1421,126 +1626,84 @@ class ImageDownloader:
                 messagebox.showerror("错误", f"创建保存目录失败: {str(e)}")
                 return
         
-        # 如果启用了选择性下载，只下载当前选中的图片
+        # 如果启用了选择性下载，只下载选中的图片（保持预览列表中的顺序）
+        img_urls = self.preview_images
         if self.selective_var.get():
-            if self.current_preview_index < 0 or self.current_preview_index >= len(self.preview_images):
+            img_urls = [url for url in self.preview_images if url in self.selected_images]
+            if not img_urls:
                 messagebox.showwarning("警告", "没有选中的图片")
                 return
-                
-            if not self.selected_var.get():
-                messagebox.showwarning("警告", "当前图片未被选中")
-                return
-                
-            # 下载当前选中的图片
-            self.download_current()
-            return
         
-        # 常规模式：下载所有图片
         self.is_downloading = True
         self.download_button.config(state=tk.DISABLED)
         self.cancel_btn.config(state=tk.NORMAL)
         
         # 开始下载线程
-        threading.Thread(target=self._download_thread, args=(save_path,), daemon=True).start()
+        self._sync_engine_options()
+        threading.Thread(target=self._download_thread, args=(save_path, img_urls), daemon=True).start()
     
-    def _download_thread(self, save_path):
-        total = len(self.preview_images)
-        success_count = 0
-        
-        # 获取文件名前缀
-        prefix = self.prefix_var.get().strip()
-        if not prefix:
-            prefix = "image"  # 如果前缀为空，使用默认值
-        
-        for i, img_url in enumerate(self.preview_images):
-            if not self.is_downloading:
-                break
-                
-            try:
-                # 更新进度
-                progress = (i / total) * 100
-                self.root.after(0, lambda p=progress, i=i, t=total: self._update_progress(p, i, t))
-                
-                # 下载图片
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Referer': img_url
-                }
-                response = requests.get(img_url, headers=headers, timeout=15)
-                response.raise_for_status()
-                
-                # 从URL或Content-Type获取文件扩展名
-                filename = os.path.basename(urlparse(img_url).path)
-                if filename and '.' in filename:
-                    # 从URL提取文件名和扩展名
-                    base_name, ext = os.path.splitext(filename)
-                    # 确保扩展名是小写字母
-                    ext = ext.lower()
-                    # 在原文件名前添加前缀
-                    filename = f"{prefix}_{base_name}{ext}"
-                else:
-                    # 从Content-Type确定文件扩展名
-                    content_type = response.headers.get('Content-Type', '')
-                    if 'jpeg' in content_type or 'jpg' in content_type:
-                        ext = '.jpg'
-                    elif 'png' in content_type:
-                        ext = '.png'
-                    elif 'gif' in content_type:
-                        ext = '.gif'
-                    elif 'webp' in content_type:
-                        ext = '.webp'
-                    elif 'bmp' in content_type:
-                        ext = '.bmp'
-                    elif 'svg' in content_type:
-                        ext = '.svg'
-                    else:
-                        ext = '.jpg'  # 默认扩展名
-                
-                    # 使用前缀和序号生成文件名
-                    filename = f"{prefix}_{i+1}{ext}"
-                
-                # 确保文件名合法
-                filename = re.sub(r'[\\/*?:"<>|]', "_", filename)
-                
-                # 保存文件
-                save_file_path = os.path.join(save_path, filename)
-                
-                # 检查是否存在同名文件
-                if os.path.exists(save_file_path):
-                    base_name, ext = os.path.splitext(filename)
-                    counter = 1
-                    while os.path.exists(os.path.join(save_path, f"{base_name}_{counter}{ext}")):
-                        counter += 1
-                    save_file_path = os.path.join(save_path, f"{base_name}_{counter}{ext}")
-                
-                with open(save_file_path, 'wb') as f:
-                    f.write(response.content)
-                
-                success_count += 1
-                
-            except Exception as e:
-                self.root.after(0, lambda msg=f"下载失败 ({i+1}/{total}): {str(e)}": self._update_status(msg))
+    def _download_thread(self, save_path, img_urls):
+        success_count = self.download_images(img_urls, save_path)
         
         # 完成下载
-        self.root.after(0, lambda sc=success_count, t=total: self._download_completed(sc, t))
+        self.ui_events.call(self._download_completed, success_count, len(img_urls))
+    
+    def _sync_engine_options(self):
+        """开始分析或下载前，把界面上的设置同步到引擎选项（在主线程中调用）"""
+        self.verify_images = self.verify_images_var.get()
+        self.skip_small_images = self.skip_small_images_var.get()
+        try:
+            self.min_width = int(self.min_width_var.get())
+            self.min_height = int(self.min_height_var.get())
+        except ValueError:
+            self.min_width = 0
+            self.min_height = 0
+        selected_resolution = self.resolution_var.get()
+        if self.filter_resolution_var.get() and selected_resolution != "全部":
+            self.resolution_filter = selected_resolution
+        else:
+            self.resolution_filter = None
+        self.prefix = self.prefix_var.get()
+    
+    def _post_progress(self, stage, current, total):
+        """引擎进度钩子：合并后在主线程更新进度条"""
+        progress = (current / total) * 100 if total else 100
+        prefix = {'analyze': "分析URL", 'verify': "验证图片", 'download': "下载中"}.get(stage, stage)
+        self.ui_events.post('progress', self._update_progress, progress, min(current, max(total - 1, 0)), total, prefix)
+    
+    def _on_url_started(self, index, url):
+        """引擎钩子：高亮当前处理的URL"""
+        self.ui_events.post('highlight', self._highlight_current_url, index, url)
+    
+    def _on_crawl_progress(self, done, queued, found, max_pages):
+        """引擎钩子：更新爬取进度"""
+        self.ui_events.post('progress', self._update_crawl_progress, done, queued, found, max_pages)
     
     def _update_progress(self, progress, current, total, prefix="下载中"):
         self.progress_bar["value"] = progress
         self.status_label.config(text=f"{prefix} ({current+1}/{total})")
     
     def _update_status(self, message):
-        """更新状态栏并记录日志"""
-        self.status_label.config(text=message)
-        # 保存日志
-        self.debug_log.append(message)
-        # 如果日志过长，保留最近的100条
-        if len(self.debug_log) > 100:
-            self.debug_log = self.debug_log[-100:]
+        """更新状态栏并记录日志（仅在主线程调用，工作线程使用_post_status）"""
+        self._append_log([message])
+    
+    def _post_status(self, message):
+        """工作线程更新状态，由事件总线批量刷新到界面"""
+        self.ui_events.log(message)
+    
+    def _append_log(self, messages):
+        """一次性把一批日志写入状态栏、日志缓冲区和日志窗口"""
+        self.status_label.config(text=messages[-1])
+        self.debug_log.extend(messages)
         
         # 更新日志窗口，如果存在
-        if hasattr(self, 'log_text') and self.log_text:
+        if self.log_text is not None and self.log_text.winfo_exists():
             self.log_text.config(state=tk.NORMAL)
-            self.log_text.insert(tk.END, message + "\n")
+            self.log_text.insert(tk.END, "\n".join(messages[-self.max_log_lines:]) + "\n")
+            # 日志窗口同样只保留最近的max_log_lines行
+            line_count = int(self.log_text.index("end-1c").split('.')[0])
+            if line_count > self.max_log_lines + 1:
+                self.log_text.delete("1.0", f"{line_count - self.max_log_lines}.0")
             self.log_text.see(tk.END)
             self.log_text.config(state=tk.DISABLED)
             
@@ -1589,7 +1752,7 @@ class ImageDownloader:
         scrollbar.config(command=self.log_text.yview)
         
         # 填充日志内容
-        self.log_text.insert(tk.END, "\n".join(self.debug_log))
+        self.log_text.insert(tk.END, "".join(message + "\n" for message in self.debug_log))
         self.log_text.config(state=tk.DISABLED)
         
         # 底部按钮
@@ -1616,10 +1779,7 @@ class ImageDownloader:
     
     def clear_log(self, text_widget):
         """清除日志"""
-        self.debug_log = []
-    def clear_log(self, text_widget):
-        """清除日志"""
-        self.debug_log = []
+        self.debug_log.clear()
         text_widget.config(state=tk.NORMAL)
         text_widget.delete(1.0, tk.END)
         text_widget.config(state=tk.DISABLED)
@@ -1723,29 +1883,16 @@ class ImageDownloader:
 
     def clear_url_list(self):
         """清空URL列表"""
-        self.url_list = []
-        self.url_text.delete(1.0, tk.END)
+        self.url_list = UrlStore()
+        self.direct_image_urls = []
+        self.url_view.set_items(self.url_list)
         self.url_status.config(text="已加载 0 个URL")
     
     def _highlight_current_url(self, index, url):
         """高亮当前处理的URL"""
-        # 先清除所有高亮
-        self._clear_url_highlight()
-        
         try:
-            # 找到对应行并高亮
-            start_pos = "1.0"
-            for i in range(index):
-                start_pos = self.url_text.search("\n", start_pos, tk.END) + "+1c"
-            
-            end_pos = self.url_text.search("\n", start_pos, tk.END)
-            if not end_pos:
-                end_pos = self.url_text.index(tk.END)
-                
-            self.url_text.tag_add("current", start_pos, end_pos)
-            
-            # 确保高亮的URL可见
-            self.url_text.see(start_pos)
+            # 只重绘可见行，并确保高亮的URL可见
+            self.url_view.set_current(index)
             
             # 更新URL状态
             self.url_status.config(text=f"处理中: {index+1}/{len(self.url_list)}")
@@ -1754,8 +1901,100 @@ class ImageDownloader:
     
     def _clear_url_highlight(self):
         """清除URL高亮"""
-        self.url_text.tag_remove("current", "1.0", tk.END)
+        self.url_view.set_current(-1)
 
+    def show_thumbnail_gallery(self):
+        """显示缩略图网格，可多选图片用于选择性下载"""
+        if not self.preview_images:
+            messagebox.showinfo("提示", "没有图片可显示")
+            return
+        
+        gallery_window = tk.Toplevel(self.root)
+        gallery_window.title("缩略图浏览")
+        
+        # 先隐藏窗口，避免闪烁
+        gallery_window.withdraw()
+        
+        # 设置图标
+        try:
+            if hasattr(self, 'icon_path') and os.path.exists(self.icon_path):
+                gallery_window.iconbitmap(self.icon_path)
+        except Exception as e:
+            print(f"设置缩略图窗口图标出错: {str(e)}")
+        
+        gallery_window.geometry("900x700")
+        
+        # 底部按钮和选中数量
+        button_frame = ttk.Frame(gallery_window, padding="10")
+        button_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        count_label = ttk.Label(button_frame)
+        
+        def update_count():
+            count_label.config(text=f"已选中 {len(self.selected_images)}/{len(self.preview_images)} 张")
+            # 同步主窗口中当前图片的选中状态
+            if 0 <= self.current_preview_index < len(self.preview_images):
+                self.selected_var.set(self.preview_images[self.current_preview_index] in self.selected_images)
+        
+        # 缩略图网格，双击在主窗口中预览
+        frame = ttk.Frame(gallery_window, padding=(10, 10, 10, 0))
+        frame.pack(fill=tk.BOTH, expand=True)
+        grid = ThumbnailGrid(frame, self.preview_images, self.selected_images,
+                             self._load_thumbnail, self.ui_events.call,
+                             on_activate=self._preview_image_at, on_selection_changed=update_count)
+        grid.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Button(button_frame, text="全选", command=lambda: grid.select_all(True)).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="清除选择",
+                   command=lambda: grid.select_all(False)).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(button_frame, text="下载选中",
+                   command=self._download_selected).pack(side=tk.LEFT, padx=(5, 0))
+        count_label.pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(button_frame, text="关闭",
+                   command=gallery_window.destroy).pack(side=tk.RIGHT)
+        update_count()
+        
+        # 确保所有布局计算完成
+        gallery_window.update_idletasks()
+        
+        # 居中显示
+        self._center_window(gallery_window)
+        
+        # 显示窗口
+        gallery_window.deiconify()
+    
+    def _load_thumbnail(self, img_url, size):
+        """后台线程：生成size x size的缩略图（图片居中，白色背景），优先使用预览缓存中的数据"""
+        data = self.preview_cache.get_data(img_url)
+        if data is None:
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            }
+            response = self._get_image_response(img_url, headers=headers, timeout=10, stream=True)
+            response.raise_for_status()
+            img_data = BytesIO()
+            with response:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    img_data.write(chunk)
+                    if img_data.tell() > self.max_image_size:
+                        raise ValueError("图片过大")
+            data = img_data.getvalue()
+        
+        pil_img = self._decode_image(Image.open(BytesIO(data)), (size, size))
+        pil_img.thumbnail((size, size), Image.LANCZOS)
+        if pil_img.mode not in ("RGB", "RGBA"):
+            pil_img = pil_img.convert("RGBA")
+        thumbnail = Image.new("RGB", (size, size), "white")
+        offset = ((size - pil_img.width) // 2, (size - pil_img.height) // 2)
+        thumbnail.paste(pil_img, offset, pil_img if pil_img.mode == "RGBA" else None)
+        return thumbnail
+    
+    def _download_selected(self):
+        """开启选择性下载并下载所有选中的图片"""
+        self.selective_var.set(True)
+        self._sync_selective_checkboxes()
+        self.start_download()
+    
     def show_image_list(self):
         """显示图片列表"""
         image_list_window = tk.Toplevel(self.root)
@@ -1773,45 +2012,42 @@ class ImageDownloader:
         
         image_list_window.geometry("800x600")
         
-        # 创建文本区域
-        frame = ttk.Frame(image_list_window, padding="10")
-        frame.pack(fill=tk.BOTH, expand=True)
+        # 搜索和跳转
+        search_frame = ttk.Frame(image_list_window, padding=(10, 10, 10, 0))
+        search_frame.pack(fill=tk.X)
         
-        # 创建带滚动条的文本区域
-        scrollbar = ttk.Scrollbar(frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        ttk.Label(search_frame, text="搜索:").pack(side=tk.LEFT, padx=(0, 5))
+        filter_var = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=filter_var, width=30).pack(side=tk.LEFT)
         
-        text = tk.Text(frame, wrap=tk.WORD, yscrollcommand=scrollbar.set, font=("Courier New", 10))
-        text.pack(fill=tk.BOTH, expand=True)
-        scrollbar.config(command=text.yview)
+        jump_var = tk.StringVar()
+        jump_entry = ttk.Entry(search_frame, textvariable=jump_var, width=8)
+        ttk.Button(search_frame, text="跳转",
+                   command=lambda: self._jump_image_list(image_view, jump_var)).pack(side=tk.RIGHT)
+        jump_entry.pack(side=tk.RIGHT, padx=5)
+        ttk.Label(search_frame, text="编号:").pack(side=tk.RIGHT)
+        jump_entry.bind('<Return>', lambda e: self._jump_image_list(image_view, jump_var))
         
-        # 创建标签和标记URL
-        if self.preview_images:
-            for i, url in enumerate(self.preview_images):
-                text.insert(tk.END, f"{i+1}. {url}\n")
-            
-            # 高亮当前预览的图片
-            if 0 <= self.current_preview_index < len(self.preview_images):
-                start_index = f"{self.current_preview_index+1}.0"
-                end_index = f"{self.current_preview_index+1}.end"
-                text.tag_add("current", start_index, end_index)
-                text.tag_configure("current", background="#e0e0e0")
-                text.see(start_index)  # 滚动到当前图片位置
-        else:
-            text.insert(tk.END, "没有图片可显示")
+        # 虚拟列表，只绘制可见的图片URL，双击或回车预览
+        frame = ttk.Frame(image_list_window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
         
-        # 设置只读
-        text.config(state=tk.DISABLED)
+        image_view = VirtualListView(frame, font=("Courier New", 10),
+                                     on_activate=self._preview_image_at)
+        image_view.pack(fill=tk.BOTH, expand=True)
+        image_view.set_items(self.preview_images, empty_text="没有图片可显示")
+        filter_var.trace_add("write", lambda *args: image_view.set_filter(filter_var.get()))
         
-        # 双击选择图片
-        text.bind("<Double-Button-1>", lambda e: self._preview_selected_image(text))
+        # 高亮当前预览的图片
+        if 0 <= self.current_preview_index < len(self.preview_images):
+            image_list_window.after_idle(lambda: image_view.set_current(self.current_preview_index))
         
         # 底部按钮
         button_frame = ttk.Frame(image_list_window, padding="10")
         button_frame.pack(fill=tk.X)
         
         ttk.Button(button_frame, text="预览选中图片",
-                 command=lambda: self._preview_selected_image(text)).pack(side=tk.LEFT)
+                 command=lambda: self._preview_image_at(image_view.selected)).pack(side=tk.LEFT)
                  
         ttk.Button(button_frame, text="关闭", 
                   command=image_list_window.destroy).pack(side=tk.RIGHT)
@@ -1825,23 +2061,24 @@ class ImageDownloader:
         # 显示窗口
         image_list_window.deiconify()
     
-    def _preview_selected_image(self, text_widget):
-        """预览图片列表中选中的图片"""
+    def _preview_image_at(self, index):
+        """预览图片列表中指定下标的图片"""
+        if 0 <= index < len(self.preview_images):
+            self.current_preview_index = index
+            self.load_preview_image()
+    
+    def _jump_image_list(self, image_view, jump_var):
+        """图片列表窗口中跳转到指定编号"""
         try:
-            text_widget.config(state=tk.NORMAL)
-            # 获取选中的行
-            selected_text = text_widget.get("insert linestart", "insert lineend")
-            text_widget.config(state=tk.DISABLED)
-            
-            # 解析行号
-            match = re.match(r'^(\d+)', selected_text)
-            if match:
-                index = int(match.group(1)) - 1
-                if 0 <= index < len(self.preview_images):
-                    self.current_preview_index = index
-                    self.load_preview_image()
-        except Exception as e:
-            messagebox.showerror("错误", f"预览选中图片时出错: {str(e)}")
+            index = int(jump_var.get()) - 1
+        except ValueError:
+            messagebox.showwarning("警告", "请输入有效的图片序号")
+            return
+        if 0 <= index < len(self.preview_images):
+            image_view.selected = index
+            image_view.see(index)
+        else:
+            messagebox.showwarning("警告", f"图片序号超出范围(1-{len(self.preview_images)})")
 
     def goto_image(self):
         """跳转到指定序号图片"""
@@ -1909,7 +2146,7 @@ class ImageDownloader:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
                 'Referer': img_url
             }
-            response = requests.get(img_url, headers=headers, timeout=15)
+            response = self._get_image_response(img_url, headers=headers, timeout=15)
             response.raise_for_status()
             
             # 保存文件
@@ -2121,83 +2358,33 @@ class ImageDownloader:
         self.root.update()
         
         # 在新线程中下载当前图片
-        threading.Thread(target=self._download_single_image, args=(img_url, save_path), daemon=True).start()
+        self._sync_engine_options()
+        threading.Thread(target=self._download_single_image, args=(img_url, save_path, self.current_preview_index),
+                         daemon=True).start()
     
-    def _download_single_image(self, img_url, save_path):
+    def _download_single_image(self, img_url, save_path, index):
         """下载单个图片的线程函数"""
         try:
-            # 获取文件名前缀
-            prefix = self.prefix_var.get().strip()
-            if not prefix:
-                prefix = "image"  # 如果前缀为空，使用默认值
-                
-            # 下载图片
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Referer': img_url
-            }
-            response = requests.get(img_url, headers=headers, timeout=15)
-            response.raise_for_status()
-            
-            # 解析文件名
-            filename = os.path.basename(urlparse(img_url).path)
-            if filename and '.' in filename:
-                # 从URL提取文件名和扩展名
-                base_name, ext = os.path.splitext(filename)
-                # 确保扩展名是小写字母
-                ext = ext.lower()
-                # 在原文件名前添加前缀
-                filename = f"{prefix}_{base_name}{ext}"
-            else:
-                # 从Content-Type确定文件扩展名
-                content_type = response.headers.get('Content-Type', '')
-                if 'jpeg' in content_type or 'jpg' in content_type:
-                    ext = '.jpg'
-                elif 'png' in content_type:
-                    ext = '.png'
-                elif 'gif' in content_type:
-                    ext = '.gif'
-                elif 'webp' in content_type:
-                    ext = '.webp'
-                elif 'bmp' in content_type:
-                    ext = '.bmp'
-                elif 'svg' in content_type:
-                    ext = '.svg'
-                else:
-                    ext = '.jpg'  # 默认扩展名
-                
-                filename = f"{prefix}_{self.current_preview_index+1}{ext}"
-            
-            # 确保文件名合法
-            filename = re.sub(r'[\\/*?:"<>|]', "_", filename)
-            
-            # 保存文件
-            save_file_path = os.path.join(save_path, filename)
-            
-            # 检查是否存在同名文件
-            if os.path.exists(save_file_path):
-                base_name, ext = os.path.splitext(filename)
-                counter = 1
-                while os.path.exists(os.path.join(save_path, f"{base_name}_{counter}{ext}")):
-                    counter += 1
-                save_file_path = os.path.join(save_path, f"{base_name}_{counter}{ext}")
-            
-            with open(save_file_path, 'wb') as f:
-                f.write(response.content)
+            save_file_path = self._save_image(img_url, save_path, index)
             
             # 更新状态
-            self.root.after(0, lambda: self.status_label.config(text=f"图片已保存到: {save_file_path}"))
+            self.ui_events.call(self.status_label.config, text=f"图片已保存到: {save_file_path}")
             
         except Exception as e:
-            self.root.after(0, lambda: self._handle_error(f"下载图片失败: {str(e)}"))
+            self.ui_events.call(self._handle_error, f"下载图片失败: {str(e)}")
 
     def toggle_selection(self):
         """切换当前图片的选中状态"""
         if not self.preview_images or self.current_preview_index < 0 or self.current_preview_index >= len(self.preview_images):
             return
             
-        # 更新状态文本
+        # 更新选中集合和状态文本
         selected = self.selected_var.get()
+        img_url = self.preview_images[self.current_preview_index]
+        if selected:
+            self.selected_images.add(img_url)
+        else:
+            self.selected_images.discard(img_url)
         status = "已选中" if selected else "已取消选中"
         
         # 如果启用了选择性下载，显示更详细的信息
@@ -2211,7 +2398,7 @@ class ImageDownloader:
     def batch_analyze(self):
         """分析按钮点击事件处理函数，处理一个或多个URL"""
         # 首先检查是否已经有加载好的URL列表
-        if self.url_list:
+        if self.url_list or self.direct_image_urls:
             # 已有URL列表，直接分析
             self.analyze_all_urls()
             return
@@ -2228,24 +2415,28 @@ class ImageDownloader:
         if not urls:
             messagebox.showwarning("警告", "没有有效的URL")
             return
+        
+        # 输入中包含站点地图/订阅源时，先在后台展开再分析
+        if any(self._is_feed_url(url) for url in urls):
+            self._update_status("正在读取站点地图/订阅源...")
+            threading.Thread(target=self._load_feed_urls_thread, args=(urls,), daemon=True).start()
+            return
             
-        # 如果只有一个URL，使用单URL分析功能
-        if len(urls) == 1:
+        # 如果只有一个URL，使用单URL分析功能（爬取模式下仍走批量流程）
+        if len(urls) == 1 and not self.crawl_var.get():
             self._analyze_single_url(urls[0])
             return
             
         # 多个URL，存储并开始批量分析
-        self.url_list = urls
+        self.url_list = UrlStore(urls)
+        self.direct_image_urls = []
         
-        # 显示URLs到文本区域
-        self.url_text.delete(1.0, tk.END)
-        self.url_text.tag_configure("current", background="#e0e0e0")  # 定义高亮样式
-        
-        for i, url in enumerate(urls):
-            self.url_text.insert(tk.END, f"{i+1}. {url}\n")
+        # 显示URL列表
+        self.url_filter_var.set("")
+        self.url_view.set_items(self.url_list)
             
         # 更新URL状态
-        self.url_status.config(text=f"已加载 {len(urls)} 个URL")
+        self.url_status.config(text=f"已加载 {len(self.url_list)} 个URL")
         
         # 开始分析
         self.analyze_all_urls()
@@ -2259,6 +2450,9 @@ class ImageDownloader:
         self.status_label.config(text="分析中...")
         self.root.update()
         
+        self.reset_session()
+        self._sync_engine_options()
+        
         # 在新线程中处理，避免UI冻结
         threading.Thread(target=self._analyze_url_thread, args=(url,), daemon=True).start()
 
@@ -2348,24 +2542,21 @@ class ImageDownloader:
             try:
                 # 更新进度
                 progress = (i / total) * 100
-                self.root.after(0, lambda p=progress, i=i, t=total: 
-                               self._update_progress(p, i, t, prefix="获取分辨率"))
+                self.ui_events.post('progress', self._update_progress, progress, i, total, "获取分辨率")
                 
                 # 获取图片并检查尺寸
                 headers = {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                 }
-                response = requests.get(url, headers=headers, timeout=10, stream=True)
+                response = self._get_image_response(url, headers=headers, timeout=10, stream=True)
                 
                 # 检查是否为图片
                 content_type = response.headers.get('Content-Type', '')
                 if not content_type.startswith('image/'):
                     continue
                 
-                # 获取图片尺寸
-                img_data = response.content
-                image = Image.open(BytesIO(img_data))
-                width, height = image.size
+                # 获取图片尺寸（只下载到文件头）
+                width, height = self._probe_image_size(response)
                 
                 # 记录分辨率信息
                 resolution_str = f"{width}x{height}"
@@ -2384,7 +2575,7 @@ class ImageDownloader:
         
         # 更新UI必须在主线程进行
         self.resolution_info_collected = True
-        self.root.after(0, lambda: self._update_resolution_combobox(resolutions, widths, heights))
+        self.ui_events.call(self._update_resolution_combobox, resolutions, widths, heights)
         
     def _update_resolution_combobox(self, resolutions, widths, heights):
         """更新分辨率下拉框的值"""
@@ -2518,10 +2709,16 @@ class ImageDownloader:
         
         if new_scale != self.current_scale:
             self.current_scale = new_scale
-            self._apply_zoom()
-            
-    def _apply_zoom(self):
-        """应用缩放到当前图片"""
+            # 滚动过程中用快速滤镜绘制，停止滚动后再用高质量滤镜重绘一次
+            self._apply_zoom(fast=True)
+            if self.zoom_render_job is not None:
+                self.root.after_cancel(self.zoom_render_job)
+            self.zoom_render_job = self.root.after(self.zoom_settle_delay, self._apply_zoom)
+            
+    def _apply_zoom(self, fast=False):
+        """应用缩放到当前图片，只渲染画布可见区域"""
+        if not fast:
+            self.zoom_render_job = None
         if not self.original_pil_img:
             return
             
@@ -2529,39 +2726,100 @@ class ImageDownloader:
         zoom_percentage = int(self.current_scale * 100)
         self.zoom_label.config(text=f"缩放: {zoom_percentage}%")
         
-        # 计算缩放后的尺寸
-        new_width = int(self.original_pil_img.width * self.base_scale * self.current_scale)
-        new_height = int(self.original_pil_img.height * self.base_scale * self.current_scale)
+        # 计算缩放后的尺寸（相对原始尺寸）
+        new_width = int(self.original_size[0] * self.base_scale * self.current_scale)
+        new_height = int(self.original_size[1] * self.base_scale * self.current_scale)
         
         # 缩放图片
         if new_width > 0 and new_height > 0:
             try:
-                resized_img = self.original_pil_img.resize((new_width, new_height), Image.LANCZOS)
-                
-                # 转换为PhotoImage
-                self._photo_image = ImageTk.PhotoImage(resized_img)
+                # 放大超过预览时的解码分辨率，才在后台按需解码全尺寸图片（解码完成前先用已解码的版本）
+                if (not fast and new_width > self.original_pil_img.width
+                        and self.original_pil_img.size != self.original_size):
+                    self._load_full_resolution()
                 
                 # 获取画布大小
                 canvas_width = self.preview_canvas.winfo_width()
                 canvas_height = self.preview_canvas.winfo_height()
                 
-                # 计算居中位置
-                x_center = canvas_width // 2
-                y_center = canvas_height // 2
+                # 图片以画布中心为中心，计算它与当前可见区域的交集
+                left = canvas_width // 2 - new_width // 2
+                top = canvas_height // 2 - new_height // 2
+                view_left = int(self.preview_canvas.canvasx(0))
+                view_top = int(self.preview_canvas.canvasy(0))
+                x0, y0 = max(left, view_left), max(top, view_top)
+                x1 = min(left + new_width, view_left + canvas_width)
+                y1 = min(top + new_height, view_top + canvas_height)
                 
-                # 清空画布并添加图像
                 self.preview_canvas.delete("all")
-                self.preview_canvas.create_image(
-                    x_center, y_center,
-                    image=self._photo_image,
-                    anchor="center"  # 使用中心点作为锚点
-                )
+                if x1 > x0 and y1 > y0:
+                    # 从金字塔中选不小于目标尺寸的最小层级，只缩放可见部分
+                    source = self._zoom_pyramid_level(new_width)
+                    sx = source.width / new_width
+                    sy = source.height / new_height
+                    box = ((x0 - left) * sx, (y0 - top) * sy, (x1 - left) * sx, (y1 - top) * sy)
+                    resample = Image.NEAREST if fast else Image.LANCZOS
+                    rendered = source.resize((x1 - x0, y1 - y0), resample, box=box)
+                    
+                    # 转换为PhotoImage
+                    self._photo_image = ImageTk.PhotoImage(rendered)
+                    self.preview_canvas.create_image(x0, y0, image=self._photo_image, anchor="nw")
                 
-                # 调整画布的滚动区域以适应图片
-                self.preview_canvas.config(scrollregion=self.preview_canvas.bbox("all"))
+                # 滚动区域为整张缩放后的图片
+                self.preview_canvas.config(scrollregion=(left, top, left + new_width, top + new_height))
                 
             except Exception as e:
                 print(f"缩放图片出错: {str(e)}")
+    
+    def _zoom_pyramid_level(self, width):
+        """返回宽度不小于width的最小金字塔层级，层级按2倍缩小并缓存"""
+        base = self.original_pil_img
+        if self.zoom_pyramid_source is not base:
+            # 调色板等模式不支持reduce()，先转换
+            if base.mode not in ("RGB", "RGBA", "L", "LA"):
+                base = base.convert("RGBA")
+            self.zoom_pyramid = [base]
+            self.zoom_pyramid_source = self.original_pil_img
+        pyramid = self.zoom_pyramid
+        while pyramid[-1].width // 2 >= width and pyramid[-1].height >= 2:
+            pyramid.append(pyramid[-1].reduce(2))
+        for level in reversed(pyramid):
+            if level.width >= width:
+                return level
+        return pyramid[0]
+
+    def _load_full_resolution(self):
+        """在预览线程中以全尺寸重新解码当前预览图片，完成后交给主线程重绘"""
+        source = self.preview_source
+        if source is None or self.full_resolution_source is source:
+            return
+        self.full_resolution_source = source
+        self.preview_executor.submit(self._full_resolution_worker, self.preview_generation, source)
+    
+    def _full_resolution_worker(self, generation, source):
+        """后台线程：全尺寸解码，超出像素上限时保留缩小解码的版本"""
+        if generation != self.preview_generation:
+            return
+        try:
+            pil_img = self._decode_image(Image.open(BytesIO(source)))
+        except Exception as e:
+            self.ui_events.call(self._on_full_resolution, generation, source, None, str(e))
+            return
+        self.ui_events.call(self._on_full_resolution, generation, source, pil_img, None)
+    
+    def _on_full_resolution(self, generation, source, pil_img, error):
+        """主线程：图片仍是当前预览时换上全尺寸版本并重绘（已切换图片的结果直接丢弃）"""
+        if self.full_resolution_source is source:
+            self.full_resolution_source = None
+        if generation != self.preview_generation or source is not self.preview_source:
+            return
+        if pil_img is None:
+            self.preview_source = None  # 不再重复尝试
+            self._update_status(f"无法以全尺寸解码图片: {error}")
+            return
+        self.original_pil_img = pil_img
+        if self.zoom_render_job is None:
+            self._apply_zoom()
 
     def _toggle_always_on_top(self):
         """切换窗口置顶状态"""
@@ -2574,4 +2832,7 @@ class ImageDownloader:
 if __name__ == "__main__":
     root = tk.Tk()
     app = ImageDownloader(root)
+    # 可通过命令行参数指定启动时加载的URL文件，"-"表示从标准输入读取
+    if len(sys.argv) > 1:
+        app.load_urls_from_path(sys.argv[1])
     root.mainloop() 
\ No newline at end of file
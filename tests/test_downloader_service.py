@@ -0,0 +1,138 @@
+"""downloader_service的接口测试：服务和被下载的网站都运行在本地"""
+import functools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from PIL import Image
+
+from downloader_service import DownloadService, JobStore, create_server
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def start_server(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+class ServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        site = os.path.join(self.tmp, "site")
+        os.makedirs(site)
+        for name, color in (("red.png", "red"), ("blue.png", "blue")):
+            Image.new("RGB", (200, 150), color).save(os.path.join(site, name))
+        with open(os.path.join(site, "index.html"), "w", encoding="utf-8") as f:
+            f.write('<html><body><img src="red.png"><img src="/blue.png"></body></html>')
+        
+        # 本地网站，代替真实的图片站点
+        self.site = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=site))
+        start_server(self.site)
+        self.page_url = "http://127.0.0.1:%d/index.html" % self.site.server_address[1]
+        
+        self.store = JobStore(":memory:")
+        self.service = DownloadService(self.store, os.path.join(self.tmp, "out"), max_jobs=1, job_workers=2)
+        self.server = create_server(self.service, port=0)
+        start_server(self.server)
+        self.base = "http://127.0.0.1:%d" % self.server.server_address[1]
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.stop()
+        self.site.shutdown()
+        self.site.server_close()
+        self.store.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+    
+    def submit(self, **options):
+        response = requests.post(self.base + "/jobs", json={"urls": [self.page_url], "options": options}, timeout=10)
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+    
+    def wait_finished(self, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = requests.get(f"{self.base}/jobs/{job_id}", timeout=10).json()
+            if job["status"] in ("done", "failed", "cancelled"):
+                return job
+            time.sleep(0.1)
+        self.fail(f"任务{job_id}未在{timeout}秒内结束")
+    
+    def test_submit_status_and_results(self):
+        self.service.start()
+        job_id = self.submit()
+        job = self.wait_finished(job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["found"], 2)
+        self.assertEqual(job["downloaded"], 2)
+        self.assertEqual(job["failed"], 0)
+        
+        response = requests.get(f"{self.base}/jobs/{job_id}/results", timeout=10)
+        self.assertEqual(response.headers["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual({os.path.basename(row["url"]) for row in rows}, {"red.png", "blue.png"})
+        for row in rows:
+            self.assertIsNone(row["error"])
+            self.assertEqual(os.path.getsize(row["path"]), row["size"])
+        
+        # after只返回之后的结果
+        response = requests.get(f"{self.base}/jobs/{job_id}/results?after={rows[0]['id']}", timeout=10)
+        self.assertEqual([json.loads(line)["id"] for line in response.text.splitlines()], [rows[1]["id"]])
+        
+        listed = requests.get(self.base + "/jobs", timeout=10).json()["jobs"]
+        self.assertEqual([job["id"] for job in listed], [job_id])
+    
+    def test_follow_streams_until_finished(self):
+        job_id = self.submit()
+        self.service.start()
+        response = requests.get(f"{self.base}/jobs/{job_id}/results?follow=1", timeout=30)
+        self.assertEqual(len(response.text.splitlines()), 2)
+        self.assertEqual(self.store.get(job_id)["status"], "done")
+    
+    def test_invalid_requests(self):
+        response = requests.post(self.base + "/jobs", json={"urls": ["ftp://example.com/"]}, timeout=10)
+        self.assertEqual(response.status_code, 400)
+        response = requests.post(self.base + "/jobs", json={"urls": [self.page_url], "options": {"min_width": "1"}},
+                                 timeout=10)
+        self.assertEqual(response.status_code, 400)
+        response = requests.post(self.base + "/jobs", data=b"{", timeout=10)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(requests.get(self.base + "/jobs/missing", timeout=10).status_code, 404)
+        self.assertEqual(requests.post(self.base + "/jobs/missing/cancel", timeout=10).status_code, 404)
+    
+    def test_cancel_queued_job(self):
+        job_id = self.submit()
+        response = requests.post(f"{self.base}/jobs/{job_id}/cancel", timeout=10)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "cancelled")
+        
+        # 已取消的任务不会被执行
+        self.service.start()
+        time.sleep(0.5)
+        job = requests.get(f"{self.base}/jobs/{job_id}", timeout=10).json()
+        self.assertEqual(job["status"], "cancelled")
+        self.assertEqual(job["downloaded"], 0)
+    
+    def test_cancel_between_claim_and_run(self):
+        job_id = self.submit()
+        job = self.store.claim_next()
+        self.assertEqual(requests.delete(f"{self.base}/jobs/{job_id}", timeout=10).status_code, 200)
+        
+        # 取消时引擎尚未登记，开始运行后应立即停止且保持取消状态
+        self.service._run_job(job)
+        job = self.store.get(job_id)
+        self.assertEqual(job["status"], "cancelled")
+        self.assertEqual(job["downloaded"], 0)
+        self.assertEqual(self.store.results(job_id), [])
+
+if __name__ == "__main__":
+    unittest.main()